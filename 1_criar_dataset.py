@@ -87,22 +87,30 @@ dados_etiquetados.append( (texto, "OUTROS") )
 
 # --- Fim da etiquetagem ---
 
-print(f"--- Total de exemplos etiquetados: {len(dados_etiquetados)} ---")
+ARQUIVO_SAIDA = os.path.join("dataset", "bula_dipirona_etiquetada.csv")
 
-# Agora, vamos transformar isso em um DataFrame (tabela) do pandas
-df = pd.DataFrame(dados_etiquetados, columns=['texto', 'label'])
 
-# E salvar em um arquivo CSV!
+def main():
+    print(f"--- Total de exemplos etiquetados: {len(dados_etiquetados)} ---")
 
-# Cria a pasta 'dataset' se ela não existir
-output_dir = "dataset"
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-    print(f"Pasta '{output_dir}' criada com sucesso.")
+    # Agora, vamos transformar isso em um DataFrame (tabela) do pandas
+    df = pd.DataFrame(dados_etiquetados, columns=['texto', 'label'])
 
-caminho_csv = os.path.join(output_dir, "bula_dipirona_etiquetada.csv")
-df.to_csv(caminho_csv, index=False)
+    # E salvar em um arquivo CSV!
 
-print(f"Sucesso! Dataset salvo em: {caminho_csv}")
-print("\nAmostra do dataset:")
-print(df.head()) # Mostra as 5 primeiras linhas
\ No newline at end of file
+    # Cria a pasta 'dataset' se ela não existir
+    output_dir = "dataset"
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"Pasta '{output_dir}' criada com sucesso.")
+
+    caminho_csv = ARQUIVO_SAIDA
+    df.to_csv(caminho_csv, index=False)
+
+    print(f"Sucesso! Dataset salvo em: {caminho_csv}")
+    print("\nAmostra do dataset:")
+    print(df.head()) # Mostra as 5 primeiras linhas
+
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,673 @@
 import os
 import re
-import pandas as pd
+import json
+import hashlib
+import bisect
+import argparse
+from itertools import accumulate
+from functools import partial
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 import fitz  # PyMuPDF
+import instrumentacao
+import segmentos
+from utilitarios import hash_arquivo # Também usado de fora (etiquetador.hash_arquivo)
+from instrumentacao import BALDES_CONTAGEM
+from segmentos import Segmento
 
 # --- 1. FUNÇÃO DE EXTRAÇÃO DE TEXTO ---
-def extrair_texto_pdf(caminho_pdf: str) -> str:
-    """Extrai o texto completo de um arquivo PDF."""
-    texto = ""
+def abrir_pdf(caminho_pdf):
+    """Abre um PDF a partir do caminho ou dos bytes do arquivo (ex: upload no app.py)."""
+    if isinstance(caminho_pdf, (bytes, bytearray)):
+        return fitz.open(stream=caminho_pdf, filetype="pdf")
+    return fitz.open(caminho_pdf)
+
+@instrumentacao.medido("extracao", modo="texto")
+def ler_paginas_pdf(caminho_pdf) -> list:
+    """O texto de cada página de um PDF. Deixa a exceção subir."""
+    with abrir_pdf(caminho_pdf) as doc:
+        instrumentacao.observar("pdf_paginas", len(doc), baldes=BALDES_CONTAGEM)
+        return [pagina.get_text() for pagina in doc]
+
+def inicios_paginas(paginas) -> list:
+    """Posição, no texto completo, do início de cada página (para achar a página de um trecho)."""
+    return list(accumulate((len(p) for p in paginas[:-1]), initial=0))
+
+def ler_pdf(caminho_pdf) -> str:
+    """Lê o texto completo de um PDF. Diferente de extrair_texto_pdf, deixa a exceção subir."""
+    # Junta as páginas de uma vez (concatenar com += fica quadrático em bulas longas)
+    return "".join(ler_paginas_pdf(caminho_pdf))
+
+def extrair_texto_pdf(caminho_pdf) -> str:
+    """Extrai o texto completo de um arquivo PDF (caminho ou bytes)."""
     try:
-        with fitz.open(caminho_pdf) as doc:
-            for pagina in doc:
-                texto += pagina.get_text()
+        texto = ler_pdf(caminho_pdf)
         print(f"  -> Lido com sucesso.")
         return texto
     except Exception as e:
-        print(f"  [AVISO] Falha ao ler {caminho_pdf}: {e}")
+        nome = "PDF enviado" if isinstance(caminho_pdf, (bytes, bytearray)) else caminho_pdf
+        print(f"  [AVISO] Falha ao ler {nome}: {e}")
         return "" # Retorna vazio se o PDF for ilegível (ex: imagem)
 
-# --- 2. O CÉREBRO: FUNÇÃO DE ETIQUETAGEM AUTOMÁTICA ---
-def segmentar_e_etiquetar(texto: str):
-    """Segmenta o texto por seções e etiqueta automaticamente."""
-    
-    # Lista de Regex para filtrar lixo (cabeçalhos/rodapés comuns)
-    # Adicione mais aqui se vir mais padrões
-    JUNK_REGEX = re.compile(
-        r"Bula (para|do) paciente|eurofarma|CIMED|SANTISA|TEUTO|RANBAXY|GERMED|VITAMEDIC|MULTILAB|"
-        r"Modelo de bula|Informações ao Paciente|IDENTIFICAÇÃO DO MEDICAMENTO|"
-        r"Farm\. Resp|CNPJ|Indústria Brasileira|^\s*página \d+|\s*VP REV \d+",
-        re.IGNORECASE
-    )
+# --- 1b. EXTRAÇÃO COM LAYOUT (fonte, tamanho e posição do texto) ---
+# Em vez do texto corrido, usa a saída "dict" do PyMuPDF, que traz cada linha com
+# suas fontes e coordenadas. Com isso:
+#   - só linhas que COMEÇAM em negrito (ou com fonte maior que o corpo) são candidatas
+#     a título, e sabemos onde o título termina: o texto que vem depois dele na mesma
+#     linha (comum em bulas diagramadas "corridas") não é mais descartado;
+#   - cabeçalhos/rodapés repetidos são removidos pela POSIÇÃO na página,
+#     sem depender da JUNK_REGEX.
+MARGEM_CABECALHO_RODAPE = 0.08  # Faixa do topo/rodapé (fração da altura da página)
+FRACAO_PAGINAS_REPETIDAS = 0.5  # Aparece na margem em pelo menos metade das páginas = lixo
+FATOR_TAMANHO_TITULO = 1.15     # Fonte 15% maior que a do corpo também conta como título
+BIT_NEGRITO = 16                # Flag de negrito do PyMuPDF (span["flags"] & 16)
+
+def _normalizar_margem(texto: str) -> str:
+    """Chave para comparar cabeçalhos/rodapés entre páginas (ignora números de página/versão)."""
+    return re.sub(r"\d+", "#", " ".join(texto.lower().split()))
+
+@instrumentacao.medido("extracao", modo="layout")
+def extrair_linhas_layout(caminho_pdf: str):
+    """
+    Lê o PDF com layout e retorna a lista de linhas (texto, n_titulo, pagina), já sem os
+    cabeçalhos/rodapés repetidos. 'n_titulo' é o número de caracteres do início da
+    linha escritos em negrito/fonte maior (0 = linha comum); 'pagina' começa em 1.
+    Deixa a exceção subir, como ler_pdf.
+    """
+    paginas = []
+    tamanhos = Counter()  # Quantos caracteres foram escritos em cada tamanho de fonte
+    with abrir_pdf(caminho_pdf) as doc:
+        for pagina in doc:
+            altura = pagina.rect.height or 1
+            linhas_pagina = []
+            # TEXTFLAGS_TEXT: sem imagens (o "dict" padrão traz os bytes delas)
+            for bloco in pagina.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                for linha in bloco.get("lines", ()):
+                    spans = [s for s in linha["spans"] if s["text"].strip()]
+                    if not spans:
+                        continue
+                    texto = "".join(s["text"] for s in linha["spans"])
+                    # Trechos do início da linha: (nº de caracteres, negrito?, tamanho)
+                    inicio = []
+                    for s in linha["spans"]:
+                        negrito = bool(s["flags"] & BIT_NEGRITO) or "bold" in s["font"].lower()
+                        inicio.append((len(s["text"]), negrito, s["size"], bool(s["text"].strip())))
+                        if s["text"].strip():
+                            tamanhos[round(s["size"], 1)] += len(s["text"])
+                    _, y0, _, y1 = linha["bbox"]
+                    na_margem = y1 <= altura * MARGEM_CABECALHO_RODAPE or y0 >= altura * (1 - MARGEM_CABECALHO_RODAPE)
+                    linhas_pagina.append((texto, inicio, na_margem))
+            paginas.append(linhas_pagina)
+    instrumentacao.observar("pdf_paginas", len(paginas), baldes=BALDES_CONTAGEM)
+
+    # Textos de margem que se repetem em muitas páginas são cabeçalho/rodapé
+    repeticoes = Counter()
+    for linhas_pagina in paginas:
+        repeticoes.update({_normalizar_margem(t) for t, _, margem in linhas_pagina if margem})
+    minimo = max(2, FRACAO_PAGINAS_REPETIDAS * len(paginas))
+    repetidos = {chave for chave, n in repeticoes.items() if n >= minimo}
+
+    # O tamanho de fonte mais usado é o do corpo do texto
+    tamanho_corpo = tamanhos.most_common(1)[0][0] if tamanhos else 0
+    linhas = []
+    n_margem = 0
+    for numero, linhas_pagina in enumerate(paginas, start=1):
+        for texto, inicio, margem in linhas_pagina:
+            if margem and _normalizar_margem(texto) in repetidos:
+                n_margem += 1
+                continue
+            # O título vai até o primeiro trecho com texto que não seja negrito/fonte maior
+            n_titulo = 0
+            for n, negrito, tamanho, tem_texto in inicio:
+                if tem_texto and not (negrito or tamanho >= tamanho_corpo * FATOR_TAMANHO_TITULO):
+                    break
+                n_titulo += n
+            if not texto[:n_titulo].strip():
+                n_titulo = 0
+            linhas.append((texto, n_titulo, numero))
+    instrumentacao.contar("linhas_descartadas_total", n_margem, motivo="margem_repetida")
+    return linhas
+
+# --- 2. REGRAS DE ETIQUETAGEM ---
+# Ficam no nível do módulo para que o cache (seção 4) consiga calcular um hash delas:
+# qualquer mudança aqui invalida os resultados guardados em disco.
+
+# Lista de Regex para filtrar lixo (cabeçalhos/rodapés comuns)
+# Adicione mais aqui se vir mais padrões, SEMPRE EM MINÚSCULAS: a linha passa por
+# .lower() antes do teste (ver eh_lixo), o que é bem mais rápido do que usar
+# re.IGNORECASE numa busca sem âncora, que é o custo dominante do segmentador.
+JUNK_REGEX = re.compile(
+    r"bula (para|do) paciente|eurofarma|cimed|santisa|teuto|ranbaxy|germed|vitamedic|multilab|"
+    r"modelo de bula|informações ao paciente|identificação do medicamento|"
+    r"farm\. resp|cnpj|indústria brasileira|^\s*página \d+|vp rev \d+"
+)
+
+# Padrões de cabeçalhos mapeados para nossos rótulos
+# Adicionamos os números (ex: 1., 3.) para precisão
+# Adicionamos "STOP_LABEL" para voltar para "OUTROS"
+STOP_LABEL = "STOP_LABEL" 
+padroes = [
+    (r"^(1|I)\.?\s*PARA QUE ESTE MEDICAMENTO( É| E)? INDICADO\?", "INDICACAO"),
+    (r"^\bCOMPOSI[ÇC][ÃA]O\b", "COMPOSICAO"),
+    (r"^(3|III)\.?\s*QUANDO N[ÃA]O DEVO USAR (ESTE )?MEDICAMENTO\?", "CONTRAINDICACAO"),
+    (r"^(6|VI)\.?\s*COMO DEVO USAR (ESTE )?MEDICAMENTO\?", "POSOLOGIA"),
+    (r"^\bPOSOLOGIA\b", "POSOLOGIA"),
+    (r"^(8|VIII)\.?\s*QUAIS OS MALES QUE ESTE MEDICAMENTO PODE ME CAUSAR\?", "EFEITOS_ADVERSOS"),
+    (r"^\bREA[ÇC][ÕO]ES? ADVERSAS\b", "EFEITOS_ADVERSOS"),
     
-    # Padrões de cabeçalhos mapeados para nossos rótulos
-    # Adicionamos os números (ex: 1., 3.) para precisão
-    # Adicionamos "STOP_LABEL" para voltar para "OUTROS"
-    STOP_LABEL = "STOP_LABEL" 
-    padroes = [
-        (r"^(1|I)\.?\s*PARA QUE ESTE MEDICAMENTO( É| E)? INDICADO\?", "INDICACAO"),
-        (r"^\bCOMPOSI[ÇC][ÃA]O\b", "COMPOSICAO"),
-        (r"^(3|III)\.?\s*QUANDO N[ÃA]O DEVO USAR (ESTE )?MEDICAMENTO\?", "CONTRAINDICACAO"),
-        (r"^(6|VI)\.?\s*COMO DEVO USAR (ESTE )?MEDICAMENTO\?", "POSOLOGIA"),
-        (r"^\bPOSOLOGIA\b", "POSOLOGIA"),
-        (r"^(8|VIII)\.?\s*QUAIS OS MALES QUE ESTE MEDICAMENTO PODE ME CAUSAR\?", "EFEITOS_ADVERSOS"),
-        (r"^\bREA[ÇC][ÕO]ES? ADVERSAS\b", "EFEITOS_ADVERSOS"),
-        
-        # --- Nossas "Etiquetas de Parada" (voltam para OUTROS) ---
-        (r"^(2|II)\.?\s*COMO ESTE MEDICAMENTO FUNCIONA\?", STOP_LABEL),
-        (r"^(4|IV)\.?\s*O QUE DEVO SABER ANTES DE USAR (ESTE )?MEDICAMENTO\?", STOP_LABEL),
-        (r"^(5|V)\.?\s*ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR (ESTE )?MEDICAMENTO\?", STOP_LABEL),
-        (r"^(7|VII)\.?\s*O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR (ESTE )?MEDICAMENTO\?", STOP_LABEL),
-        (r"^(9|IX)\.?\s*O QUE FAZER SE ALGUÉM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA (DESTE )?MEDICAMENTO\?", STOP_LABEL),
-        (r"^\bDIZERES LEGAIS\b", STOP_LABEL),
-        (r"^\bAPRESENTA[ÇC][ÕO]ES\b", STOP_LABEL),
-        (r"^\bINTERA[ÇC][ÕO]ES MEDICAMENTOSAS\b", STOP_LABEL),
-    ]
-
-    # Compila regex para eficiência
-    regex_mapeada = [(re.compile(p, re.IGNORECASE), lbl) for p, lbl in padroes]
-
-    dados = []
+    # --- Nossas "Etiquetas de Parada" (voltam para OUTROS) ---
+    (r"^(2|II)\.?\s*COMO ESTE MEDICAMENTO FUNCIONA\?", STOP_LABEL),
+    (r"^(4|IV)\.?\s*O QUE DEVO SABER ANTES DE USAR (ESTE )?MEDICAMENTO\?", STOP_LABEL),
+    (r"^(5|V)\.?\s*ONDE, COMO E POR QUANTO TEMPO POSSO GUARDAR (ESTE )?MEDICAMENTO\?", STOP_LABEL),
+    (r"^(7|VII)\.?\s*O QUE DEVO FAZER QUANDO EU ME ESQUECER DE USAR (ESTE )?MEDICAMENTO\?", STOP_LABEL),
+    (r"^(9|IX)\.?\s*O QUE FAZER SE ALGUÉM USAR UMA QUANTIDADE MAIOR DO QUE A INDICADA (DESTE )?MEDICAMENTO\?", STOP_LABEL),
+    (r"^\bDIZERES LEGAIS\b", STOP_LABEL),
+    (r"^\bAPRESENTA[ÇC][ÕO]ES\b", STOP_LABEL),
+    (r"^\bINTERA[ÇC][ÕO]ES MEDICAMENTOSAS\b", STOP_LABEL),
+]
+
+# Todos os cabeçalhos num único regex, compilado uma vez só (no import do módulo).
+# Cada padrão vira um grupo nomeado (h0, h1, ...) e 'm.lastgroup' diz qual casou.
+# Como todos os padrões são ancorados em "^", a alternância respeita a mesma
+# prioridade da lista acima: o primeiro padrão que casar vence.
+CABECALHO_REGEX = re.compile(
+    "|".join(f"(?P<h{i}>{p})" for i, (p, _) in enumerate(padroes)),
+    re.IGNORECASE
+)
+LABEL_DO_GRUPO = {f"h{i}": lbl for i, (_, lbl) in enumerate(padroes)}
+
+# Filtro barato antes do regex de cabeçalhos: todo título começa com um número,
+# um numeral romano (I, V, X) ou uma das palavras-chave abaixo.
+# ATENÇÃO: ao adicionar um padrão que comece de outro jeito, inclua o início dele aqui.
+PREFIXOS_CABECALHO = tuple("0123456789IVX") + (
+    "COMPOSI", "POSOLOGIA", "REA", "DIZERES", "APRESENTA", "INTERA",
+)
+TAMANHO_PREFIXO = max(len(p) for p in PREFIXOS_CABECALHO)
+
+# Quebra de parágrafo: 2+ quebras de linha
+PARAGRAFO_REGEX = re.compile(r"(\n\s*){2,}")
+# Os finais de linha do str.splitlines (o modo texto lê as linhas com eles, para
+# saber a posição de cada uma no texto do PDF)
+FINAIS_DE_LINHA = "\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+def eh_lixo(linha_limpa: str) -> bool:
+    """True se a linha for cabeçalho/rodapé de fabricante (JUNK_REGEX)."""
+    return JUNK_REGEX.search(linha_limpa.lower()) is not None
+
+def identificar_cabecalho(linha_limpa: str):
+    """Retorna a etiqueta do cabeçalho (ou STOP_LABEL) se a linha for um título, senão None."""
+    if not linha_limpa[:TAMANHO_PREFIXO].upper().startswith(PREFIXOS_CABECALHO):
+        return None
+    m = CABECALHO_REGEX.match(linha_limpa)
+    return LABEL_DO_GRUPO[m.lastgroup] if m else None
+
+# Aumente este número sempre que mudar a LÓGICA de segmentar_e_etiquetar
+# (ex: o filtro de 50 caracteres), para o cache não servir resultados antigos.
+VERSAO_SEGMENTADOR = 2
+
+# --- 3. O CÉREBRO: FUNÇÃO DE ETIQUETAGEM AUTOMÁTICA ---
+def _segmentar(linhas, modo_layout: bool, paginas=(), documento: str | None = None):
+    """
+    Núcleo do segmentador: agrupa as linhas em blocos entre cabeçalhos e devolve
+    os parágrafos (Segmento) um a um, à medida que cada bloco é fechado.
+    Só o bloco atual fica em memória, nunca a lista completa.
+
+    - modo texto: 'linhas' são strings COM o final de linha (splitlines(keepends=True));
+      todas passam pela JUNK_REGEX e pelo teste de título.
+    - modo layout: 'linhas' são (texto, n_titulo) de extrair_linhas_layout; o lixo já
+      foi removido pela posição e só linhas que começam com título são testadas. O
+      que vier depois do título na mesma linha entra no bloco da nova seção.
+
+    A posição de cada linha no texto do documento (o texto corrido no modo texto, as
+    linhas unidas por "\n" no modo layout) vai junto no bloco, para cada parágrafo
+    saber de onde veio. 'paginas' é o início de cada página nesse texto.
+    """
+
     buffer = []
+    posicoes = [] # Posição, no texto do documento, do início de cada linha do buffer
     label_atual = "OUTROS" # Começa como OUTROS (para o cabeçalho/resumo inicial)
+    # Contadores locais (somados à instrumentação só no final: nada de lock por linha)
+    descartes = Counter()
+
+    def no_documento(inicios_bloco, linhas_bloco, posicao):
+        """Converte uma posição do bloco ("\n".join das linhas do buffer) para o texto do documento."""
+        k = bisect.bisect_right(inicios_bloco, posicao) - 1
+        return linhas_bloco[k] + posicao - inicios_bloco[k]
 
     def flush():
-        """Salva o buffer de texto atual na lista de dados."""
+        """Quebra o buffer de texto atual em parágrafos e devolve os que têm conteúdo."""
         if not buffer:
             return
-        bloco = "\n".join(buffer).strip()
-        # Ignora blocos muito pequenos ou com pouco texto
-        if len(bloco) >= 50: 
-            dados.append((bloco, label_atual))
+        bruto = "\n".join(buffer)
+        bloco = bruto.strip()
+        recuo = len(bruto) - len(bruto.lstrip())
+        inicios_bloco = list(accumulate((len(linha) + 1 for linha in buffer[:-1]), initial=0))
+        linhas_bloco = posicoes.copy()
         buffer.clear() # Limpa o buffer
+        posicoes.clear()
+        # Ignora blocos muito pequenos ou com pouco texto
+        if len(bloco) < 50:
+            descartes["bloco_curto"] += 1
+            return
+        # Estratégia adicional: quebrar blocos longos por parágrafos
+        # (2+ quebras de linha). Os pedaços entre as quebras, com a posição de cada um
+        pedacos, anterior = [], 0
+        for quebra in PARAGRAFO_REGEX.finditer(bloco):
+            pedacos.append((anterior, bloco[anterior:quebra.start()]))
+            anterior = quebra.end()
+        pedacos.append((anterior, bloco[anterior:]))
+        for inicio, pedaco in pedacos:
+            p = pedaco.strip()
+            # Filtro final de limpeza
+            if len(p) >= 50: # Garante que o parágrafo tenha conteúdo
+                descartes["aceito"] += 1
+                inicio += recuo + len(pedaco) - len(pedaco.lstrip())
+                inicio_doc = no_documento(inicios_bloco, linhas_bloco, inicio)
+                fim_doc = no_documento(inicios_bloco, linhas_bloco, inicio + len(p) - 1) + 1
+                pagina = bisect.bisect_right(paginas, inicio_doc) if paginas else 0
+                yield Segmento(p, label_atual, documento, pagina, inicio_doc, fim_doc)
+            elif p:
+                descartes["paragrafo_curto"] += 1
 
     # Varre linha a linha
-    for linha in texto.splitlines():
+    n_linhas = n_lixo = 0
+    proxima = 0 # Posição da próxima linha no texto do documento
+    for linha in linhas:
+        n_linhas += 1
+        posicao = proxima
+        if modo_layout:
+            linha, n_titulo = linha
+            proxima += len(linha) + 1
+        else:
+            proxima += len(linha)
         linha_limpa = linha.strip()
         
         # 1. Filtro de Lixo: Pula linhas vazias ou que são lixo óbvio
-        if not linha_limpa or JUNK_REGEX.search(linha_limpa):
+        if not linha_limpa:
+            continue
+        if not modo_layout and eh_lixo(linha_limpa):
+            n_lixo += 1
             continue
 
-        encontrado = None
-        for rx, lbl in regex_mapeada:
-            # Verifica se a linha é um título
-            if rx.search(linha_limpa):
-                encontrado = lbl
-                break
+        # 2. Verifica se a linha é um título (uma única passada no regex combinado)
+        if modo_layout and not n_titulo:
+            encontrado = None
+        else:
+            encontrado = identificar_cabecalho(linha_limpa)
         
         if encontrado:
             # Novo cabeçalho encontrado: fecha o bloco anterior
-            flush()
+            yield from flush()
             # Se for um "Stop Label", volta para OUTROS. Senão, usa a nova etiqueta.
             label_atual = "OUTROS" if encontrado == STOP_LABEL else encontrado
+            if modo_layout and linha[n_titulo:].strip():
+                buffer.append(linha[n_titulo:]) # Texto na mesma linha, depois do título
+                posicoes.append(posicao + n_titulo)
             continue # Não adiciona o próprio título ao buffer
 
-        buffer.append(linha) # Adiciona a linha de texto ao buffer atual
+        # Adiciona a linha de texto ao buffer atual (no modo texto, sem o final de linha)
+        buffer.append(linha if modo_layout else linha.rstrip(FINAIS_DE_LINHA))
+        posicoes.append(posicao)
 
     # Salva o último bloco
-    flush()
+    yield from flush()
 
-    # Estratégia adicional: quebrar blocos longos por parágrafos
-    dados_expandidos = []
-    for bloco, lbl in dados:
-        # Quebra por 2+ quebras de linha (parágrafos)
-        paragrafos = [p.strip() for p in re.split(r"(\n\s*){2,}", bloco) if p.strip()]
-        
-        for p in paragrafos:
-            # Filtro final de limpeza
-            if len(p) >= 50: # Garante que o parágrafo tenha conteúdo
-                dados_expandidos.append((p, lbl))
-    
-    return dados_expandidos
+    instrumentacao.contar("linhas_total", n_linhas)
+    instrumentacao.contar("linhas_descartadas_total", n_lixo, motivo="junk_regex")
+    instrumentacao.contar("segmentos_total", descartes.pop("aceito", 0))
+    for motivo, n in descartes.items(): # Filtro de 50 caracteres
+        instrumentacao.contar("segmentos_descartados_total", n, motivo=motivo)
+
+def iterar_segmentos(texto: str, paginas=(), documento: str | None = None):
+    """
+    Segmenta o texto corrido por seções, devolvendo os parágrafos (Segmento) um a um.
+    'paginas' (de inicios_paginas) dá a página de cada parágrafo; sem ela, a página fica 0.
+    """
+    return _segmentar(texto.splitlines(keepends=True), modo_layout=False, paginas=paginas, documento=documento)
+
+def iterar_segmentos_layout(linhas, documento: str | None = None):
+    """Como iterar_segmentos, mas recebe as linhas (texto, n_titulo, pagina) de extrair_linhas_layout."""
+    # Início de cada página no texto das linhas unidas por "\n" (páginas sem nenhuma
+    # linha começam onde começaria a próxima)
+    paginas, posicao = [], 0
+    for texto, _, pagina in linhas:
+        while len(paginas) < pagina:
+            paginas.append(posicao)
+        posicao += len(texto) + 1
+    return _segmentar(((texto, n_titulo) for texto, n_titulo, _ in linhas), modo_layout=True,
+                      paginas=paginas, documento=documento)
+
+@instrumentacao.medido("segmentacao")
+def segmentar_e_etiquetar(texto: str, paginas=(), documento: str | None = None):
+    """Segmenta o texto por seções e etiqueta automaticamente (lista de Segmento)."""
+    return list(iterar_segmentos(texto, paginas, documento))
+
+# --- 4. CACHE INCREMENTAL (um "shard" JSON por PDF) ---
+# A chave é o hash do CONTEÚDO do PDF + o hash das regras acima. Assim, rodar de novo
+# depois de adicionar uma bula nova só reprocessa ela; as outras custam um hash e uma leitura.
+PASTA_CACHE = ".cache_etiquetagem"
+
+def hash_regras(extracao: str = "texto") -> str:
+    """Hash das regras de etiquetagem (JUNK_REGEX, padroes, VERSAO_SEGMENTADOR e modo de extração)."""
+    regras = {
+        "junk": [JUNK_REGEX.pattern, JUNK_REGEX.flags],
+        "padroes": padroes,
+        "versao": VERSAO_SEGMENTADOR,
+        "extracao": extracao,
+    }
+    if extracao == "layout":
+        regras["layout"] = [MARGEM_CABECALHO_RODAPE, FRACAO_PAGINAS_REPETIDAS,
+                            FATOR_TAMANHO_TITULO, BIT_NEGRITO]
+    return hashlib.sha256(json.dumps(regras, ensure_ascii=False).encode("utf-8")).hexdigest()
 
-# --- 3. EXECUÇÃO PRINCIPAL (ATUALIZADA) ---
-def main():
+def caminho_shard(pasta_cache: str, caminho_pdf: str, extracao: str = "texto") -> str:
+    """Uma subpasta por conjunto de regras; dentro dela, um JSON por conteúdo de PDF."""
+    return os.path.join(pasta_cache, hash_regras(extracao)[:16], hash_arquivo(caminho_pdf) + ".json")
+
+def ler_shard(caminho: str, documento: str | None = None):
+    """
+    Lê um shard do cache. Retorna None se não existir ou estiver corrompido.
+    O shard vale para qualquer PDF com o mesmo conteúdo: o 'documento' é o nome atual.
+    """
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            shard = json.load(f)
+        return [Segmento.de_lista(seg, documento) for seg in shard["segmentos"]]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def salvar_shard(caminho: str, caminho_pdf: str, texto: str, dados):
+    """Grava o shard de forma atômica (arquivo temporário + rename), seguro com vários processos."""
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    shard = {
+        "arquivo": os.path.basename(caminho_pdf),
+        "texto": texto,
+        "segmentos": [seg.como_lista() for seg in dados],
+    }
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(shard, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+# --- 5. ESCRITA EM LOTES (CSV ou Parquet) ---
+FORMATOS_SAIDA = ("csv", "parquet")
+
+class EscritorSegmentos:
+    """
+    Grava os segmentos (só texto e label) em lotes de 'tamanho_lote' linhas, em CSV ou
+    Parquet, para que a memória usada não cresça com o tamanho do corpus.
+    O arquivo é escrito num temporário e só substitui o destino em fechar(),
+    então uma execução interrompida não deixa um dataset pela metade.
+    """
+
+    def __init__(self, caminho: str, formato: str = "csv", tamanho_lote: int = 10_000):
+        if formato not in FORMATOS_SAIDA:
+            raise ValueError(f"Formato de saída inválido: {formato} (use {FORMATOS_SAIDA})")
+        self.caminho = caminho
+        self.formato = formato
+        self.tamanho_lote = tamanho_lote
+        self.temporario = f"{caminho}.tmp"
+        self.lote = []
+        self.total = 0
+        self.contagem = Counter()
+        self._parquet = None
+        self._cabecalho_escrito = False
+
+    def escrever(self, segmentos):
+        """Adiciona segmentos (qualquer iterável, inclusive um gerador)."""
+        for seg in segmentos:
+            self.lote.append(seg)
+            if len(self.lote) >= self.tamanho_lote:
+                self._descarregar()
+
+    def _descarregar(self):
+        if not self.lote:
+            return
+        # Importado só aqui: quem só extrai e segmenta (o app.py, os benchmarks) não
+        # paga os ~0.4 s de importação do pandas
+        import pandas as pd
+        df = pd.DataFrame({"texto": [seg.texto for seg in self.lote], "label": [seg.label for seg in self.lote]})
+        if self.formato == "csv":
+            df.to_csv(self.temporario, mode="a" if self._cabecalho_escrito else "w",
+                      header=not self._cabecalho_escrito, index=False)
+            self._cabecalho_escrito = True
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = pq.ParquetWriter(self.temporario, tabela.schema)
+            self._parquet.write_table(tabela)
+        self.total += len(df)
+        self.contagem.update(df["label"])
+        self.lote.clear()
+
+    def fechar(self):
+        """Grava o último lote e move o temporário para o destino final."""
+        self._descarregar()
+        if self._parquet is not None:
+            self._parquet.close()
+        if self.total:
+            os.replace(self.temporario, self.caminho)
+
+    def descartar(self):
+        """Apaga o temporário sem tocar no destino (usado em caso de erro)."""
+        if self._parquet is not None:
+            self._parquet.close()
+        if os.path.exists(self.temporario):
+            os.remove(self.temporario)
+
+# --- 6. PROCESSAMENTO DE UM PDF (roda dentro dos processos do pool) ---
+MODOS_EXTRACAO = ("texto", "layout")
+
+def processar_pdf(caminho_pdf: str, pasta_cache: str | None = None, extracao: str = "texto"):
+    """
+    Extrai e etiqueta um único PDF sem imprimir nada.
+    Retorna (dados_etiquetados, erro, veio_do_cache): em caso de falha, 'erro' traz
+    a mensagem e a lista vem vazia, para o processo principal montar o resumo no final.
+    Com 'pasta_cache', reaproveita o shard do PDF se o conteúdo e as regras não mudaram.
+    'extracao' escolhe entre o texto corrido ("texto") e a leitura com layout ("layout").
+    Cada Segmento leva o nome do arquivo como 'documento'.
+    """
+    documento = os.path.basename(caminho_pdf)
+    shard = None
+    if pasta_cache:
+        try:
+            shard = caminho_shard(pasta_cache, caminho_pdf, extracao)
+        except OSError as e:
+            return [], f"falha ao ler o PDF: {e}", False
+        dados = ler_shard(shard, documento)
+        if dados is not None:
+            return dados, None, True
+
+    try:
+        if extracao == "layout":
+            linhas = extrair_linhas_layout(caminho_pdf)
+            texto = "\n".join(linha for linha, _, _ in linhas)
+        else:
+            paginas = ler_paginas_pdf(caminho_pdf)
+            texto = "".join(paginas)
+    except Exception as e:
+        return [], f"falha ao ler o PDF: {e}", False
+    if not texto.strip():
+        return [], "nenhum texto extraído (PDF escaneado/imagem?)", False
+    try:
+        if extracao == "layout":
+            with instrumentacao.medir("segmentacao"):
+                dados = list(iterar_segmentos_layout(linhas, documento))
+        else:
+            dados = segmentar_e_etiquetar(texto, inicios_paginas(paginas), documento)
+    except Exception as e:
+        return [], f"falha na etiquetagem: {e}", False
+
+    # Falhas não entram no cache: na próxima execução o PDF é tentado de novo
+    if shard:
+        try:
+            salvar_shard(shard, caminho_pdf, texto, dados)
+        except OSError:
+            pass # Sem cache, mas o resultado continua valendo
+    return dados, None, False
+
+def processar_pdf_instrumentado(caminho_pdf: str, **kwargs):
+    """
+    processar_pdf dentro de um processo do pool: devolve também as métricas que ele
+    gerou (e zera o registro do processo), para o principal somar as de todos.
+    """
+    return processar_pdf(caminho_pdf, **kwargs), instrumentacao.coletar(zerar=True)
+
+# Quantos PDFs podem estar "em voo" no pool por processo. Limita quantos
+# resultados prontos ficam esperando na fila quando um PDF lento atrasa a ordem.
+PDFS_EM_VOO_POR_PROCESSO = 4
+
+def mapear_em_ordem(executor, funcao, itens, janela: int):
+    """Como executor.map, mas com no máximo 'janela' tarefas pendentes por vez."""
+    pendentes = deque()
+    for item in itens:
+        pendentes.append(executor.submit(funcao, item))
+        if len(pendentes) >= janela:
+            yield pendentes.popleft().result()
+    while pendentes:
+        yield pendentes.popleft().result()
+
+# --- 7. EXECUÇÃO PRINCIPAL (ATUALIZADA) ---
+def main(num_workers: int | None = None, pasta_cache: str | None = PASTA_CACHE,
+         formato: str = "csv", tamanho_lote: int = 10_000, extracao: str = "texto",
+         pasta_segmentos: str | None = segmentos.PASTA_SEGMENTOS):
     pasta_data = "data"
     pasta_dataset = "dataset"
     os.makedirs(pasta_dataset, exist_ok=True)
     
     # Pega TODOS os arquivos .pdf da pasta 'data'
-    arquivos_pdf = [f for f in os.listdir(pasta_data) if f.endswith(".pdf")]
+    # Ordenados pelo nome para que o CSV final saia sempre na mesma ordem
+    arquivos_pdf = sorted(f for f in os.listdir(pasta_data) if f.endswith(".pdf"))
     
     if not arquivos_pdf:
         print(f"Nenhum arquivo .pdf encontrado na pasta '{pasta_data}'.")
         return
 
-    print(f"--- Encontrados {len(arquivos_pdf)} PDFs. Iniciando etiquetagem automática... ---")
+    num_workers = num_workers or os.cpu_count() or 1
+    num_workers = min(num_workers, len(arquivos_pdf))
+    print(f"--- Encontrados {len(arquivos_pdf)} PDFs. Iniciando etiquetagem automática "
+          f"com {num_workers} processo(s)... ---")
     
-    todos_os_dados = []
-    
-    # Loop para processar cada PDF
-    for nome_pdf in arquivos_pdf:
-        caminho_pdf = os.path.join(pasta_data, nome_pdf)
-        print(f"Processando: {nome_pdf}")
-        
-        texto = extrair_texto_pdf(caminho_pdf)
-        if not texto:
-            continue
-            
-        dados_etiquetados = segmentar_e_etiquetar(texto)
-        print(f"  -> Gerou {len(dados_etiquetados)} exemplos.")
-        todos_os_dados.extend(dados_etiquetados)
+    falhas = []
+    n_cache = 0
+    caminhos = [os.path.join(pasta_data, nome_pdf) for nome_pdf in arquivos_pdf]
+
+    # Os segmentos de cada PDF vão direto para o arquivo final, em lotes,
+    # em vez de se acumularem numa lista gigante antes de virar DataFrame.
+    caminho_saida = os.path.join(pasta_dataset, f"dataset_completo_automatico.{formato}")
+    escritor = EscritorSegmentos(caminho_saida, formato=formato, tamanho_lote=tamanho_lote)
+    # E, com a origem de cada trecho, no armazém particionado por PDF (segmentos.py).
+    # Só as partições dos PDFs novos/alterados (ou de regras novas) são regravadas.
+    armazem = segmentos.ArmazemSegmentos(pasta_segmentos) if pasta_segmentos else None
+    regras = hash_regras(extracao)[:16]
+
+    # Com 1 worker roda tudo no próprio processo (mais fácil de depurar).
+    # Com mais, espalha os PDFs num pool de processos; os resultados voltam
+    # na mesma ordem da entrada, então a saída é determinística.
+    # O arquivo final é a junção dos shards de cada PDF, na ordem dos nomes.
+    if num_workers == 1:
+        resultados = map(partial(processar_pdf, pasta_cache=pasta_cache, extracao=extracao), caminhos)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=num_workers)
+        tarefa = partial(processar_pdf_instrumentado, pasta_cache=pasta_cache, extracao=extracao)
+        resultados = mapear_em_ordem(executor, tarefa, caminhos,
+                                     janela=num_workers * PDFS_EM_VOO_POR_PROCESSO)
+
+        def somar_metricas(resultados):
+            for resultado, metricas in resultados:
+                instrumentacao.mesclar(metricas)
+                yield resultado
+        resultados = somar_metricas(resultados)
+
+    try:
+        for nome_pdf, (dados_etiquetados, erro, do_cache) in zip(arquivos_pdf, resultados):
+            if erro:
+                falhas.append((nome_pdf, erro))
+                instrumentacao.contar("pdfs_total", resultado="falha")
+                continue
+            n_cache += do_cache
+            instrumentacao.contar("pdfs_total", resultado="cache" if do_cache else "processado")
+            origem = " (cache)" if do_cache else ""
+            print(f"Processado: {nome_pdf} -> {len(dados_etiquetados)} exemplos{origem}.")
+            escritor.escrever(dados_etiquetados)
+            if armazem is not None:
+                info = os.stat(os.path.join(pasta_data, nome_pdf))
+                armazem.gravar(nome_pdf, dados_etiquetados, [info.st_size, info.st_mtime_ns], regras)
+        escritor.fechar()
+        if armazem is not None:
+            armazem.fechar() # Só aqui: PDFs que falharam ou saíram da pasta perdem a partição
+    except BaseException:
+        escritor.descartar()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
 
     print("\n--- Processamento concluído! ---")
+    print(f"PDFs com sucesso: {len(arquivos_pdf) - len(falhas)} | PDFs com falha: {len(falhas)}")
+    if pasta_cache:
+        print(f"Reaproveitados do cache ('{pasta_cache}'): {n_cache} | Reprocessados: {len(arquivos_pdf) - len(falhas) - n_cache}")
+    valor = instrumentacao.REGISTRO.valor
+    if valor("linhas_total"): # Os contadores só cobrem os PDFs reprocessados (não os do cache)
+        curtos = valor("segmentos_descartados_total", motivo="bloco_curto") + \
+                 valor("segmentos_descartados_total", motivo="paragrafo_curto")
+        print(f"Linhas lidas: {valor('linhas_total'):.0f} | descartadas pela JUNK_REGEX: "
+              f"{valor('linhas_descartadas_total', motivo='junk_regex'):.0f} | "
+              f"trechos com menos de 50 caracteres: {curtos:.0f}")
+    if falhas:
+        print("\nResumo das falhas:")
+        for nome_pdf, erro in falhas:
+            print(f"  [AVISO] {nome_pdf}: {erro}")
     
-    if not todos_os_dados:
+    if not escritor.total:
         print("Nenhum dado foi gerado. Verifique seus PDFs.")
         return
 
-    # Cria um único DataFrame com tudo
-    df = pd.DataFrame(todos_os_dados, columns=["texto", "label"])
-
-    # Salva o arquivo CSV final
-    caminho_csv = os.path.join(pasta_dataset, "dataset_completo_automatico.csv")
-    df.to_csv(caminho_csv, index=False)
-
-    print(f"\nSucesso! {len(df)} exemplos no total salvos em: {caminho_csv}")
-    print("\nAmostra do dataset completo:")
-    print(df.sample(5)) # Mostra 5 exemplos aleatórios
+    print(f"\nSucesso! {escritor.total} exemplos no total salvos em: {caminho_saida}")
+    if armazem is not None:
+        print(f"Armazém por PDF (com página e posição de cada trecho): {pasta_segmentos} "
+              f"({armazem.gravados} partições regravadas, {len(armazem.manifesto) - armazem.gravados} em dia)")
     
     print("\nDistribuição das etiquetas (contagem de exemplos):")
-    print(df['label'].value_counts()) # Mostra quantas de cada etiqueta
+    for label, n in escritor.contagem.most_common(): # Mostra quantas de cada etiqueta
+        print(f"  {label:<20} {n}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extrai e etiqueta automaticamente as bulas da pasta 'data'.")
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None,
+        help="Número de processos para ler os PDFs (padrão: todos os núcleos; 1 = sem pool)."
+    )
+    parser.add_argument(
+        "--pasta-cache", default=PASTA_CACHE,
+        help=f"Pasta do cache incremental por PDF (padrão: {PASTA_CACHE})."
+    )
+    parser.add_argument(
+        "--sem-cache", action="store_true",
+        help="Ignora o cache e reprocessa todos os PDFs."
+    )
+    parser.add_argument(
+        "--formato", choices=FORMATOS_SAIDA, default="csv",
+        help="Formato do dataset gerado (padrão: csv)."
+    )
+    parser.add_argument(
+        "--tamanho-lote", type=int, default=10_000,
+        help="Quantos segmentos acumular antes de gravar no disco (padrão: 10000)."
+    )
+    parser.add_argument(
+        "--extracao", choices=MODOS_EXTRACAO, default="texto",
+        help="'texto': texto corrido + JUNK_REGEX (padrão). 'layout': usa fonte/posição "
+             "para achar títulos e remover cabeçalhos/rodapés."
+    )
+    parser.add_argument(
+        "--sem-segmentos", action="store_true",
+        help=f"Não grava o armazém de segmentos por PDF ({segmentos.PASTA_SEGMENTOS})."
+    )
+    args = parser.parse_args()
+    main(num_workers=args.workers, pasta_cache=None if args.sem_cache else args.pasta_cache,
+         formato=args.formato, tamanho_lote=args.tamanho_lote, extracao=args.extracao,
+         pasta_segmentos=None if args.sem_segmentos else segmentos.PASTA_SEGMENTOS)
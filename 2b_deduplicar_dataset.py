@@ -0,0 +1,202 @@
+import os
+import re
+import json
+import time
+import argparse
+from collections import Counter
+import numpy as np
+import pandas as pd
+import instrumentacao
+from utilitarios import hash_arquivo
+
+# --- 1. CONFIGURAÇÃO ---
+ARQUIVO_ENTRADA = os.path.join("dataset", "dataset_completo_automatico.csv")
+ARQUIVO_SAIDA = os.path.join("dataset", "dataset_deduplicado.csv")
+ARQUIVO_RELATORIO = os.path.join("relatorios", "deduplicacao.json")
+
+# Bulas de genéricos repetem o mesmo texto com pequenas trocas (nome do fabricante,
+# endereço, "comprimido"/"comprimidos"...). Comparar todos os pares seria quadrático;
+# o MinHash resume cada parágrafo numa assinatura e o LSH só compara parágrafos
+# que caem no mesmo "balde" em pelo menos uma banda.
+TAMANHO_SHINGLE = 3     # Palavras por shingle
+NUM_PERMUTACOES = 128   # Tamanho da assinatura MinHash
+BANDAS = 16             # 16 bandas x 8 linhas: Jaccard >= ~0.7 quase sempre vira candidato
+LIMIAR_JACCARD = 0.8    # Similaridade (estimada) mínima para considerar duplicata
+LINHAS_POR_BLOCO = 20_000  # Parágrafos por bloco no cálculo das assinaturas (limita a memória)
+RANDOM_STATE = 42
+
+PALAVRA_REGEX = re.compile(r"\w+")
+
+
+# --- 2. MINHASH ---
+def ids_palavras(texto: str, vocabulario: dict) -> np.ndarray:
+    """Troca cada palavra (minúscula) por um número; palavras novas ganham o próximo número."""
+    palavras = PALAVRA_REGEX.findall(texto.lower())
+    return np.fromiter((vocabulario.setdefault(p, len(vocabulario) + 1) for p in palavras),
+                       dtype=np.uint64, count=len(palavras))
+
+
+def shingles(ids: np.ndarray) -> np.ndarray:
+    """Hash (32 bits) de cada sequência de TAMANHO_SHINGLE palavras seguidas."""
+    if len(ids) < TAMANHO_SHINGLE:
+        ids = np.concatenate([ids, np.zeros(TAMANHO_SHINGLE - len(ids), dtype=np.uint64)])
+    n = len(ids) - TAMANHO_SHINGLE + 1
+    h = np.zeros(n, dtype=np.uint64)
+    for k in range(TAMANHO_SHINGLE):
+        # Multiplicação com overflow em 64 bits (proposital): mistura rápida dos ids
+        h = h * np.uint64(0x9E3779B97F4A7C15) + ids[k:k + n]
+    return h >> np.uint64(32)
+
+
+def assinaturas_minhash(textos, vocabulario: dict, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Assinatura MinHash (NUM_PERMUTACOES x uint32) de cada texto.
+    Todos os shingles do bloco ficam num único vetor; para cada permutação,
+    np.minimum.reduceat tira o mínimo por texto de uma vez só.
+    """
+    blocos = [shingles(ids_palavras(texto, vocabulario)) for texto in textos]
+    inicios = np.cumsum([0] + [len(bloco) for bloco in blocos[:-1]])
+    todos = np.concatenate(blocos)
+
+    assinaturas = np.empty((len(textos), NUM_PERMUTACOES), dtype=np.uint32)
+    for j in range(NUM_PERMUTACOES):
+        # Hash universal "multiply-shift": os 32 bits altos de (a*x + b) mod 2^64
+        permutado = (a[j] * todos + b[j]) >> np.uint64(32)
+        assinaturas[:, j] = np.minimum.reduceat(permutado, inicios)
+    return assinaturas
+
+
+# --- 3. LSH + AGRUPAMENTO ---
+def raiz(pai: np.ndarray, i: int) -> int:
+    while pai[i] != i:
+        pai[i] = pai[pai[i]] # Compressão de caminho (pela metade)
+        i = pai[i]
+    return i
+
+
+def agrupar_duplicatas(assinaturas: np.ndarray) -> np.ndarray:
+    """
+    Retorna, para cada linha, o id do grupo de quase-duplicatas (o menor índice do grupo).
+    Em cada banda, as linhas com a mesma fatia da assinatura caem no mesmo balde; cada
+    linha só é comparada com a primeira do seu balde (custo linear, mesmo para um texto
+    repetido milhares de vezes) e é unida a ela se a similaridade estimada passar do limiar.
+    """
+    n = len(assinaturas)
+    pai = np.arange(n)
+    linhas_por_banda = NUM_PERMUTACOES // BANDAS
+
+    for banda in range(BANDAS):
+        fatia = np.ascontiguousarray(assinaturas[:, banda * linhas_por_banda:(banda + 1) * linhas_por_banda])
+        _, primeiro, balde = np.unique(fatia.view(np.dtype((np.void, fatia.shape[1] * 4))).ravel(),
+                                       return_index=True, return_inverse=True)
+        representante = primeiro[balde] # Primeira linha (menor índice) do balde de cada linha
+        candidatos = np.nonzero(representante != np.arange(n))[0]
+        if len(candidatos) == 0:
+            continue
+        # Fração de posições iguais na assinatura = estimativa do Jaccard entre os dois textos
+        similaridade = (assinaturas[candidatos] == assinaturas[representante[candidatos]]).mean(axis=1)
+        aceitos = candidatos[similaridade >= LIMIAR_JACCARD]
+        for i, j in zip(aceitos, representante[aceitos]):
+            ri, rj = raiz(pai, i), raiz(pai, j)
+            if ri != rj:
+                pai[max(ri, rj)] = min(ri, rj)
+
+    grupos = np.array([raiz(pai, i) for i in range(n)])
+    # O id do grupo passa a ser o menor índice dele (a primeira ocorrência no CSV)
+    return pd.Series(np.arange(n)).groupby(grupos).transform("min").to_numpy()
+
+
+# --- 4. RELATÓRIO ---
+def relatorio_grupos(df: pd.DataFrame, grupo: np.ndarray, segundos: float, top: int = 10) -> dict:
+    tamanhos = pd.Series(grupo).value_counts()
+    repetidos = tamanhos[tamanhos > 1]
+    removidos = df[grupo != np.arange(len(df))]
+
+    labels_por_grupo = df.groupby(grupo)["label"].nunique()
+    maiores = []
+    for id_grupo, tamanho in repetidos.head(top).items():
+        maiores.append({
+            "tamanho": int(tamanho),
+            "labels": dict(Counter(df["label"].to_numpy()[grupo == id_grupo])),
+            "exemplo": df["texto"].iloc[id_grupo][:150],
+        })
+
+    return {
+        "linhas_entrada": int(len(df)),
+        "linhas_saida": int(len(df) - len(removidos)),
+        "linhas_removidas": int(len(removidos)),
+        "grupos_com_duplicatas": int(len(repetidos)),
+        "grupos_com_labels_diferentes": int((labels_por_grupo > 1).sum()),
+        "removidas_por_label": {k: int(v) for k, v in removidos["label"].value_counts().items()},
+        "maiores_grupos": maiores,
+        "parametros": {
+            "tamanho_shingle": TAMANHO_SHINGLE, "num_permutacoes": NUM_PERMUTACOES,
+            "bandas": BANDAS, "limiar_jaccard": LIMIAR_JACCARD,
+        },
+        "segundos": segundos,
+    }
+
+
+# --- 5. EXECUÇÃO PRINCIPAL ---
+def main(entrada: str = ARQUIVO_ENTRADA, saida: str = ARQUIVO_SAIDA):
+    print(f"Carregando dataset de: {entrada}")
+    hash_entrada = hash_arquivo(entrada)
+    df = pd.read_parquet(entrada) if entrada.endswith(".parquet") else pd.read_csv(entrada)
+    df = df.reset_index(drop=True)
+
+    inicio = time.perf_counter()
+    rng = np.random.default_rng(RANDOM_STATE)
+    a = rng.integers(1, 2 ** 63, NUM_PERMUTACOES, dtype=np.uint64) | np.uint64(1) # Ímpar
+    b = rng.integers(0, 2 ** 63, NUM_PERMUTACOES, dtype=np.uint64)
+
+    print(f"Calculando assinaturas MinHash de {len(df)} parágrafos...")
+    vocabulario = {}
+    textos = df["texto"].astype(str).tolist()
+    with instrumentacao.medir("deduplicacao", passada="minhash"):
+        assinaturas = np.concatenate([
+            assinaturas_minhash(textos[i:i + LINHAS_POR_BLOCO], vocabulario, a, b)
+            for i in range(0, len(textos), LINHAS_POR_BLOCO)
+        ]) if textos else np.empty((0, NUM_PERMUTACOES), dtype=np.uint32)
+
+    print(f"Agrupando quase-duplicatas (LSH: {BANDAS} bandas, Jaccard >= {LIMIAR_JACCARD})...")
+    with instrumentacao.medir("deduplicacao", passada="lsh"):
+        grupo = agrupar_duplicatas(assinaturas)
+    segundos = time.perf_counter() - inicio
+
+    # Fica só a primeira ocorrência de cada grupo, na ordem original
+    df_saida = df[grupo == np.arange(len(df))]
+    df_saida.to_csv(saida, index=False)
+
+    relatorio = relatorio_grupos(df, grupo, segundos)
+    # De que dataset saiu o deduplicado: o 3_balancear_dataset.py confere pelo hash
+    relatorio["origem"] = {"entrada": entrada, "saida": saida, "sha256_entrada": hash_entrada}
+    for label, n in relatorio["removidas_por_label"].items():
+        instrumentacao.contar("exemplos_descartados_total", n, etapa="deduplicacao", label=label)
+    os.makedirs(os.path.dirname(ARQUIVO_RELATORIO), exist_ok=True)
+    with open(ARQUIVO_RELATORIO, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+
+    print("\n--- SUCESSO! ---")
+    print(f"Dataset sem duplicatas salvo em: {saida}")
+    print(f"Linhas: {relatorio['linhas_entrada']} -> {relatorio['linhas_saida']} "
+          f"({relatorio['linhas_removidas']} removidas, em {relatorio['grupos_com_duplicatas']} grupos) "
+          f"em {segundos:.1f} s")
+    print(f"Grupos com etiquetas diferentes (o regex discordou de si mesmo): "
+          f"{relatorio['grupos_com_labels_diferentes']}")
+    print("\nRemovidas por etiqueta:")
+    for label, n in relatorio["removidas_por_label"].items():
+        print(f"  {label}: {n}")
+    print("\nMaiores grupos:")
+    for g in relatorio["maiores_grupos"]:
+        print(f"  {g['tamanho']:>5}x  {g['exemplo'][:80]!r}")
+    print(f"\nRelatório salvo em: {ARQUIVO_RELATORIO}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Remove parágrafos quase duplicados (MinHash + LSH) antes do balanceamento."
+    )
+    parser.add_argument("--entrada", default=ARQUIVO_ENTRADA, help=f"CSV ou Parquet de entrada (padrão: {ARQUIVO_ENTRADA})")
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA, help=f"CSV de saída (padrão: {ARQUIVO_SAIDA})")
+    args = parser.parse_args()
+    main(args.entrada, args.saida)
@@ -0,0 +1,68 @@
+import os
+import time
+import argparse
+from itertools import groupby
+from operator import attrgetter
+
+import instrumentacao
+import indice_textual
+import segmentos
+from segmentos import Segmento
+
+# --- 1. CONFIGURAÇÃO ---
+# Índice invertido da busca por palavras (indice_textual.py) sobre os mesmos trechos
+# etiquetados do dataset_completo_automatico.csv, mas sabendo de que PDF e de que página
+# veio cada um. Os trechos vêm do armazém por PDF que o 2_etiquetar_automatico.py grava
+# (segmentos.py): só as colunas usadas pelo índice são lidas, e nenhum PDF é aberto.
+PASTA_SEGMENTOS = segmentos.PASTA_SEGMENTOS
+PASTA_INDICE = indice_textual.PASTA_INDICE
+COLUNAS = ["documento", "texto", "label", "pagina"]
+
+
+def documentos(pasta: str):
+    """(nome, [Segmento]) de cada PDF do armazém, em ordem de nome."""
+    lotes = segmentos.iterar_lotes(pasta, colunas=COLUNAS)
+    linhas = (linha for df in lotes for linha in df.itertuples(index=False))
+    for nome, grupo in groupby(linhas, key=attrgetter("documento")):
+        yield nome, [Segmento(linha.texto, linha.label, nome, linha.pagina) for linha in grupo]
+
+
+# --- 2. EXECUÇÃO ---
+def main(pasta_segmentos: str = PASTA_SEGMENTOS):
+    manifesto = segmentos.ler_manifesto(pasta_segmentos)
+    if not manifesto:
+        print(f"Armazém de segmentos não encontrado em '{pasta_segmentos}'. "
+              f"Rode antes: python 2_etiquetar_automatico.py")
+        return
+    print(f"--- Indexando os trechos de {len(manifesto)} PDFs em '{PASTA_INDICE}' ---")
+
+    with instrumentacao.medir("indexacao_texto"):
+        metadados = indice_textual.construir_indice(
+            PASTA_INDICE, documentos(pasta_segmentos),
+            metadados={"segmentos": pasta_segmentos,
+                       "regras": sorted({registro["regras"] for registro in manifesto.values()})},
+        )
+
+    print("\n--- Índice pronto! ---")
+    print(f"PDFs: {len(metadados['documentos'])} | trechos: {metadados['n_trechos']} | "
+          f"termos: {metadados['n_termos']} | {metadados['segundos_construcao']:.1f} s")
+    tamanho = sum(os.path.getsize(os.path.join(PASTA_INDICE, nome)) for nome in os.listdir(PASTA_INDICE))
+    print(f"Tamanho no disco: {tamanho / 1024 ** 2:.1f} MB")
+
+    # Uma busca de exemplo, para conferir a latência (abrir o índice + buscar)
+    t0 = time.perf_counter()
+    indice = indice_textual.IndiceTextual(PASTA_INDICE)
+    t1 = time.perf_counter()
+    resposta = indice.buscar("alergia", label="CONTRAINDICACAO")
+    t2 = time.perf_counter()
+    print(f"\nBusca de exemplo ('alergia' em CONTRAINDICACAO): {resposta['total']} trechos em "
+          f"{len(resposta['por_documento'])} PDFs | abrir o índice {(t1 - t0) * 1000:.1f} ms, "
+          f"buscar {(t2 - t1) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o índice de busca por palavras dos trechos etiquetados.")
+    parser.add_argument("--segmentos", default=PASTA_SEGMENTOS,
+                        help=f"Armazém de segmentos do 2_etiquetar_automatico.py (padrão: {PASTA_SEGMENTOS})")
+    args = parser.parse_args()
+    main(pasta_segmentos=args.segmentos)
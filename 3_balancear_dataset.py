@@ -1,44 +1,221 @@
 import pandas as pd
+import numpy as np
 import os
+import json
+import sys
+import argparse
+import instrumentacao
+import segmentos
+from utilitarios import hash_arquivo
 
 # --- 1. CONFIGURAÇÃO ---
-ARQUIVO_ENTRADA = os.path.join("dataset", "dataset_completo_automatico.csv")
+ARQUIVO_COMPLETO = os.path.join("dataset", "dataset_completo_automatico.csv")
+# Saída do 2b_deduplicar_dataset.py. Se ela não existir, usa o dataset completo (com duplicatas):
+# de preferência do armazém por PDF do 2_etiquetar_automatico.py, que é lido por colunas
+ARQUIVO_DEDUPLICADO = os.path.join("dataset", "dataset_deduplicado.csv")
+# Relatório do 2b_deduplicar_dataset.py: diz de que dataset (hash) saiu o deduplicado
+RELATORIO_DEDUPLICACAO = os.path.join("relatorios", "deduplicacao.json")
+PASTA_SEGMENTOS = segmentos.PASTA_SEGMENTOS
 ARQUIVO_SAIDA = os.path.join("dataset", "dataset_final_balanceado.csv")
+# Pesos por classe para a loss do treino (lido pelo 4_treinar_modelo.py, se existir)
+ARQUIVO_PESOS = os.path.join("dataset", "pesos_classes.json")
 
 # Um "random_state" garante que a amostra aleatória seja sempre a mesma
 RANDOM_STATE = 42
 
-# --- 2. CARREGAR OS DADOS ---
-print(f"Carregando dataset de: {ARQUIVO_ENTRADA}")
-df = pd.read_csv(ARQUIVO_ENTRADA)
+# A entrada é lida em pedaços: só a amostra escolhida fica na memória
+TAMANHO_CHUNK = 100_000
 
-# --- 3. SEPARAR AS CLASSES ---
-df_importante = df[df['label'] != 'OUTROS']
-df_outros = df[df['label'] == 'OUTROS']
 
-n_importante = len(df_importante)
-n_outros = len(df_outros)
+def arquivo_entrada() -> str:
+    """O dataset deduplicado, se existir; senão o armazém de segmentos (ou, sem ele, o CSV
+    completo). Checado na hora de rodar (não no import): no pipeline.py a deduplicação
+    pode ter acabado de gerar o arquivo."""
+    if os.path.exists(ARQUIVO_DEDUPLICADO):
+        return ARQUIVO_DEDUPLICADO
+    if segmentos.ler_manifesto(PASTA_SEGMENTOS):
+        return PASTA_SEGMENTOS
+    return ARQUIVO_COMPLETO
 
-print(f"Encontrados {n_importante} exemplos importantes.")
-print(f"Encontrados {n_outros} exemplos 'OUTROS'.")
 
-# --- 4. BALANCEAMENTO (UNDERSAMPLING) ---
-# Vamos pegar uma amostra aleatória de 'OUTROS' com o mesmo tamanho
-# da nossa classe 'importante'
-print(f"Balanceando: Pegando {n_importante} exemplos aleatórios de 'OUTROS'...")
-df_outros_amostra = df_outros.sample(n=n_importante, random_state=RANDOM_STATE)
+def deduplicado_em_dia():
+    """
+    True se o deduplicado saiu do dataset etiquetado de agora; False se o dataset mudou
+    depois da deduplicação; None se não dá para saber (sem o relatório do 2b).
+    Compara o hash anotado no relatório, não as datas: a etiquetagem regrava o CSV
+    mesmo quando o conteúdo não muda, e aí o pipeline.py (com razão) pula a deduplicação.
+    """
+    try:
+        with open(RELATORIO_DEDUPLICACAO, encoding="utf-8") as f:
+            origem = json.load(f).get("origem") or {}
+    except (OSError, ValueError):
+        return None
+    if origem.get("saida") != ARQUIVO_DEDUPLICADO or not os.path.exists(origem.get("entrada", "")):
+        return None
+    return hash_arquivo(origem["entrada"]) == origem["sha256_entrada"]
 
-# --- 5. JUNTAR E EMBARALHAR ---
-df_balanceado = pd.concat([df_importante, df_outros_amostra])
 
-# Embaralha o dataset final (MUITO importante para o treino!)
-df_balanceado = df_balanceado.sample(frac=1, random_state=RANDOM_STATE).reset_index(drop=True)
+def ler_em_pedacos(caminho: str, colunas=None):
+    """DataFrames de até TAMANHO_CHUNK linhas, com só as 'colunas' pedidas (padrão: texto e
+    label), do CSV ou do armazém de segmentos (uma pasta)."""
+    if os.path.isdir(caminho):
+        return segmentos.iterar_lotes(caminho, colunas=colunas or ["texto", "label"], tamanho_lote=TAMANHO_CHUNK)
+    return pd.read_csv(caminho, usecols=colunas, chunksize=TAMANHO_CHUNK)
 
-# --- 6. SALVAR ---
-df_balanceado.to_csv(ARQUIVO_SAIDA, index=False)
 
-print("\n--- SUCESSO! ---")
-print(f"Dataset final balanceado salvo em: {ARQUIVO_SAIDA}")
-print(f"Total de exemplos: {len(df_balanceado)}")
-print("\nNova distribuição das etiquetas:")
-print(df_balanceado['label'].value_counts())
\ No newline at end of file
+# --- 2. CONTAGEM (1ª passada, só a coluna de etiqueta) ---
+def contar_classes(caminho: str) -> pd.Series:
+    contagem = pd.Series(dtype="int64")
+    for chunk in ler_em_pedacos(caminho, ["label"]):
+        contagem = contagem.add(chunk["label"].value_counts(), fill_value=0)
+    return contagem.astype("int64").sort_values(ascending=False)
+
+
+# --- 3. QUANTOS EXEMPLOS DE CADA CLASSE ---
+def calcular_alvos(disponiveis: pd.Series, limite=None, limites_classe=None,
+                   proporcoes=None, usar_pesos=False) -> pd.Series:
+    """
+    Decide quantos exemplos manter de cada classe.
+
+    - proporcoes ({label: r}): a maior amostra possível com as classes na razão pedida
+      (classes não listadas valem 1). Ex: {"OUTROS": 2} = o dobro de OUTROS em relação às outras.
+      Razão 0 tira a classe da amostra; razões negativas (ou todas 0) são erro.
+    - Sem proporções e sem pesos: a regra original, OUTROS reduzido ao total das outras classes.
+    - usar_pesos: não descarta nada por causa do desbalanceamento (a loss é que compensa).
+    - limite / limites_classe ({label: n}): teto por classe, aplicado por último.
+    """
+    alvos = disponiveis.copy()
+    if proporcoes:
+        razoes = pd.Series({label: float(proporcoes.get(label, 1.0)) for label in disponiveis.index})
+        invalidas = razoes[~np.isfinite(razoes) | (razoes < 0)]
+        if len(invalidas):
+            raise ValueError(f"Proporções precisam ser números >= 0: {invalidas.to_dict()}")
+        if not (razoes > 0).any():
+            raise ValueError("Todas as proporções são 0: nenhuma classe sobraria.")
+        positivas = razoes > 0
+        # A classe mais "escassa" define o tamanho (as de razão 0 ficam de fora da conta)
+        escala = (disponiveis[positivas] / razoes[positivas]).min()
+        alvos = np.floor(razoes * escala).astype("int64")
+    elif not usar_pesos and "OUTROS" in alvos.index:
+        alvos["OUTROS"] = min(alvos["OUTROS"], alvos.drop("OUTROS").sum())
+
+    if limite is not None:
+        alvos = alvos.clip(upper=limite)
+    for label, n in (limites_classe or {}).items():
+        if label in alvos.index:
+            alvos[label] = min(alvos[label], n)
+    return alvos
+
+
+def pesos_classes(contagem: pd.Series) -> dict:
+    """Pesos "balanceados" (como no scikit-learn): total / (nº de classes * exemplos da classe)."""
+    contagem = contagem[contagem > 0]
+    return {label: float(contagem.sum() / (len(contagem) * n)) for label, n in contagem.items()}
+
+
+# --- 4. AMOSTRAGEM (2ª passada) ---
+def amostrar(caminho: str, disponiveis: pd.Series, alvos: pd.Series) -> pd.DataFrame:
+    """
+    Sorteia ANTES de ler o texto quais posições de cada classe ficam (ex: o 3º, o 17º...
+    exemplo de POSOLOGIA) e depois percorre a entrada em pedaços, guardando só essas linhas.
+    A posição de cada linha dentro da classe sai de um groupby().cumcount() por pedaço.
+    """
+    rng = np.random.default_rng(RANDOM_STATE)
+    sorteados = {
+        label: np.sort(rng.choice(disponiveis[label], size=alvos[label], replace=False))
+        for label in disponiveis.index
+    }
+    vistos = pd.Series(0, index=disponiveis.index, dtype="int64")
+
+    partes = []
+    for chunk in ler_em_pedacos(caminho):
+        posicao = chunk.groupby("label").cumcount().to_numpy() + vistos.reindex(chunk["label"]).to_numpy()
+        manter = np.zeros(len(chunk), dtype=bool)
+        for label, indices in chunk.groupby("label").indices.items():
+            manter[indices] = np.isin(posicao[indices], sorteados[label])
+        partes.append(chunk[manter])
+        vistos = vistos.add(chunk["label"].value_counts(), fill_value=0).astype("int64")
+    return pd.concat(partes, ignore_index=True)
+
+
+def ler_pares(valores, tipo):
+    """Converte ["OUTROS=2", "POSOLOGIA=500"] em {"OUTROS": 2, ...}."""
+    pares = {}
+    for valor in valores or []:
+        label, _, numero = valor.partition("=")
+        pares[label.strip()] = tipo(numero)
+    return pares
+
+
+# --- 5. EXECUÇÃO PRINCIPAL ---
+def main(limite=None, limites_classe=None, proporcoes=None, usar_pesos=False):
+    entrada = arquivo_entrada()
+    if entrada == ARQUIVO_DEDUPLICADO:
+        em_dia = deduplicado_em_dia()
+        if em_dia is False:
+            # Voltar para o dataset com duplicatas sem avisar mudaria o treino sem ninguém ver
+            sys.exit(f"Erro: {ARQUIVO_DEDUPLICADO} saiu de uma versão anterior do dataset etiquetado. "
+                     f"Rode de novo: python 2b_deduplicar_dataset.py (ou apague o arquivo para "
+                     f"balancear com as duplicatas).")
+        if em_dia is None:
+            print(f"[AVISO] Sem {RELATORIO_DEDUPLICACAO}: não dá para conferir se {ARQUIVO_DEDUPLICADO} "
+                  f"é do dataset etiquetado atual. Usando mesmo assim.")
+    print(f"Carregando dataset de: {entrada}")
+    with instrumentacao.medir("balanceamento", passada="contagem"):
+        disponiveis = contar_classes(entrada)
+    alvos = calcular_alvos(disponiveis, limite, limites_classe, proporcoes, usar_pesos)
+
+    print(f"\n{'etiqueta':<18}{'disponíveis':>12}{'mantidos':>10}")
+    for label in disponiveis.index:
+        print(f"{label:<18}{disponiveis[label]:>12}{alvos[label]:>10}")
+
+    with instrumentacao.medir("balanceamento", passada="amostragem"):
+        df_balanceado = amostrar(entrada, disponiveis, alvos)
+    for label in disponiveis.index:
+        instrumentacao.contar("exemplos_mantidos_total", int(alvos[label]), etapa="balanceamento", label=label)
+        instrumentacao.contar("exemplos_descartados_total", int(disponiveis[label] - alvos[label]),
+                              etapa="balanceamento", label=label)
+
+    # Embaralha o dataset final (MUITO importante para o treino!)
+    df_balanceado = df_balanceado.sample(frac=1, random_state=RANDOM_STATE).reset_index(drop=True)
+    df_balanceado.to_csv(ARQUIVO_SAIDA, index=False)
+
+    if usar_pesos:
+        pesos = pesos_classes(df_balanceado["label"].value_counts())
+        with open(ARQUIVO_PESOS, "w", encoding="utf-8") as f:
+            json.dump(pesos, f, indent=2, ensure_ascii=False)
+        print(f"\nPesos por classe (para a loss do treino) salvos em: {ARQUIVO_PESOS}")
+        for label, peso in pesos.items():
+            print(f"  {label}: {peso:.3f}")
+    elif os.path.exists(ARQUIVO_PESOS):
+        os.remove(ARQUIVO_PESOS) # Pesos de uma execução anterior não valem para este dataset
+
+    print("\n--- SUCESSO! ---")
+    print(f"Dataset final balanceado salvo em: {ARQUIVO_SAIDA}")
+    print(f"Total de exemplos: {len(df_balanceado)}")
+    print("\nNova distribuição das etiquetas:")
+    print(df_balanceado['label'].value_counts())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Balanceia o dataset etiquetado. Sem opções: reduz OUTROS ao total das outras classes."
+    )
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de exemplos por classe")
+    parser.add_argument("--limite-classe", action="append", metavar="LABEL=N",
+                        help="Máximo para uma classe (pode repetir). Ex: --limite-classe OUTROS=300")
+    parser.add_argument("--proporcao", action="append", metavar="LABEL=R",
+                        help="Razão desejada entre as classes (as não listadas valem 1). Ex: --proporcao OUTROS=2")
+    parser.add_argument("--pesos", action="store_true",
+                        help="Não descarta exemplos pelo desbalanceamento; gera pesos por classe para a loss do treino")
+    args = parser.parse_args()
+    proporcoes = ler_pares(args.proporcao, float)
+    negativas = {label: r for label, r in proporcoes.items() if not r >= 0}
+    if negativas:
+        parser.error(f"--proporcao precisa de razões >= 0: {negativas}")
+    main(
+        limite=args.limite,
+        limites_classe=ler_pares(args.limite_classe, int),
+        proporcoes=proporcoes,
+        usar_pesos=args.pesos,
+    )
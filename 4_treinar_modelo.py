@@ -2,11 +2,44 @@ import pandas as pd
 from datasets import Dataset
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import os
+import json
+import hashlib
+import numpy as np
+import torch
+from datasets import load_from_disk
+from transformers import TrainingArguments, Trainer, DataCollatorWithPadding
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+import instrumentacao
+from utilitarios import hash_arquivo
 
 # --- 1. CONFIGURAÇÃO ---
 ARQUIVO_DATASET = os.path.join("dataset", "dataset_final_balanceado.csv")
 MODELO_BERT = "neuralmind/bert-base-portuguese-cased"
 RANDOM_STATE = 42
+MAX_LENGTH = 128 # Limite de tokens por exemplo (o resto é cortado)
+
+# Textos maiores que MAX_LENGTH: False = corta no limite (padrão). True = janelas
+# sobrepostas de MAX_LENGTH tokens (STRIDE_JANELA tokens em comum entre vizinhas),
+# cada uma um exemplo de treino com a etiqueta do texto. O modo fica salvo no config
+# do modelo, e o classificador.py passa a juntar os logits das janelas na inferência.
+JANELAS_DESLIZANTES = False
+STRIDE_JANELA = 32
+ARQUIVO_RELATORIO_TOKENS = os.path.join("relatorios", "comprimento_tokens.json")
+# Gerado pelo 3_balancear_dataset.py --pesos: pesos por classe para a loss
+ARQUIVO_PESOS = os.path.join("dataset", "pesos_classes.json")
+
+# Cache do dataset já tokenizado e dividido (arquivos Arrow, lidos via memory-map).
+# Mudar só hiperparâmetros de treino reaproveita o cache; mudar o CSV, o tokenizador,
+# o MAX_LENGTH ou o split gera uma pasta nova. Apague a pasta para forçar.
+PASTA_CACHE_TOKENIZACAO = ".cache_tokenizacao"
+VERSAO_TOKENIZACAO = 2 # Aumente ao mudar a tokenizar_funcao
+
+# Define onde o modelo será salvo
+DIRETORIO_SAIDA = "modelo_bulario_bertimbau"
+
+# Se o seu PC for um pouco mais lento ou não tiver uma placa de vídeo (GPU) forte,
+# mude o 'per_device_train_batch_size' de 16 para 8 ou 4.
+TAMANHO_LOTE = 16 # Mude para 8 ou 4 se tiver problemas de memória
 
 # Nossas 6 etiquetas (IMPORTANTE: A ordem deve ser a mesma)
 LABELS = ["COMPOSICAO", "INDICACAO", "CONTRAINDICACAO", "POSOLOGIA", "EFEITOS_ADVERSOS", "OUTROS"]
@@ -16,43 +49,76 @@ label2id = {label: i for i, label in enumerate(LABELS)}
 # Mapear de número (ex: 3) para string (ex: "POSOLOGIA")
 id2label = {i: label for i, label in enumerate(LABELS)}
 
-print(f"--- Carregando dataset: {ARQUIVO_DATASET} ---")
-df = pd.read_csv(ARQUIVO_DATASET)
+def ler_dataframe():
+    """O dataset com as etiquetas já convertidas em números (sem imprimir nada)."""
+    df = pd.read_csv(ARQUIVO_DATASET)
+
+    # O modelo não entende "POSOLOGIA", ele entende '3'. Vamos converter.
+    df['label'] = df['label'].map(label2id)
+
+    # Remover qualquer linha que não foi mapeada (segurança)
+    df = df.dropna(subset=['label'])
+    df['label'] = df['label'].astype(int)
+    return df
+
+
+def dividir_treino_teste(df):
+    """80% treino, 20% teste. Depende só da semente e do nº de linhas: refazer dá a mesma divisão."""
+    return Dataset.from_pandas(df).train_test_split(test_size=0.2, seed=RANDOM_STATE)
+
+
+def textos_do_treino() -> set:
+    """
+    Textos que o modelo viu no treino (os 80% da divisão acima), refazendo a divisão sem
+    tokenizar. Usado pelo 4b_destilar_modelo.py para não avaliar o professor com eles.
+    Só vale enquanto o dataset_final_balanceado.csv for o mesmo do último treino.
+    """
+    return set(dividir_treino_teste(ler_dataframe())["train"]["texto"])
+
 
-# O modelo não entende "POSOLOGIA", ele entende '3'. Vamos converter.
-df['label'] = df['label'].map(label2id)
+def carregar_dataframe():
+    print(f"--- Carregando dataset: {ARQUIVO_DATASET} ---")
+    df = ler_dataframe()
 
-# Remover qualquer linha que não foi mapeada (segurança)
-df = df.dropna(subset=['label'])
-df['label'] = df['label'].astype(int)
+    print("\n--- Dataset carregado e mapeado ---")
+    print(df.sample(5, random_state=42)) # Mostra 5 linhas aleatórias com o novo label numérico
+    print("\nNova distribuição (numérica):")
+    print(df['label'].value_counts().sort_index())
+    return df
 
-print("\n--- Dataset carregado e mapeado ---")
-print(df.sample(5, random_state=42)) # Mostra 5 linhas aleatórias com o novo label numérico
-print("\nNova distribuição (numérica):")
-print(df['label'].value_counts().sort_index())
+
+def pasta_cache_tokenizacao(nome_tokenizador: str) -> str:
+    """Pasta do cache: hash do CSV + tokenizador + MAX_LENGTH + split + versão."""
+    partes = [hash_arquivo(ARQUIVO_DATASET), nome_tokenizador, str(MAX_LENGTH),
+              str(RANDOM_STATE), str(VERSAO_TOKENIZACAO), str(LABELS),
+              f"janelas:{STRIDE_JANELA}" if JANELAS_DESLIZANTES else "corte"]
+    chave = hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(PASTA_CACHE_TOKENIZACAO, chave)
 
 
 # --- 2. "MATRICULANDO" O BERTimbau ---
-print(f"\n--- Baixando o modelo: {MODELO_BERT} ---")
-print("(Isso pode demorar alguns minutos na primeira vez...)")
-
-# 1. O "Dicionário" (Tokenizador)
-# Ele sabe transformar "remédio" em números (ex: 8372)
-tokenizer = AutoTokenizer.from_pretrained(MODELO_BERT)
-
-# 2. O "Cérebro" (O Modelo)
-# Carregamos o modelo e avisamos que ele precisa ter 6 saídas (labels)
-model = AutoModelForSequenceClassification.from_pretrained(
-    MODELO_BERT,
-    num_labels=len(LABELS), # Nosso caso: 6
-    id2label=id2label,
-    label2id=label2id,
-    use_safetensors=True
-)
-
-print("\n--- SUCESSO! ---")
-print("Modelo BERTimbau e Tokenizador carregados na memória.")
-print(f"Pronto para a próxima etapa: Tokenizar e Treinar!")
+def carregar_modelo():
+    print(f"\n--- Baixando o modelo: {MODELO_BERT} ---")
+    print("(Isso pode demorar alguns minutos na primeira vez...)")
+
+    # 1. O "Dicionário" (Tokenizador)
+    # Ele sabe transformar "remédio" em números (ex: 8372)
+    tokenizer = AutoTokenizer.from_pretrained(MODELO_BERT)
+
+    # 2. O "Cérebro" (O Modelo)
+    # Carregamos o modelo e avisamos que ele precisa ter 6 saídas (labels)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        MODELO_BERT,
+        num_labels=len(LABELS), # Nosso caso: 6
+        id2label=id2label,
+        label2id=label2id,
+        use_safetensors=True
+    )
+
+    print("\n--- SUCESSO! ---")
+    print("Modelo BERTimbau e Tokenizador carregados na memória.")
+    print(f"Pronto para a próxima etapa: Tokenizar e Treinar!")
+    return tokenizer, model
 
 # --- FIM DO CARREGAMENTO ---
 # O código abaixo cuida de todo o processo de Fine-Tuning:
@@ -64,33 +130,107 @@ print(f"Pronto para a próxima etapa: Tokenizar e Treinar!")
 # 6. (transformers): Salva o modelo treinado na pasta "modelo_bulario_bertimbau".
 # ---
 
-import numpy as np
-from datasets import Dataset, DatasetDict
-from transformers import TrainingArguments, Trainer
-from sklearn.metrics import accuracy_score, f1_score, precision_recall_fscore_support
-
 # --- 3. PREPARANDO OS DADOS PARA O TREINO ---
 
-print("\n--- Convertendo DataFrame para Dataset Hugging Face ---")
-# Converte o DataFrame do pandas para o formato que o 'transformers' gosta
-dataset = Dataset.from_pandas(df)
-
-print("--- Tokenizando o dataset (convertendo texto em números) ---")
-# Esta função vai pegar o texto (ex: "Tome 2 comprimidos") e quebrar em "tokens"
-def tokenizar_funcao(exemplos):
-    # 'padding="max_length"' garante que todas as frases tenham o mesmo tamanho
-    # 'truncation=True' corta frases que são longas demais
-    return tokenizer(exemplos["texto"], padding="max_length", truncation=True, max_length=128)
-
-# Aplica a função de tokenização em todo o dataset de uma vez (rápido!)
-dataset_tokenizado = dataset.map(tokenizar_funcao, batched=True)
-
-print("--- Divindo em Treino e Teste (80% para estudar, 20% para a prova) ---")
-# 'train_test_split' divide nosso dataset. 80% treino, 20% teste
-dataset_dividido = dataset_tokenizado.train_test_split(test_size=0.2, seed=RANDOM_STATE)
+def tokenizar_funcao(exemplos, tokenizer):
+    # Esta função vai pegar o texto (ex: "Tome 2 comprimidos") e quebrar em "tokens"
+    # 'truncation=True' corta frases que são longas demais.
+    # Sem padding aqui: o DataCollatorWithPadding (seção 5) completa cada lote só até
+    # o maior exemplo DELE, em vez de levar todo mundo até MAX_LENGTH tokens.
+    if not JANELAS_DESLIZANTES:
+        return tokenizer(exemplos["texto"], truncation=True, max_length=MAX_LENGTH)
+
+    # Modo janelas: um texto longo vira várias linhas (uma por janela), todas com a etiqueta dele
+    codificado = tokenizer(exemplos["texto"], truncation=True, max_length=MAX_LENGTH,
+                           stride=STRIDE_JANELA, return_overflowing_tokens=True)
+    dono = codificado.pop("overflow_to_sample_mapping")
+    codificado["label"] = [exemplos["label"][i] for i in dono]
+    return codificado
+
+
+def relatorio_comprimentos(tokenizer, textos, max_length=MAX_LENGTH):
+    """
+    Distribuição do número de tokens por exemplo (antes do corte em max_length).
+    Mostra quantos exemplos são cortados e quanto de cada lote seria só
+    preenchimento se tudo fosse completado até max_length.
+    """
+    # Sem truncation, só para medir (o aviso de "sequência longa" é esperado)
+    comprimentos = np.array([len(ids) for ids in tokenizer(list(textos), truncation=False)["input_ids"]])
+    usados = np.minimum(comprimentos, max_length)
+    relatorio = {
+        "exemplos": int(len(comprimentos)),
+        "media": float(comprimentos.mean()),
+        "percentis": {f"p{p}": int(np.percentile(comprimentos, p)) for p in (10, 25, 50, 75, 90, 95, 99)},
+        "maximo": int(comprimentos.max()),
+        "max_length": max_length,
+        "fracao_cortados": float((comprimentos > max_length).mean()),
+        # Com padding="max_length", esta fração dos tokens processados seria só [PAD]
+        "fracao_padding_max_length": float(1 - usados.mean() / max_length),
+    }
 
-print("\nDataset pronto para o treino:")
-print(dataset_dividido)
+    print(f"\n--- Comprimento em tokens ({relatorio['exemplos']} exemplos) ---")
+    print("Percentis:", ", ".join(f"{k}={v}" for k, v in relatorio["percentis"].items()),
+          f"| máx={relatorio['maximo']}")
+    faixas = np.arange(0, max_length + 1, 16)
+    contagem, _ = np.histogram(usados, bins=np.append(faixas, max_length + 1))
+    for inicio, n in zip(faixas, contagem):
+        rotulo = f">= {max_length}" if inicio == max_length else f"{inicio:>3}-{inicio + 15:<3}"
+        print(f"  {rotulo:>9} | {'#' * int(50 * n / max(contagem.max(), 1)):<50} {n}")
+    print(f"Cortados em {max_length} tokens: {relatorio['fracao_cortados']:.1%}")
+    print(f"Tokens de padding se tudo fosse até {max_length}: {relatorio['fracao_padding_max_length']:.1%}")
+
+    os.makedirs(os.path.dirname(ARQUIVO_RELATORIO_TOKENS), exist_ok=True)
+    with open(ARQUIVO_RELATORIO_TOKENS, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Relatório salvo em: {ARQUIVO_RELATORIO_TOKENS}")
+    return relatorio
+
+
+def preparar_dataset(tokenizer):
+    """Dataset tokenizado e dividido em treino/teste (do cache, se já existir)."""
+    pasta_cache = pasta_cache_tokenizacao(tokenizer.name_or_path)
+
+    if os.path.exists(pasta_cache):
+        # Os arquivos Arrow são mapeados na memória: abrir é instantâneo, nada é re-tokenizado
+        print(f"\n--- Usando dataset já tokenizado do cache: {pasta_cache} ---")
+        dataset_dividido = load_from_disk(pasta_cache)
+    else:
+        df = carregar_dataframe()
+        relatorio_comprimentos(tokenizer, df["texto"])
+
+        print("\n--- Convertendo DataFrame para Dataset Hugging Face ---")
+        # Converte o DataFrame do pandas para o formato que o 'transformers' gosta
+        dataset = Dataset.from_pandas(df)
+
+        # Divide ANTES de tokenizar: no modo janelas, todas as janelas de um texto ficam
+        # do mesmo lado (treino ou teste). A divisão é a mesma de sempre (mesma semente e nº de linhas).
+        print("--- Divindo em Treino e Teste (80% para estudar, 20% para a prova) ---")
+        # 'train_test_split' divide nosso dataset. 80% treino, 20% teste
+        dataset_dividido = dividir_treino_teste(df)
+
+        # Vários processos só compensam com bastante texto (cada um carrega o tokenizador)
+        num_proc = max(1, min(os.cpu_count() or 1, len(dataset) // 5_000))
+        print(f"--- Tokenizando o dataset (convertendo texto em números, {num_proc} processo(s)) ---")
+        # Aplica a função de tokenização em todo o dataset de uma vez (rápido!)
+        # No modo janelas o nº de linhas muda, então as colunas originais saem
+        with instrumentacao.medir("tokenizacao", origem="treino"):
+            dataset_dividido = dataset_dividido.map(
+                tokenizar_funcao,
+                batched=True,
+                fn_kwargs={"tokenizer": tokenizer},
+                num_proc=num_proc if num_proc > 1 else None,
+                remove_columns=dataset.column_names if JANELAS_DESLIZANTES else None,
+            )
+
+        # Salva numa pasta temporária e renomeia: uma execução interrompida não deixa cache pela metade
+        dataset_dividido.save_to_disk(pasta_cache + ".tmp")
+        os.replace(pasta_cache + ".tmp", pasta_cache)
+        dataset_dividido = load_from_disk(pasta_cache) # Passa a ler do disco (memory-map)
+        print(f"Dataset tokenizado salvo no cache: {pasta_cache}")
+
+    print("\nDataset pronto para o treino:")
+    print(dataset_dividido)
+    return dataset_dividido
 
 
 # --- 4. CONFIGURANDO A AVALIAÇÃO (A "RÉGUA") ---
@@ -113,53 +253,95 @@ def calcular_metricas(pred):
 
 # --- 5. CONFIGURANDO O TREINADOR ---
 
-# Define onde o modelo será salvo
-DIRETORIO_SAIDA = "modelo_bulario_bertimbau"
-
-# Se o seu PC for um pouco mais lento ou não tiver uma placa de vídeo (GPU) forte,
-# mude o 'per_device_train_batch_size' de 16 para 8 ou 4.
-TAMANHO_LOTE = 16 # Mude para 8 ou 4 se tiver problemas de memória
-
-training_args = TrainingArguments(
-    output_dir=DIRETORIO_SAIDA,          # Pasta para salvar o modelo
-    num_train_epochs=3,                # Quantas vezes o modelo vai "ler" os dados (3 é um bom começo)
-    per_device_train_batch_size=TAMANHO_LOTE,    # Quantos exemplos por vez (lotes)
-    per_device_eval_batch_size=TAMANHO_LOTE,     # O mesmo para a avaliação
-    weight_decay=0.01,                 # Regularização
-    logging_dir='./logs',              # Pasta para logs
-    logging_steps=10,                  # A cada 10 passos, mostra o progresso
-    eval_strategy="epoch",             # No final de cada "leitura" (epoch), roda a "prova"
-    save_strategy="epoch",             # Salva o modelo a cada epoch
-    load_best_model_at_end=True,       # No final, recarrega o melhor modelo que ele encontrou
-)
-
-# Cria o "Gerente" do Treino
-trainer = Trainer(
-    model=model,                         # O cérebro do BERTimbau
-    args=training_args,                  # As regras do treino
-    train_dataset=dataset_dividido["train"], # O material de estudo
-    eval_dataset=dataset_dividido["test"],   # A prova
-    compute_metrics=calcular_metricas,     # A "régua" para dar a nota
-    tokenizer=tokenizer,
-)
-
-# --- 6. TREINAR! ---
-print("\n--- INICIANDO O TREINAMENTO! ---")
-print("(Isso pode demorar alguns minutos...)")
-
-trainer.train()
-
-print("\n--- TREINAMENTO CONCLUÍDO! ---")
-
-# --- 7. SALVAR O MODELO FINAL ---
-print("\nSalvando o modelo final treinado...")
-trainer.save_model(DIRETORIO_SAIDA)
-tokenizer.save_pretrained(DIRETORIO_SAIDA)
-
-print(f"\n--- SUCESSO! MODELO SALVO EM: {DIRETORIO_SAIDA} ---")
-
-print("\n--- AVALIAÇÃO FINAL DO MODELO ---")
-# Roda a avaliação final no set de teste
-evaluation_results = trainer.evaluate()
-print("Resultados da avaliação final:")
-print(evaluation_results)
\ No newline at end of file
+class TrainerComPesos(Trainer):
+    """Trainer com CrossEntropy ponderada: erros nas classes raras custam mais."""
+
+    def __init__(self, *args, pesos_classes=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pesos_classes = pesos_classes
+
+    def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None):
+        labels = inputs.pop("labels")
+        outputs = model(**inputs)
+        loss = torch.nn.functional.cross_entropy(
+            outputs.logits, labels, weight=self.pesos_classes.to(outputs.logits.device)
+        )
+        return (loss, outputs) if return_outputs else loss
+
+
+def carregar_pesos_classes():
+    """Se o balanceamento gerou pesos (em vez de descartar exemplos), a loss passa a usá-los."""
+    if not os.path.exists(ARQUIVO_PESOS):
+        return None
+    with open(ARQUIVO_PESOS, encoding="utf-8") as f:
+        pesos = json.load(f)
+    pesos_classes = torch.tensor([pesos.get(label, 1.0) for label in LABELS], dtype=torch.float)
+    print(f"\n--- Usando pesos por classe de: {ARQUIVO_PESOS} ---")
+    print({label: round(float(p), 3) for label, p in zip(LABELS, pesos_classes)})
+    return pesos_classes
+
+
+# --- 6. EXECUÇÃO PRINCIPAL ---
+def main():
+    tokenizer, model = carregar_modelo()
+    dataset_dividido = preparar_dataset(tokenizer)
+    pesos_classes = carregar_pesos_classes()
+
+    # Padding dinâmico: cada lote é completado só até o maior exemplo dele
+    data_collator = DataCollatorWithPadding(tokenizer=tokenizer)
+
+    training_args = TrainingArguments(
+        output_dir=DIRETORIO_SAIDA,          # Pasta para salvar o modelo
+        num_train_epochs=3,                # Quantas vezes o modelo vai "ler" os dados (3 é um bom começo)
+        per_device_train_batch_size=TAMANHO_LOTE,    # Quantos exemplos por vez (lotes)
+        per_device_eval_batch_size=TAMANHO_LOTE,     # O mesmo para a avaliação
+        weight_decay=0.01,                 # Regularização
+        logging_dir='./logs',              # Pasta para logs
+        logging_steps=10,                  # A cada 10 passos, mostra o progresso
+        eval_strategy="epoch",             # No final de cada "leitura" (epoch), roda a "prova"
+        save_strategy="epoch",             # Salva o modelo a cada epoch
+        load_best_model_at_end=True,       # No final, recarrega o melhor modelo que ele encontrou
+        group_by_length=True,              # Lotes com exemplos de tamanho parecido = menos padding
+    )
+
+    # Cria o "Gerente" do Treino
+    trainer = (TrainerComPesos if pesos_classes is not None else Trainer)(
+        model=model,                         # O cérebro do BERTimbau
+        args=training_args,                  # As regras do treino
+        train_dataset=dataset_dividido["train"], # O material de estudo
+        eval_dataset=dataset_dividido["test"],   # A prova
+        compute_metrics=calcular_metricas,     # A "régua" para dar a nota
+        tokenizer=tokenizer,
+        data_collator=data_collator,           # Padding dinâmico por lote
+        **({"pesos_classes": pesos_classes} if pesos_classes is not None else {}),
+    )
+
+    # TREINAR!
+    print("\n--- INICIANDO O TREINAMENTO! ---")
+    print("(Isso pode demorar alguns minutos...)")
+
+    with instrumentacao.medir("treino"):
+        trainer.train()
+
+    print("\n--- TREINAMENTO CONCLUÍDO! ---")
+
+    # SALVAR O MODELO FINAL
+    print("\nSalvando o modelo final treinado...")
+    # Guarda no config como o modelo foi treinado (o classificador.py lê isso)
+    model.config.janelas_deslizantes = JANELAS_DESLIZANTES
+    model.config.stride_janela = STRIDE_JANELA
+    trainer.save_model(DIRETORIO_SAIDA)
+    tokenizer.save_pretrained(DIRETORIO_SAIDA)
+
+    print(f"\n--- SUCESSO! MODELO SALVO EM: {DIRETORIO_SAIDA} ---")
+
+    print("\n--- AVALIAÇÃO FINAL DO MODELO ---")
+    # Roda a avaliação final no set de teste
+    evaluation_results = trainer.evaluate()
+    print("Resultados da avaliação final:")
+    print(evaluation_results)
+    return evaluation_results
+
+
+if __name__ == "__main__":
+    main()
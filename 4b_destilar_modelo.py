@@ -0,0 +1,358 @@
+import os
+import re
+import json
+import time
+import hashlib
+import argparse
+import importlib
+import multiprocessing
+import statistics
+import numpy as np
+import pandas as pd
+import torch.nn.functional as F
+from datasets import Dataset, DatasetDict
+from sklearn.metrics import accuracy_score, f1_score
+from transformers import (
+    AutoConfig, AutoTokenizer, AutoModelForSequenceClassification,
+    TrainingArguments, Trainer, DataCollatorWithPadding,
+)
+
+import instrumentacao
+from utilitarios import hash_arquivo, rss_mb
+from classificador import MODELO_SALVO, MODELO_ALUNO, LABELS, MAX_LENGTH, ClassificadorBulas
+
+# --- 1. CONFIGURAÇÃO ---
+# O aluno aprende com TODO o dataset etiquetado (desbalanceado, sem descartar nada):
+# quem diz o que cada parágrafo é são os logits do professor (o modelo do 4_treinar_modelo.py).
+ARQUIVO_DATASET = os.path.join("dataset", "dataset_completo_automatico.csv")
+MODELO_PROFESSOR = MODELO_SALVO
+DIRETORIO_SAIDA = MODELO_ALUNO
+RANDOM_STATE = 42
+
+# O aluno é o professor com menos camadas: cada camada dele começa com os pesos de uma
+# camada do professor (espaçadas, incluindo a 1ª e a última), e os embeddings, o pooler e
+# o classificador são copiados. Um aluno mais "estreito" (hidden_size menor) precisaria
+# de um pré-treino do zero, que não cabe aqui.
+CAMADAS_ALUNO = 4
+
+# Loss = ALFA * KL(aluno || professor, com temperatura) + (1 - ALFA) * CrossEntropy(etiqueta do regex)
+TEMPERATURA = 2.0 # > 1 "amacia" as probabilidades do professor: o aluno aprende também as 2ª opções
+ALFA = 0.7
+NUM_EPOCAS = 3
+TAMANHO_LOTE = 32
+TAXA_APRENDIZADO = 5e-5
+
+# Logits do professor por parágrafo, para não rodar o modelo grande de novo a cada treino.
+# A chave é o hash do CSV + o ID do professor (muda se ele for re-treinado).
+PASTA_CACHE = ".cache_destilacao"
+ARQUIVO_RELATORIO = os.path.join("relatorios", "destilacao.json")
+
+label2id = {label: i for i, label in enumerate(LABELS)}
+
+
+# --- 2. DADOS + LOGITS DO PROFESSOR ---
+def carregar_dataframe() -> pd.DataFrame:
+    print(f"--- Carregando dataset: {ARQUIVO_DATASET} ---")
+    df = pd.read_csv(ARQUIVO_DATASET, usecols=["texto", "label"])
+    df["label"] = df["label"].map(label2id)
+    df = df.dropna(subset=["label"]).reset_index(drop=True)
+    df["label"] = df["label"].astype(int)
+    df["texto"] = df["texto"].astype(str)
+    print(f"{len(df)} parágrafos. Distribuição (desbalanceada, como nas bulas):")
+    print(df["label"].map(dict(enumerate(LABELS))).value_counts().to_string())
+    return df
+
+
+def logits_professor(textos) -> np.ndarray:
+    """Logits do professor para cada texto (n x n_labels), do cache se já calculados."""
+    professor = ClassificadorBulas(MODELO_PROFESSOR)
+    chave = hashlib.sha256(f"{hash_arquivo(ARQUIVO_DATASET)}|{professor.id_modelo}".encode()).hexdigest()[:16]
+    caminho = os.path.join(PASTA_CACHE, f"{chave}.npy")
+    if os.path.exists(caminho):
+        print(f"\n--- Logits do professor do cache: {caminho} ---")
+        return np.load(caminho)
+
+    print(f"\n--- Rodando o professor ({MODELO_PROFESSOR}) em {len(textos)} parágrafos ---")
+    with instrumentacao.medir("destilacao", passada="professor"):
+        logits = professor.logits_textos(textos).numpy()
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    np.save(caminho + ".tmp.npy", logits) # Renomeia no fim: nada de cache pela metade
+    os.replace(caminho + ".tmp.npy", caminho)
+    return logits
+
+
+def textos_treino_professor() -> set:
+    """
+    Textos do treino do professor: a mesma divisão 80/20 do 4_treinar_modelo.py, refeita
+    sobre o dataset_final_balanceado.csv (que sai das linhas deste mesmo CSV).
+    """
+    treino = importlib.import_module("4_treinar_modelo")
+    if not os.path.exists(treino.ARQUIVO_DATASET):
+        print(f"[AVISO] {treino.ARQUIVO_DATASET} não encontrado: o teste pode ter textos do treino do professor.")
+        return set()
+    return treino.textos_do_treino()
+
+
+def indices_teste(df: pd.DataFrame, excluir: set, fracao: float = 0.2) -> np.ndarray:
+    """
+    Sorteia o teste (fracao das linhas) só entre os parágrafos que o professor NÃO viu
+    no treino: senão a comparação favorece o professor, que já "decorou" parte do teste.
+    Se o treino do professor cobre o CSV inteiro, sorteia entre todos (com um aviso).
+    """
+    livres = np.flatnonzero(~df["texto"].isin(excluir).to_numpy())
+    n_teste = min(len(livres), round(fracao * len(df)))
+    if n_teste == 0 and len(livres) < len(df):
+        print("[AVISO] Todos os parágrafos estão no treino do professor: o teste é sorteado entre eles "
+              "e a comparação favorece o professor.")
+        livres = np.arange(len(df))
+        n_teste = round(fracao * len(df))
+    elif n_teste < round(fracao * len(df)):
+        print(f"[AVISO] Só {n_teste} parágrafos fora do treino do professor para o teste.")
+    rng = np.random.default_rng(RANDOM_STATE)
+    return np.sort(rng.choice(livres, size=n_teste, replace=False))
+
+
+def preparar_dataset(df: pd.DataFrame, logits: np.ndarray, tokenizer, excluir_do_teste: set = frozenset()):
+    """
+    Tokeniza (sem padding: o collator completa por lote) e divide em treino/teste (80/20),
+    com o teste sorteado fora de 'excluir_do_teste' (os textos do treino do professor).
+    Retorna (dataset_dividido, textos_do_teste): a coluna de texto sai do dataset, que
+    vai inteiro para o modelo (remove_unused_columns=False, ver main).
+    """
+    dataset = Dataset.from_dict({
+        "texto": df["texto"].tolist(),
+        "labels": df["label"].tolist(),
+        "logits_professor": logits.tolist(),
+    })
+    teste = indices_teste(df, excluir_do_teste)
+    treino = np.setdiff1d(np.arange(len(df)), teste)
+    print(f"Teste: {len(teste)} parágrafos fora do treino do professor | treino do aluno: {len(treino)}")
+    dataset_dividido = DatasetDict(train=dataset.select(treino), test=dataset.select(teste))
+    textos_teste = dataset_dividido["test"]["texto"]
+    with instrumentacao.medir("tokenizacao", origem="destilacao"):
+        dataset_dividido = dataset_dividido.map(
+            lambda exemplos: tokenizer(exemplos["texto"], truncation=True, max_length=MAX_LENGTH),
+            batched=True,
+            remove_columns=["texto"],
+        )
+    return dataset_dividido, textos_teste
+
+
+# --- 3. O ALUNO ---
+def camadas_escolhidas(n_professor: int, n_aluno: int):
+    """Camadas do professor que inicializam o aluno, espaçadas por igual (ex: 12 -> 4: 0, 4, 7, 11)."""
+    if n_aluno >= n_professor:
+        raise ValueError(f"O aluno precisa de menos camadas que o professor ({n_professor})")
+    if n_aluno == 1:
+        return [n_professor - 1]
+    return [round(i * (n_professor - 1) / (n_aluno - 1)) for i in range(n_aluno)]
+
+
+def criar_aluno(n_camadas: int):
+    """Aluno com 'n_camadas' camadas, inicializado com os pesos do professor."""
+    config = AutoConfig.from_pretrained(MODELO_PROFESSOR)
+    camadas = camadas_escolhidas(config.num_hidden_layers, n_camadas)
+    professor = AutoModelForSequenceClassification.from_pretrained(MODELO_PROFESSOR, use_safetensors=True)
+
+    config.num_hidden_layers = n_camadas
+    config.destilado_de = os.path.basename(os.path.normpath(MODELO_PROFESSOR)) # Sem o caminho desta máquina
+    config.camadas_professor = camadas
+    # O aluno vê só os primeiros MAX_LENGTH tokens de cada texto
+    config.janelas_deslizantes = False
+    aluno = AutoModelForSequenceClassification.from_config(config)
+
+    # encoder.layer.<camada do professor> -> encoder.layer.<posição no aluno>
+    origem = {c: i for i, c in enumerate(camadas)}
+    padrao = re.compile(r"\.layer\.(\d+)\.")
+    estado = {}
+    for nome, tensor in professor.state_dict().items():
+        m = padrao.search(nome)
+        if m is None:
+            estado[nome] = tensor
+        elif int(m.group(1)) in origem:
+            novo = f"{nome[:m.start(1)]}{origem[int(m.group(1))]}{nome[m.end(1):]}"
+            estado[novo] = tensor
+    aluno.load_state_dict(estado)
+
+    n_prof = sum(p.numel() for p in professor.parameters())
+    n_aluno = sum(p.numel() for p in aluno.parameters())
+    print(f"\n--- Aluno: {n_camadas} camadas (do professor: {camadas}) | "
+          f"{n_aluno / 1e6:.1f} M parâmetros ({n_aluno / n_prof:.0%} do professor) ---")
+    return aluno
+
+
+class TrainerDestilacao(Trainer):
+    """Trainer com a loss de destilação (KL com temperatura + CrossEntropy nas etiquetas)."""
+
+    def __init__(self, *args, temperatura=TEMPERATURA, alfa=ALFA, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.temperatura = temperatura
+        self.alfa = alfa
+
+    def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None):
+        labels = inputs.pop("labels")
+        professor = inputs.pop("logits_professor")
+        outputs = model(**inputs)
+        t = self.temperatura
+        # O t² mantém a escala dos gradientes da parte "suave" independente da temperatura
+        suave = F.kl_div(F.log_softmax(outputs.logits / t, dim=-1), F.softmax(professor / t, dim=-1),
+                         reduction="batchmean") * t * t
+        dura = F.cross_entropy(outputs.logits, labels)
+        loss = self.alfa * suave + (1 - self.alfa) * dura
+        return (loss, outputs) if return_outputs else loss
+
+
+def calcular_metricas(pred):
+    preds = np.argmax(pred.predictions, axis=1)
+    return {"accuracy": accuracy_score(pred.label_ids, preds),
+            "f1": f1_score(pred.label_ids, preds, average="weighted")}
+
+
+# --- 4. PROFESSOR x ALUNO (F1, latência e memória) ---
+def tamanho_pesos_mb(pasta: str) -> float:
+    return sum(os.path.getsize(os.path.join(pasta, nome)) for nome in os.listdir(pasta)
+               if nome.endswith(".safetensors")) / 1024 ** 2
+
+
+def avaliar_modelo(caminho: str, textos, labels, previsoes_professor=None, amostras_latencia: int = 100):
+    """
+    F1 no teste (etiquetas do regex), concordância com o professor, latência e memória.
+    Roda num processo separado (ver comparar) para a memória de um não contaminar a do outro.
+    """
+    rss_antes = rss_mb()
+    classificador = ClassificadorBulas(caminho)
+
+    inicio = time.perf_counter()
+    previsoes = classificador.logits_textos(textos).argmax(dim=-1).tolist()
+    tempo_lote = time.perf_counter() - inicio
+    # Medido depois da 1ª passada: os pesos do .safetensors são mapeados e só entram
+    # no RSS quando o modelo os lê
+    rss_modelo = rss_mb() - rss_antes
+
+    # Latência de um parágrafo por vez (como no app, um clique = um texto)
+    latencias = []
+    for texto in textos[:amostras_latencia]:
+        inicio = time.perf_counter()
+        classificador.classificar([texto])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        "modelo": caminho,
+        "camadas": classificador.config.num_hidden_layers,
+        "parametros_m": sum(p.numel() for p in classificador.model.parameters()) / 1e6,
+        "accuracy": accuracy_score(labels, previsoes),
+        "f1": f1_score(labels, previsoes, average="weighted"),
+        "f1_macro": f1_score(labels, previsoes, average="macro"),
+        "concordancia_professor": (sum(a == b for a, b in zip(previsoes, previsoes_professor)) / len(previsoes)
+                                   if previsoes_professor is not None else 1.0),
+        "latencia_p50_ms": statistics.median(latencias),
+        "paragrafos_por_s_lote": len(textos) / tempo_lote,
+        "rss_modelo_mb": rss_modelo,
+        "pesos_em_disco_mb": tamanho_pesos_mb(caminho),
+        "previsoes": previsoes,
+    }
+
+
+def comparar(textos, labels, amostras_latencia: int):
+    if len(textos) == 0:
+        # Mediana e F1 de uma lista vazia quebram: melhor avisar do que cair no fim do treino
+        print("\n[AVISO] Conjunto de teste vazio: a comparação professor x aluno não foi feita.")
+        return None
+    print(f"\n--- Professor x aluno no teste ({len(textos)} parágrafos que nenhum dos dois viu no treino) ---")
+    contexto = multiprocessing.get_context("spawn")
+    with contexto.Pool(1) as pool:
+        professor = pool.apply(avaliar_modelo, (MODELO_PROFESSOR, textos, labels, None, amostras_latencia))
+    with contexto.Pool(1) as pool:
+        aluno = pool.apply(avaliar_modelo, (DIRETORIO_SAIDA, textos, labels, professor["previsoes"],
+                                            amostras_latencia))
+
+    print(f"\n{'modelo':<34}{'camadas':>8}{'F1':>8}{'F1 macro':>10}{'concord.':>10}"
+          f"{'p50 (ms)':>10}{'par./s':>9}{'RSS (MB)':>10}{'disco (MB)':>12}")
+    for r in (professor, aluno):
+        print(f"{r['modelo']:<34}{r['camadas']:>8}{r['f1']:>8.4f}{r['f1_macro']:>10.4f}"
+              f"{r['concordancia_professor']:>10.1%}{r['latencia_p50_ms']:>10.1f}"
+              f"{r['paragrafos_por_s_lote']:>9.1f}{r['rss_modelo_mb']:>10.0f}{r['pesos_em_disco_mb']:>12.0f}")
+        del r["previsoes"] # Só serviam para a concordância; não vão para o JSON
+    print(f"\nAluno: {professor['latencia_p50_ms'] / aluno['latencia_p50_ms']:.1f}x mais rápido (p50), "
+          f"ΔF1 = {aluno['f1'] - professor['f1']:+.4f}")
+
+    relatorio = {"professor": professor, "aluno": aluno,
+                 "temperatura": TEMPERATURA, "alfa": ALFA, "epocas": NUM_EPOCAS}
+    os.makedirs(os.path.dirname(ARQUIVO_RELATORIO), exist_ok=True)
+    with open(ARQUIVO_RELATORIO, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"Relatório salvo em: {ARQUIVO_RELATORIO}")
+    return relatorio
+
+
+# --- 5. EXECUÇÃO PRINCIPAL ---
+def main(camadas: int = CAMADAS_ALUNO, epocas: int = NUM_EPOCAS, treinar: bool = True,
+         amostras_latencia: int = 100):
+    if not os.path.exists(MODELO_PROFESSOR):
+        print(f"Erro: professor não encontrado em '{MODELO_PROFESSOR}'. Rode o 4_treinar_modelo.py antes.")
+        return None
+
+    df = carregar_dataframe()
+    tokenizer = AutoTokenizer.from_pretrained(MODELO_PROFESSOR)
+    dataset_dividido, textos_teste = preparar_dataset(df, logits_professor(df["texto"].tolist()), tokenizer,
+                                                      excluir_do_teste=textos_treino_professor())
+
+    if treinar:
+        aluno = criar_aluno(camadas)
+        com_teste = len(dataset_dividido["test"]) > 0 # Sem teste, treina sem avaliar por época
+        training_args = TrainingArguments(
+            output_dir=DIRETORIO_SAIDA,
+            num_train_epochs=epocas,
+            per_device_train_batch_size=TAMANHO_LOTE,
+            per_device_eval_batch_size=TAMANHO_LOTE,
+            learning_rate=TAXA_APRENDIZADO,
+            weight_decay=0.01,
+            logging_dir="./logs",
+            logging_steps=10,
+            eval_strategy="epoch" if com_teste else "no",
+            save_strategy="epoch",
+            load_best_model_at_end=com_teste,
+            group_by_length=True,
+            remove_unused_columns=False, # Senão o Trainer descarta a coluna logits_professor
+            report_to=[],
+        )
+        trainer = TrainerDestilacao(
+            model=aluno,
+            args=training_args,
+            train_dataset=dataset_dividido["train"],
+            eval_dataset=dataset_dividido["test"] if com_teste else None,
+            compute_metrics=calcular_metricas,
+            tokenizer=tokenizer,
+            data_collator=DataCollatorWithPadding(tokenizer=tokenizer),
+        )
+
+        print("\n--- INICIANDO A DESTILAÇÃO! ---")
+        with instrumentacao.medir("destilacao", passada="treino"):
+            trainer.train()
+
+        # Mesmo formato do modelo do 4_treinar_modelo.py: o classificador.py, o app
+        # (--modelo) e o servidor carregam a pasta do aluno sem nenhuma mudança
+        trainer.save_model(DIRETORIO_SAIDA)
+        tokenizer.save_pretrained(DIRETORIO_SAIDA)
+        print(f"\n--- SUCESSO! ALUNO SALVO EM: {DIRETORIO_SAIDA} ---")
+    elif not os.path.exists(DIRETORIO_SAIDA):
+        print(f"Erro: aluno não encontrado em '{DIRETORIO_SAIDA}'.")
+        return None
+
+    return comparar(textos_teste, dataset_dividido["test"]["labels"], amostras_latencia)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Destila o modelo treinado num aluno menor (menos camadas) e compara os dois."
+    )
+    parser.add_argument("--camadas", type=int, default=CAMADAS_ALUNO,
+                        help=f"Camadas do aluno (padrão: {CAMADAS_ALUNO})")
+    parser.add_argument("--epocas", type=int, default=NUM_EPOCAS, help=f"Épocas de treino (padrão: {NUM_EPOCAS})")
+    parser.add_argument("--apenas-avaliar", action="store_true",
+                        help="Não treina; só compara o aluno já salvo com o professor.")
+    parser.add_argument("--amostras-latencia", type=int, default=100,
+                        help="Quantos parágrafos usar na medição de latência um a um (padrão: 100).")
+    args = parser.parse_args()
+    main(camadas=args.camadas, epocas=args.epocas, treinar=not args.apenas_avaliar,
+         amostras_latencia=args.amostras_latencia)
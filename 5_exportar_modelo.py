@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import argparse
+import importlib
+import multiprocessing
+import statistics
+import torch
+from sklearn.metrics import accuracy_score, f1_score
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+from classificador import (
+    MODELO_SALVO, MODELO_INT8, MODELO_ONNX, ARQUIVO_PESOS_INT8, ARQUIVO_ONNX,
+    BACKENDS, ClassificadorBulas, quantizar_int8,
+)
+from utilitarios import rss_mb
+
+# A divisão treino/teste vem do próprio 4_treinar_modelo.py: o conjunto de teste (20%)
+# é o mesmo que o modelo nunca viu no treino, mesmo que a divisão mude lá
+treino = importlib.import_module("4_treinar_modelo")
+
+# --- 1. CONFIGURAÇÃO ---
+ARQUIVO_DATASET = treino.ARQUIVO_DATASET
+ARQUIVO_RELATORIO = os.path.join("relatorios", "exportacao.json")
+
+label2id = treino.label2id # Os números das etiquetas do split de teste
+
+
+# --- 2. EXPORTAÇÃO ---
+def tamanho_pasta_mb(pasta: str, extensoes=(".safetensors", ".bin", ".pt", ".onnx")) -> float:
+    """Tamanho (MB) dos arquivos de pesos de uma pasta de modelo."""
+    total = 0
+    for nome in os.listdir(pasta):
+        if nome.endswith(extensoes):
+            total += os.path.getsize(os.path.join(pasta, nome))
+    return total / 1024 ** 2
+
+
+def exportar_int8(model, tokenizer):
+    """Quantização dinâmica INT8 (PyTorch): salva config + tokenizador + state_dict quantizado."""
+    print(f"\n--- Exportando PyTorch INT8 para: {MODELO_INT8} ---")
+    os.makedirs(MODELO_INT8, exist_ok=True)
+    modelo_int8 = quantizar_int8(model)
+    torch.save(modelo_int8.state_dict(), os.path.join(MODELO_INT8, ARQUIVO_PESOS_INT8))
+    model.config.save_pretrained(MODELO_INT8)
+    tokenizer.save_pretrained(MODELO_INT8)
+
+
+def exportar_onnx(model, tokenizer):
+    """Exporta o grafo ONNX (FP32) e gera a versão INT8 com a quantização do ONNX Runtime."""
+    try:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+    except ImportError:
+        print("[AVISO] onnx/onnxruntime não instalados; pulando a exportação ONNX.")
+        print("        Instale com: pip install onnx onnxruntime")
+        return False
+
+    print(f"\n--- Exportando ONNX para: {MODELO_ONNX} ---")
+    os.makedirs(MODELO_ONNX, exist_ok=True)
+    caminho_fp32 = os.path.join(MODELO_ONNX, "modelo_fp32.onnx")
+
+    exemplo = tokenizer(["Tome 1 comprimido ao dia."], return_tensors="pt")
+    nomes_entrada = ["input_ids", "attention_mask", "token_type_ids"]
+    eixos_dinamicos = {nome: {0: "lote", 1: "tokens"} for nome in nomes_entrada}
+    eixos_dinamicos["logits"] = {0: "lote"}
+
+    model.config.return_dict = False # O exportador lida melhor com tuplas
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            tuple(exemplo[nome] for nome in nomes_entrada),
+            caminho_fp32,
+            input_names=nomes_entrada,
+            output_names=["logits"],
+            dynamic_axes=eixos_dinamicos,
+            opset_version=17,
+            dynamo=False,
+        )
+    model.config.return_dict = True
+
+    quantize_dynamic(caminho_fp32, os.path.join(MODELO_ONNX, ARQUIVO_ONNX), weight_type=QuantType.QInt8)
+    os.remove(caminho_fp32) # Só a versão INT8 é usada pelo app
+    model.config.save_pretrained(MODELO_ONNX)
+    tokenizer.save_pretrained(MODELO_ONNX)
+    return True
+
+
+# --- 3. CHECAGEM DE PARIDADE (acurácia x latência x memória) ---
+def carregar_conjunto_teste():
+    """O split de teste (20%) do 4_treinar_modelo.py, refeito com as funções dele."""
+    teste = treino.dividir_treino_teste(treino.ler_dataframe())["test"]
+    return list(teste["texto"]), list(teste["label"])
+
+
+def avaliar_backend(backend: str, amostras_latencia: int = 100):
+    """
+    Carrega um backend e mede F1/acurácia no teste, latência e memória.
+    Roda num processo separado (ver checar_paridade) para que a memória de um backend não
+    contamine a medição do outro.
+    """
+    textos, labels = carregar_conjunto_teste()
+    rss_antes = rss_mb()
+    classificador = ClassificadorBulas(BACKENDS[backend], backend=backend)
+    rss_modelo = rss_mb() - rss_antes
+
+    inicio = time.perf_counter()
+    resultados = classificador.classificar(textos)
+    tempo_lote = time.perf_counter() - inicio
+    previsoes = [label2id[r["label"]] for r in resultados]
+
+    # Latência de um parágrafo por vez (como no app, um clique = um texto)
+    latencias = []
+    for texto in textos[:amostras_latencia]:
+        inicio = time.perf_counter()
+        classificador.classificar([texto])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        "backend": backend,
+        "accuracy": accuracy_score(labels, previsoes),
+        "f1": f1_score(labels, previsoes, average="weighted"),
+        "latencia_p50_ms": statistics.median(latencias),
+        "paragrafos_por_s_lote": len(textos) / tempo_lote,
+        "rss_modelo_mb": rss_modelo,
+        "pesos_em_disco_mb": tamanho_pasta_mb(BACKENDS[backend]),
+        "previsoes": previsoes,
+    }
+
+
+def checar_paridade(backends, amostras_latencia: int):
+    print("\n--- Checagem de paridade no conjunto de teste ---")
+    relatorio = []
+    contexto = multiprocessing.get_context("spawn")
+    for backend in backends:
+        print(f"Avaliando backend: {backend}...")
+        with contexto.Pool(1) as pool:
+            relatorio.append(pool.apply(avaliar_backend, (backend, amostras_latencia)))
+
+    referencia = relatorio[0]
+    print(f"\n{'backend':<10}{'acc':>8}{'F1':>8}{'ΔF1':>8}{'concord.':>10}"
+          f"{'p50 (ms)':>10}{'par./s':>9}{'RSS (MB)':>10}{'disco (MB)':>12}")
+    for r in relatorio:
+        r["delta_f1"] = r["f1"] - referencia["f1"]
+        r["concordancia_fp32"] = sum(a == b for a, b in zip(r["previsoes"], referencia["previsoes"])) / len(r["previsoes"])
+        print(f"{r['backend']:<10}{r['accuracy']:>8.4f}{r['f1']:>8.4f}{r['delta_f1']:>+8.4f}"
+              f"{r['concordancia_fp32']:>10.1%}{r['latencia_p50_ms']:>10.1f}{r['paragrafos_por_s_lote']:>9.1f}"
+              f"{r['rss_modelo_mb']:>10.0f}{r['pesos_em_disco_mb']:>12.0f}")
+    for r in relatorio:
+        del r["previsoes"] # Só serviam para a concordância; não vão para o JSON
+
+    os.makedirs(os.path.dirname(ARQUIVO_RELATORIO), exist_ok=True)
+    with open(ARQUIVO_RELATORIO, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\nRelatório salvo em: {ARQUIVO_RELATORIO}")
+
+
+# --- 4. EXECUÇÃO PRINCIPAL ---
+def main(exportar: bool = True, usar_onnx: bool = True, amostras_latencia: int = 100):
+    if not os.path.exists(MODELO_SALVO):
+        print(f"Erro: modelo treinado não encontrado em '{MODELO_SALVO}'. Rode o 4_treinar_modelo.py antes.")
+        return
+
+    backends = ["pytorch", "int8"]
+    if exportar:
+        print(f"--- Carregando modelo FP32 de: {MODELO_SALVO} ---")
+        tokenizer = AutoTokenizer.from_pretrained(MODELO_SALVO)
+        model = AutoModelForSequenceClassification.from_pretrained(MODELO_SALVO, use_safetensors=True)
+        model.eval()
+        exportar_int8(model, tokenizer)
+        if usar_onnx and exportar_onnx(model, tokenizer):
+            backends.append("onnx")
+    elif usar_onnx and os.path.exists(os.path.join(MODELO_ONNX, ARQUIVO_ONNX)):
+        backends.append("onnx")
+
+    if os.path.exists(ARQUIVO_DATASET):
+        checar_paridade(backends, amostras_latencia)
+    else:
+        print(f"[AVISO] '{ARQUIVO_DATASET}' não encontrado; pulando a checagem de paridade.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Gera versões INT8 (PyTorch e ONNX Runtime) do modelo treinado e compara com o FP32."
+    )
+    parser.add_argument("--apenas-avaliar", action="store_true",
+                        help="Não exporta de novo; só roda a checagem de paridade.")
+    parser.add_argument("--sem-onnx", action="store_true", help="Não exporta/avalia o backend ONNX.")
+    parser.add_argument("--amostras-latencia", type=int, default=100,
+                        help="Quantos parágrafos usar na medição de latência um a um (padrão: 100).")
+    args = parser.parse_args()
+    main(exportar=not args.apenas_avaliar, usar_onnx=not args.sem_onnx,
+         amostras_latencia=args.amostras_latencia)
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+import instrumentacao
+import indice_similares
+from utilitarios import hash_arquivo
+from classificador import BACKENDS, TAMANHO_LOTE, ClassificadorBulas
+
+# --- 1. CONFIGURAÇÃO ---
+# Índice de "passagens semelhantes" do app.py: o embedding (média da última camada do
+# BERTimbau treinado) de cada parágrafo do dataset, num índice IVF (indice_similares.py).
+ARQUIVO_DATASET = os.path.join("dataset", "dataset_completo_automatico.csv")
+PASTA_INDICE = indice_similares.PASTA_INDICE
+
+# Os embeddings são calculados em blocos e gravados num .npy float16 mapeado do disco,
+# com o nº de parágrafos já feitos ao lado: se o processo cair, continua do último bloco.
+# A chave é o hash do CSV + o ID do modelo (muda se ele for re-treinado).
+PASTA_CACHE = ".cache_similares"
+PARAGRAFOS_POR_BLOCO = 2048
+
+
+# --- 2. PARÁGRAFOS ---
+def carregar_paragrafos() -> pd.DataFrame:
+    """
+    Parágrafos do dataset sem repetição: textos iguais (ignorando espaços e quebras de
+    linha), como os avisos legais que aparecem em quase toda bula, viram uma linha só,
+    com o nº de ocorrências. Senão as buscas voltariam várias cópias do mesmo texto.
+    """
+    print(f"--- Carregando dataset: {ARQUIVO_DATASET} ---")
+    df = pd.read_csv(ARQUIVO_DATASET, usecols=["texto", "label"]).dropna()
+    df["texto"] = df["texto"].astype(str)
+    df["chave"] = df["texto"].str.split().str.join(" ")
+    unicos = df.groupby("chave", sort=False).agg(
+        texto=("texto", "first"), label=("label", "first"), ocorrencias=("texto", "size"),
+    ).reset_index(drop=True)
+    print(f"{len(df)} parágrafos, {len(unicos)} textos diferentes.")
+    return unicos
+
+
+# --- 3. EMBEDDINGS (retomáveis) ---
+def calcular_embeddings(classificador: ClassificadorBulas, textos) -> np.ndarray:
+    """Embeddings float16 (n x hidden_size) de todos os textos, mapeados do cache."""
+    chave = hashlib.sha256(f"{hash_arquivo(ARQUIVO_DATASET)}|{classificador.id_modelo}".encode()).hexdigest()[:16]
+    caminho = os.path.join(PASTA_CACHE, f"{chave}.npy")
+    caminho_feitos = caminho + ".feitos"
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+
+    feitos = 0
+    if os.path.exists(caminho) and os.path.exists(caminho_feitos):
+        with open(caminho_feitos) as f:
+            feitos = int(f.read())
+        matriz = np.load(caminho, mmap_mode="r+")
+    else:
+        matriz = np.lib.format.open_memmap(caminho, mode="w+", dtype=np.float16,
+                                           shape=(len(textos), classificador.config.hidden_size))
+    if feitos >= len(textos):
+        print(f"\n--- Embeddings do cache: {caminho} ---")
+        return np.load(caminho, mmap_mode="r")
+
+    print(f"\n--- Calculando embeddings ({feitos} de {len(textos)} já no cache) ---")
+    inicio_total, n_feitos_antes = time.perf_counter(), feitos
+    for inicio in range(feitos, len(textos), PARAGRAFOS_POR_BLOCO):
+        fim = min(inicio + PARAGRAFOS_POR_BLOCO, len(textos))
+        matriz[inicio:fim] = classificador.embeddings_textos(textos[inicio:fim]).numpy()
+        matriz.flush()
+        with open(caminho_feitos + ".tmp", "w") as f:
+            f.write(str(fim))
+        os.replace(caminho_feitos + ".tmp", caminho_feitos) # Só conta o bloco depois de gravado
+        decorrido = time.perf_counter() - inicio_total
+        print(f"  {fim}/{len(textos)} | {(fim - n_feitos_antes) / decorrido:.1f} parágrafos/s")
+    del matriz
+    return np.load(caminho, mmap_mode="r")
+
+
+# --- 4. EXECUÇÃO ---
+def main(caminho_modelo: str | None = None, backend: str = "pytorch", n_listas: int | None = None,
+         tamanho_lote: int = TAMANHO_LOTE, pesos_mmap: bool = False):
+    caminho_modelo = caminho_modelo or BACKENDS[backend]
+    paragrafos = carregar_paragrafos()
+    textos = paragrafos["texto"].tolist()
+
+    classificador = ClassificadorBulas(caminho_modelo, backend=backend, tamanho_lote=tamanho_lote,
+                                       pesos_mmap=pesos_mmap)
+    with instrumentacao.medir("embeddings_dataset"):
+        embeddings = calcular_embeddings(classificador, textos)
+
+    print(f"\n--- Construindo o índice em '{PASTA_INDICE}' ---")
+    with instrumentacao.medir("indexacao"):
+        metadados = indice_similares.construir_indice(
+            PASTA_INDICE, embeddings, textos, paragrafos["label"].tolist(),
+            ocorrencias=paragrafos["ocorrencias"].to_numpy(), n_listas=n_listas,
+            metadados={"modelo": caminho_modelo, "backend": backend, "id_modelo": classificador.id_modelo,
+                       "dataset": ARQUIVO_DATASET},
+        )
+    print(json.dumps({k: v for k, v in metadados.items() if k != "labels"}, indent=2, ensure_ascii=False))
+
+    # Uma busca de exemplo, para conferir a latência ponta a ponta
+    indice = indice_similares.IndiceSimilares(PASTA_INDICE)
+    t0 = time.perf_counter()
+    vetor = classificador.embeddings_textos([textos[0]])[0].numpy()
+    t1 = time.perf_counter()
+    indice.buscar(vetor, k=10)
+    t2 = time.perf_counter()
+    print(f"\nBusca de exemplo: embedding {(t1 - t0) * 1000:.1f} ms + índice {(t2 - t1) * 1000:.1f} ms")
+    print(f"Índice pronto: {len(indice)} parágrafos, {metadados['n_listas']} listas.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera o índice de passagens semelhantes do dataset.")
+    parser.add_argument("--modelo", default=None, help="Pasta do modelo (padrão: a do backend escolhido)")
+    parser.add_argument("--backend", choices=["pytorch", "int8"], default="pytorch",
+                        help="Backend do encoder (o ONNX só devolve os logits)")
+    parser.add_argument("--listas", type=int, default=None,
+                        help="Nº de listas do IVF (padrão: 4 * raiz do nº de parágrafos)")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="Parágrafos por lote no modelo")
+    parser.add_argument("--mmap", action="store_true", help="Mapeia os pesos do .safetensors (somente leitura)")
+    args = parser.parse_args()
+    main(args.modelo, backend=args.backend, n_listas=args.listas, tamanho_lote=args.tamanho_lote,
+         pesos_mmap=args.mmap)
@@ -1,14 +1,52 @@
-import streamlit as st
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
 import os
+import html
+import time
+import argparse
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+# Só módulos leves aqui: o torch e o transformers (~3 s) vêm com o classificador.py,
+# importado em segundo plano (ver seção 3) enquanto a página já aparece
+from config_modelo import BACKENDS
+from cache_predicoes import CachePredicoes
+from cliente_classificador import conectar_servidor
+import instrumentacao
+import indice_textual
+
+# Reaproveita a extração e a divisão em parágrafos da etapa de etiquetagem
+etiquetador = importlib.import_module("2_etiquetar_automatico")
 
 # --- 1. CONFIGURAÇÃO ---
-MODELO_SALVO = "modelo_bulario_bertimbau"
 ACURACIA_MODELO = "95.1%"
 
-LABELS = ["COMPOSICAO", "INDICACAO", "CONTRAINDICACAO", "POSOLOGIA", "EFEITOS_ADVERSOS", "OUTROS"]
-id2label = {i: label for i, label in enumerate(LABELS)}
+# Backend de inferência: "pytorch" (FP32, padrão), "int8" ou "onnx" (gerados pelo
+# 5_exportar_modelo.py). Escolha com: streamlit run app.py -- --backend int8
+# ou pela variável de ambiente BULARIO_BACKEND.
+_parser = argparse.ArgumentParser()
+_parser.add_argument("--backend", choices=list(BACKENDS), default=os.environ.get("BULARIO_BACKEND", "pytorch"))
+# Com --servidor (ou BULARIO_SERVIDOR), o app não carrega o modelo: vira só a interface
+# do servidor.py (ex: streamlit run app.py -- --servidor http://127.0.0.1:8000)
+_parser.add_argument("--servidor", default=os.environ.get("BULARIO_SERVIDOR"))
+# Com --mmap (ou BULARIO_MMAP=1), os pesos são mapeados do .safetensors em modo somente
+# leitura: várias réplicas do app no mesmo host dividem uma única cópia deles
+_parser.add_argument("--mmap", action="store_true", default=os.environ.get("BULARIO_MMAP") == "1")
+# Com --modelo (ou BULARIO_MODELO), usa outra pasta em vez da padrão do backend, ex: o
+# aluno destilado pelo 4b_destilar_modelo.py (streamlit run app.py -- --modelo modelo_bulario_bertimbau_aluno)
+_parser.add_argument("--modelo", default=os.environ.get("BULARIO_MODELO"))
+_args = _parser.parse_known_args()[0]
+BACKEND = _args.backend
+SERVIDOR = _args.servidor
+PESOS_MMAP = _args.mmap
+MODELO_SALVO = _args.modelo or BACKENDS[BACKEND]
+
+# Cache de previsões: parágrafos repetidos (entre bulas ou entre cliques) não passam
+# de novo pelo modelo. Com BULARIO_CACHE_SQLITE=arquivo.sqlite o cache sobrevive
+# a reinícios do app; sem ela, fica só na memória.
+CACHE_SQLITE = os.environ.get("BULARIO_CACHE_SQLITE")
+
+# Pasta do índice de passagens semelhantes (= indice_similares.PASTA_INDICE; o módulo
+# não é importado aqui para o numpy só carregar quando o modo for usado)
+PASTA_INDICE_SIMILARES = "indice_similares"
 
 # Cores das tags de resultado
 TAG_COLORS = {
@@ -219,6 +257,27 @@ def carregar_css():
             color: #111827;
         }
 
+        /* Trechos da bula completa, agrupados por seção */
+        .segment-card {
+            background-color: #ffffff;
+            border-radius: 12px;
+            padding: 0.6rem 0.8rem;
+            margin-bottom: 0.5rem;
+            border: 1px solid #e5e7eb;
+        }
+
+        .segment-meta {
+            font-size: 0.75rem;
+            color: #6b7280;
+            margin-bottom: 0.2rem;
+        }
+
+        .segment-text {
+            font-size: 0.85rem;
+            color: #111827;
+            white-space: pre-wrap;
+        }
+
         [data-testid="stNotification"] {
             border-radius: 12px;
         }
@@ -227,32 +286,210 @@ def carregar_css():
     st.markdown(css, unsafe_allow_html=True)
 
 
-# --- 3. CARREGAR O MODELO (Função com Cache) ---
+# --- 3. CARREGAR O MODELO (em segundo plano, com cache) ---
+def _carregar_modelo():
+    if SERVIDOR:
+        return conectar_servidor(SERVIDOR)
+    from classificador import carregar_classificador # Importa torch e transformers
+    # O mesmo classificador em lote usado pelos jobs (classificador.py), no CPU
+    cache = CachePredicoes(caminho_sqlite=CACHE_SQLITE)
+    return carregar_classificador(MODELO_SALVO, dispositivo="cpu", backend=BACKEND, cache=cache,
+                                  pesos_mmap=PESOS_MMAP)
+
+
 @st.cache_resource
-def carregar_modelo():
-    if not os.path.exists(MODELO_SALVO):
-        return None, None
+def iniciar_carregamento():
+    """
+    Começa a carregar o modelo numa thread e devolve o Future, sem esperar: a página
+    é desenhada enquanto o torch e os pesos carregam. Roda uma vez por processo
+    (cache_resource); as próximas execuções do script recebem o mesmo Future.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="carregar-modelo")
+    futuro = executor.submit(_carregar_modelo)
+    executor.shutdown(wait=False) # A thread termina sozinha depois do carregamento
+    return futuro
+
+
+def obter_classificador():
+    """O classificador (ou None, se falhou). Só espera se ele ainda estiver carregando."""
+    if not carregamento.done():
+        with st.spinner("Carregando o modelo (só na primeira vez)..."):
+            return carregamento.result()
+    return carregamento.result()
+
+
+carregamento = iniciar_carregamento()
+carregar_css()
+
+
+# --- 4. BULA COMPLETA (PDF) ---
+def classificar_bula(classificador, pdf_bytes: bytes):
+    """
+    Extrai o texto do PDF, divide em parágrafos (mesma regra de segmentar_e_etiquetar)
+    e classifica todos de uma vez. Retorna (paragrafos, resultados, tempos em segundos).
+    """
+    tempos = {}
+    t0 = time.perf_counter()
+    texto = etiquetador.extrair_texto_pdf(pdf_bytes)
+    with instrumentacao.medir("segmentacao"):
+        paragrafos = [p for p, _ in etiquetador.iterar_segmentos(texto)]
+    tempos["extracao"] = time.perf_counter() - t0
+
+    resultados = classificador.classificar(paragrafos, tempos=tempos)
+    tempos["total"] = time.perf_counter() - t0
+    return paragrafos, resultados, tempos
+
+
+def mostrar_bula_classificada(classificador, paragrafos, resultados, tempos):
+    """Mostra a latência por etapa e os parágrafos agrupados pela seção prevista."""
+    st.markdown(f"**{len(paragrafos)} trechos classificados.** Tempo por etapa:")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Extração", f"{tempos['extracao'] * 1000:.0f} ms")
+    if "servidor" in tempos:
+        m2.metric("Servidor", f"{tempos['servidor'] * 1000:.0f} ms")
+        m3.metric("Rede", f"{tempos['rede'] * 1000:.0f} ms")
+    else:
+        m2.metric("Tokenização", f"{tempos.get('tokenizacao', 0) * 1000:.0f} ms")
+        m3.metric("Inferência", f"{tempos.get('inferencia', 0) * 1000:.0f} ms")
+    m4.metric("Total", f"{tempos['total'] * 1000:.0f} ms")
+    if classificador.cache is not None:
+        stats = classificador.cache.estatisticas()
+        st.caption(
+            f"Cache de previsões: {stats['acertos']} acertos, {stats['faltas']} faltas "
+            f"({stats['taxa_acerto']:.0%} de acerto desde o início do app)."
+        )
+    with st.expander("Métricas acumuladas desde o início do app (formato Prometheus)"):
+        st.code(instrumentacao.texto_prometheus(), language="text")
+
+    for label in classificador.labels:
+        trechos = [(p, r) for p, r in zip(paragrafos, resultados) if r["label"] == label]
+        if not trechos:
+            continue
+        bg_color, text_color = TAG_COLORS.get(label, ("#6c757d", "#ffffff"))
+        with st.expander(f"{label.replace('_', ' ').title()} ({len(trechos)})", expanded=label != "OUTROS"):
+            for paragrafo, resultado in trechos:
+                st.markdown(
+                    f"""
+                    <div class="segment-card" style="border-left: 4px solid {bg_color};">
+                        <div class="segment-meta">Confiança: {resultado["confianca"] * 100:.1f}%</div>
+                        <div class="segment-text">{html.escape(paragrafo)}</div>
+                    </div>
+                    """,
+                    unsafe_allow_html=True,
+                )
+
 
-    print("--- Carregando modelo e tokenizador do disco ---")
+# --- 4b. PASSAGENS SEMELHANTES ---
+def versao_indice(pasta: str):
+    """Data de modificação do metadados.json do índice (muda quando ele é refeito); None se não existe."""
     try:
-        tokenizer = AutoTokenizer.from_pretrained(MODELO_SALVO)
-        model = AutoModelForSequenceClassification.from_pretrained(
-            MODELO_SALVO,
-            use_safetensors=True
+        return os.stat(os.path.join(pasta, "metadados.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+@st.cache_resource(max_entries=1)
+def _abrir_indice(versao: int):
+    import indice_similares # O numpy só é importado quando este modo é usado
+    return indice_similares.IndiceSimilares(PASTA_INDICE_SIMILARES)
+
+
+def carregar_indice():
+    """
+    Índice de passagens semelhantes (6_indexar_similares.py), ou None se não foi gerado.
+    Só o índice aberto vai para o cache, com a versão como chave: um índice gerado (ou
+    refeito) com o app rodando aparece sem reiniciar.
+    """
+    versao = versao_indice(PASTA_INDICE_SIMILARES)
+    return None if versao is None else _abrir_indice(versao)
+
+
+def buscar_semelhantes(classificador, indice, texto: str, k: int, label: str | None):
+    """Embedding do trecho + busca no índice. Retorna (resultados, tempos em segundos)."""
+    t0 = time.perf_counter()
+    vetor = classificador.embeddings_textos([texto])[0].numpy()
+    t1 = time.perf_counter()
+    # Pede um a mais: o próprio trecho, se estiver no dataset, não conta como "semelhante"
+    normalizado = " ".join(texto.split())
+    resultados = [r for r in indice.buscar(vetor, k=k + 1, label=label)
+                  if " ".join(r["texto"].split()) != normalizado][:k]
+    return resultados, {"embedding": t1 - t0, "busca": time.perf_counter() - t1}
+
+
+def mostrar_semelhantes(classificador, indice, resultados, tempos):
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Embedding", f"{tempos['embedding'] * 1000:.0f} ms")
+    m2.metric("Busca no índice", f"{tempos['busca'] * 1000:.1f} ms")
+    m3.metric("Trechos no índice", f"{len(indice)}")
+    if indice.id_modelo != classificador.id_modelo:
+        st.warning("O índice foi gerado com outro modelo: rode de novo o 6_indexar_similares.py.")
+    if not resultados:
+        st.info("Nenhum trecho encontrado.")
+    for r in resultados:
+        bg_color, _ = TAG_COLORS.get(r["label"], ("#6c757d", "#ffffff"))
+        st.markdown(
+            f"""
+            <div class="segment-card" style="border-left: 4px solid {bg_color};">
+                <div class="segment-meta">Similaridade: {r["similaridade"]:.3f} ·
+                    {r["label"].replace("_", " ").title()} · {r["ocorrencias"]}x no dataset</div>
+                <div class="segment-text">{html.escape(r["texto"])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
         )
-        model.to("cpu")
-        print("--- Modelo carregado com sucesso ---")
-        return tokenizer, model
-    except Exception as e:
-        print(f"Erro ao carregar o modelo: {e}")
-        return None, None
 
 
-tokenizer, model = carregar_modelo()
-carregar_css()
+# --- 4c. BUSCA POR PALAVRAS ---
+@st.cache_resource(max_entries=1)
+def _abrir_indice_textual(versao: int):
+    return indice_textual.IndiceTextual(indice_textual.PASTA_INDICE)
+
+
+def carregar_indice_textual():
+    """Índice invertido dos trechos (2c_indexar_texto.py), ou None se não foi gerado (como carregar_indice)."""
+    versao = versao_indice(indice_textual.PASTA_INDICE)
+    return None if versao is None else _abrir_indice_textual(versao)
+
+
+def destacar(texto: str, termos, contexto: int = 400) -> str:
+    """HTML do trecho com as palavras buscadas em <mark>, recortado em volta da 1ª delas."""
+    pedacos = indice_textual.trechos_destacados(texto, termos)
+    primeira = 0
+    for pedaco, casou in pedacos:
+        if casou:
+            break
+        primeira += len(pedaco)
+    inicio = max(0, primeira - contexto)
+    fim = min(len(texto), inicio + 4 * contexto)
+    corpo = "".join(f"<mark>{html.escape(p)}</mark>" if casou else html.escape(p)
+                    for p, casou in indice_textual.trechos_destacados(texto[inicio:fim], termos))
+    return ("…" if inicio else "") + corpo + ("…" if fim < len(texto) else "")
+
+
+def mostrar_busca(resposta, segundos: float):
+    n_pdfs = len(resposta["por_documento"])
+    st.markdown(f"**{resposta['total']} trechos em {n_pdfs} bulas** ({segundos * 1000:.1f} ms).")
+    if n_pdfs:
+        with st.expander("Trechos por bula", expanded=n_pdfs <= 10):
+            st.markdown("\n".join(f"- `{nome}`: {n}" for nome, n in
+                                   sorted(resposta["por_documento"].items(), key=lambda item: -item[1])))
+    if resposta["total"] > len(resposta["resultados"]):
+        st.caption(f"Mostrando os {len(resposta['resultados'])} primeiros.")
+    for r in resposta["resultados"]:
+        bg_color, _ = TAG_COLORS.get(r["label"], ("#6c757d", "#ffffff"))
+        st.markdown(
+            f"""
+            <div class="segment-card" style="border-left: 4px solid {bg_color};">
+                <div class="segment-meta">{html.escape(r["documento"])} ·
+                    {f'p. {r["pagina"]} · ' if r["pagina"] else ""}{r["label"].replace("_", " ").title()}</div>
+                <div class="segment-text">{destacar(r["texto"], resposta["termos"])}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
 
 
-# --- 4. INTERFACE DO STREAMLIT ---
+# --- 5. INTERFACE DO STREAMLIT ---
 col1, col2 = st.columns([2, 1])
 
 with col1:
@@ -267,12 +504,99 @@ with col1:
         unsafe_allow_html=True,
     )
 
-    if model is None or tokenizer is None:
+    # Com o modelo ainda carregando a página já funciona; o erro só aparece quando
+    # se sabe que o carregamento falhou
+    falhou = carregamento.done() and carregamento.result() is None
+    if falhou and SERVIDOR:
+        st.error(
+            f"Erro crítico: o servidor de classificação ({SERVIDOR}) não respondeu. "
+            "Verifique se o servidor.py está rodando."
+        )
+    elif falhou:
         st.error(
             f"Erro crítico: a pasta do modelo treinado ('{MODELO_SALVO}') "
             "não foi encontrada. Verifique se o script de treino foi executado."
         )
-    else:
+    modo = st.radio(
+        "Modo",
+        # A busca por palavras não usa o modelo: continua disponível se ele falhou
+        ["Busca por palavras"] if falhou else
+        ["Um parágrafo", "Bula completa (PDF)", "Passagens semelhantes", "Busca por palavras"],
+        horizontal=True,
+        label_visibility="collapsed",
+    )
+    if not carregamento.done():
+        st.caption("⏳ Carregando o modelo em segundo plano...")
+
+    if not falhou and modo == "Bula completa (PDF)":
+        st.subheader("Envie o PDF de uma bula:")
+        arquivo_pdf = st.file_uploader("Bula em PDF", type=["pdf"])
+
+        if st.button("Classificar Bula"):
+            if arquivo_pdf is None:
+                st.warning("Por favor, envie um arquivo PDF.")
+            elif (classificador := obter_classificador()) is not None:
+                print(f"Classificando a bula: {arquivo_pdf.name}")
+                with st.spinner("Lendo e classificando a bula..."):
+                    paragrafos, resultados, tempos = classificar_bula(classificador, arquivo_pdf.getvalue())
+                if not paragrafos:
+                    st.warning(
+                        "Não foi possível extrair texto deste PDF "
+                        "(ele pode ser uma imagem escaneada)."
+                    )
+                else:
+                    mostrar_bula_classificada(classificador, paragrafos, resultados, tempos)
+            else:
+                st.rerun() # Mostra o erro do carregamento (acima)
+
+    elif modo == "Busca por palavras":
+        st.subheader("Procure palavras nos trechos das bulas:")
+        indice = carregar_indice_textual()
+        if indice is None:
+            st.info("O índice de busca ainda não foi gerado. Rode: python 2c_indexar_texto.py")
+        else:
+            consulta = st.text_input(
+                "Palavras (todas precisam aparecer; acentos e maiúsculas não importam; * no fim = prefixo)",
+                placeholder="Exemplo: hemólise",
+            )
+            c1, c2 = st.columns(2)
+            secao = c1.selectbox("Seção", ["Todas"] + indice.labels_nomes)
+            bula = c2.selectbox("Bula", ["Todas"] + indice.documentos)
+            if consulta.strip():
+                t0 = time.perf_counter()
+                resposta = indice.buscar(consulta, label=None if secao == "Todas" else secao,
+                                         documento=None if bula == "Todas" else bula)
+                mostrar_busca(resposta, time.perf_counter() - t0)
+
+    elif not falhou and modo == "Passagens semelhantes":
+        st.subheader("Veja como outras bulas escrevem o mesmo trecho:")
+        indice = carregar_indice()
+        if indice is None:
+            st.info("O índice de passagens semelhantes ainda não foi gerado. Rode: python 6_indexar_similares.py")
+        elif SERVIDOR or BACKEND == "onnx":
+            st.info("A busca precisa do encoder no próprio app (backend pytorch ou int8, sem --servidor).")
+        else:
+            texto_busca = st.text_area(
+                "Trecho de referência",
+                height=150,
+                placeholder='Exemplo: "Este medicamento é contraindicado para pacientes com insuficiência renal grave."',
+            )
+            c1, c2 = st.columns(2)
+            secao = c1.selectbox("Seção", ["Todas"] + indice.labels_nomes)
+            k = c2.slider("Resultados", min_value=1, max_value=20, value=5)
+
+            if st.button("Buscar Semelhantes"):
+                if not texto_busca.strip():
+                    st.warning("Por favor, insira um trecho para buscar.")
+                elif (classificador := obter_classificador()) is None:
+                    st.rerun() # Mostra o erro do carregamento (acima)
+                else:
+                    print(f"Buscando semelhantes a: {texto_busca[:50]}...")
+                    resultados, tempos = buscar_semelhantes(classificador, indice, texto_busca, k,
+                                                            None if secao == "Todas" else secao)
+                    mostrar_semelhantes(classificador, indice, resultados, tempos)
+
+    elif not falhou:
         st.subheader("Cole um parágrafo de bula abaixo:")
         texto_usuario = st.text_area(
             "Texto da bula",
@@ -281,26 +605,16 @@ with col1:
         )
 
         if st.button("Classificar Texto"):
-            if texto_usuario.strip():
+            if not texto_usuario.strip():
+                st.warning("Por favor, insira um texto para classificar.")
+            elif (classificador := obter_classificador()) is None:
+                st.rerun() # Mostra o erro do carregamento (acima)
+            else:
                 print(f"Classificando o texto: {texto_usuario[:50]}...")
 
-                inputs = tokenizer(
-                    texto_usuario,
-                    return_tensors="pt",
-                    truncation=True,
-                    max_length=128,
-                    padding=True,
-                )
-                inputs = {k: v.to("cpu") for k, v in inputs.items()}
-
-                with torch.no_grad():
-                    outputs = model(**inputs)
-
-                logits = outputs.logits[0]
-                probs = torch.softmax(logits, dim=-1)
-                previsao_id = int(torch.argmax(probs).item())
-                previsao_label = id2label[previsao_id]
-                confidence = float(probs[previsao_id].item())
+                resultado = classificador.classificar([texto_usuario])[0]
+                previsao_label = resultado["label"]
+                confidence = resultado["confianca"]
 
                 bg_color, text_color = TAG_COLORS.get(
                     previsao_label, ("#6c757d", "#ffffff")
@@ -324,8 +638,6 @@ with col1:
                     """,
                     unsafe_allow_html=True,
                 )
-            else:
-                st.warning("Por favor, insira um texto para classificar.")
 
 
 with col2:
@@ -0,0 +1,111 @@
+"""
+Busca por palavras nos trechos etiquetados: o jeito antigo (ler o CSV com pandas e
+filtrar com str.contains) contra o índice invertido (indice_textual.py).
+
+    pandas    pd.read_csv + filtro pela etiqueta + str.contains (sem acento nem maiúsculas)
+    índice    abrir o índice (uma vez) + IndiceTextual.buscar, por consulta
+
+Com --replicar N, os trechos dos PDFs são repetidos N vezes (como se fossem N vezes
+mais bulas), para ver como os dois crescem com o corpus.
+
+Uso (na raiz do projeto; depois do 2_etiquetar_automatico.py):
+    python benchmarks/busca_textual.py [--replicar 1 20 100]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import importlib
+import statistics
+import pandas as pd
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indice_textual
+etiquetador = importlib.import_module("2_etiquetar_automatico")
+
+# (consulta, etiqueta): palavras raras, comuns e prefixos
+CONSULTAS = [
+    ("hemólise", "EFEITOS_ADVERSOS"),
+    ("alergia", "CONTRAINDICACAO"),
+    ("insuficiência renal", None),
+    ("gravidez amament*", None),
+    ("comprimido", "POSOLOGIA"),
+    ("medicamento", None),
+]
+
+
+def documentos_do_cache(replicar: int):
+    """(nome, trechos) de cada PDF da pasta data, lidos do cache da etiquetagem, N vezes."""
+    nomes = sorted(f for f in os.listdir("data") if f.endswith(".pdf"))
+    documentos = []
+    for nome in nomes:
+        dados, erro, _ = etiquetador.processar_pdf(os.path.join("data", nome), pasta_cache=etiquetador.PASTA_CACHE)
+        if not erro:
+            documentos.append((nome, dados))
+    return [(f"{i}/{nome}", dados) for i in range(replicar) for nome, dados in documentos]
+
+
+def buscar_pandas(caminho_csv: str, consulta: str, label):
+    df = pd.read_csv(caminho_csv)
+    if label:
+        df = df[df["label"] == label]
+    texto = df["texto"].map(indice_textual.dobrar)
+    for termo in indice_textual.termos_consulta(consulta):
+        if termo.endswith("*"):
+            texto_filtrado = texto.str.contains(r"\b" + termo[:-1], regex=True)
+        else:
+            texto_filtrado = texto.str.contains(r"\b" + termo + r"\b", regex=True)
+        texto = texto[texto_filtrado]
+    return len(texto)
+
+
+def medir(replicar: int, pasta: str, repeticoes: int):
+    documentos = documentos_do_cache(replicar)
+    caminho_csv = os.path.join(pasta, "trechos.csv")
+    pd.DataFrame([(t, l) for _, dados in documentos for t, l in dados], columns=["texto", "label"]) \
+        .to_csv(caminho_csv, index=False)
+    pasta_indice = os.path.join(pasta, "indice")
+    metadados = indice_textual.construir_indice(pasta_indice, documentos)
+
+    t0 = time.perf_counter()
+    indice = indice_textual.IndiceTextual(pasta_indice)
+    abrir_ms = (time.perf_counter() - t0) * 1000
+    tamanho_csv = os.path.getsize(caminho_csv) / 1024 ** 2
+    print(f"\n--- {metadados['n_trechos']} trechos de {len(documentos)} PDFs (CSV de {tamanho_csv:.1f} MB) ---")
+    print(f"Construção do índice: {metadados['segundos_construcao']:.1f} s | abrir: {abrir_ms:.1f} ms")
+    print(f"{'consulta':<32}{'trechos':>9}{'pandas (ms)':>13}{'índice (ms)':>13}")
+    for consulta, label in CONSULTAS:
+        t0 = time.perf_counter()
+        total_pandas = buscar_pandas(caminho_csv, consulta, label)
+        pandas_ms = (time.perf_counter() - t0) * 1000
+        tempos = []
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            resposta = indice.buscar(consulta, label=label)
+            tempos.append((time.perf_counter() - t0) * 1000)
+        if resposta["total"] != total_pandas:
+            print(f"  [AVISO] '{consulta}': índice {resposta['total']} x pandas {total_pandas}")
+        nome = consulta + (f" [{label}]" if label else "")
+        print(f"{nome:<32}{resposta['total']:>9}{pandas_ms:>13.1f}{statistics.median(tempos):>13.2f}")
+    shutil.rmtree(pasta_indice)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pandas x índice invertido na busca por palavras.")
+    parser.add_argument("--replicar", type=int, nargs="+", default=[1, 20, 100])
+    parser.add_argument("--repeticoes", type=int, default=20, help="Buscas no índice por consulta (mediana)")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_busca_")
+    try:
+        for replicar in args.replicar:
+            medir(replicar, pasta, args.repeticoes)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
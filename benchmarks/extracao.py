@@ -0,0 +1,87 @@
+"""
+Compara os dois caminhos de extração da etiquetagem sobre as bulas da pasta 'data':
+
+- texto : ler_pdf (texto corrido) + iterar_segmentos (JUNK_REGEX + regex em toda linha)
+- layout: extrair_linhas_layout (fonte/posição) + iterar_segmentos_layout
+
+Mede velocidade (páginas/s, de ponta a ponta: abrir o PDF até ter os segmentos) e
+rendimento de etiquetas (nº de segmentos e de caracteres por etiqueta).
+
+Uso (na raiz do projeto):
+    python benchmarks/extracao.py [--repeticoes 3]
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+from collections import Counter
+
+import fitz  # PyMuPDF
+
+# Permite importar os scripts da raiz do projeto (ex: 2_etiquetar_automatico.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+etiquetador = importlib.import_module("2_etiquetar_automatico")
+
+
+def caminho_texto(caminho_pdf):
+    return list(etiquetador.iterar_segmentos(etiquetador.ler_pdf(caminho_pdf)))
+
+
+def caminho_layout(caminho_pdf):
+    return list(etiquetador.iterar_segmentos_layout(etiquetador.extrair_linhas_layout(caminho_pdf)))
+
+
+def medir(funcao, caminhos, repeticoes):
+    """Melhor tempo (s) de 'repeticoes' passadas por todos os PDFs + os segmentos da última."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        segmentos = [funcao(c) for c in caminhos]
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, [seg for segs in segmentos for seg in segs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasta", default="data", help="Pasta com os PDFs (padrão: data)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Repetições por caminho (vale a melhor)")
+    args = parser.parse_args()
+
+    caminhos = [os.path.join(args.pasta, f) for f in sorted(os.listdir(args.pasta)) if f.endswith(".pdf")]
+    n_paginas = 0
+    for c in caminhos:
+        with fitz.open(c) as doc:
+            n_paginas += len(doc)
+    print(f"--- {len(caminhos)} PDFs, {n_paginas} páginas ---")
+
+    resultados = {}
+    for nome, funcao in [("texto", caminho_texto), ("layout", caminho_layout)]:
+        tempo, segmentos = medir(funcao, caminhos, args.repeticoes)
+        resultados[nome] = (tempo, segmentos)
+        print(f"{nome:<7}: {n_paginas / tempo:>8,.1f} páginas/s ({tempo:.2f} s)")
+
+    print("\n--- Rendimento por etiqueta (segmentos / caracteres) ---")
+    contagens = {}
+    for nome, (_, segmentos) in resultados.items():
+        n = Counter(label for _, label in segmentos)
+        chars = Counter()
+        for texto, label in segmentos:
+            chars[label] += len(texto)
+        contagens[nome] = (n, chars)
+
+    labels = sorted(set(contagens["texto"][0]) | set(contagens["layout"][0]))
+    print(f"{'etiqueta':<18}{'texto':>16}{'layout':>16}")
+    for label in labels + ["TOTAL"]:
+        linha = f"{label:<18}"
+        for nome in ("texto", "layout"):
+            n, chars = contagens[nome]
+            if label == "TOTAL":
+                linha += f"{sum(n.values()):>7} / {sum(chars.values()):>7}"
+            else:
+                linha += f"{n[label]:>7} / {chars[label]:>7}"
+        print(linha)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Tempo de inicialização: quanto custa importar cada módulo do projeto (medido com
+'python -X importtime', num processo novo por módulo) e quanto o app.py demora para
+desenhar a primeira página (streamlit.testing, sem abrir navegador).
+
+Para cada módulo mostra o tempo total de importação, as dependências mais pesadas
+e se ele puxou o torch, o transformers ou o pandas.
+
+Uso (na raiz do projeto):
+    python benchmarks/inicializacao.py [--modulos classificador 2_etiquetar_automatico] [--repeticoes 3]
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS = ["config_modelo", "cache_predicoes", "cliente_classificador", "2_etiquetar_automatico",
+           "pipeline", "classificador", "streamlit"]
+PESADOS = ("torch", "transformers", "pandas")
+
+# Roda num processo novo: tempo até o app.py terminar a 1ª execução do script
+CODIGO_APP = """
+import time
+inicio = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=300).run()
+assert not at.exception, at.exception
+print("SEGUNDOS", time.perf_counter() - inicio)
+"""
+
+
+def importtime(modulo: str) -> dict:
+    """Importa o módulo num processo novo com -X importtime e resume a saída."""
+    # __import__ em vez de importlib.import_module: o -X importtime não lista o
+    # módulo pedido por este último (e os scripts numerados não são identificadores)
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"__import__({modulo!r})"],
+        cwd=RAIZ, capture_output=True, text=True, check=True,
+    )
+    total, dependencias, carregados = 0, [], set()
+    # A saída vem em pós-ordem: as dependências diretas (nível 1) aparecem logo antes
+    # da linha do módulo que as importou (nível 0)
+    for linha in processo.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        _, cumulativo, nome = linha[len("import time:"):].split("|")
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2 # 1 espaço + 2 por nível
+        nome = nome.strip()
+        carregados.add(nome.split(".")[0])
+        if nivel == 1:
+            dependencias.append((int(cumulativo), nome))
+        elif nivel == 0 and nome != modulo:
+            dependencias = []
+        elif nivel == 0:
+            total = int(cumulativo)
+            break
+    return {
+        "ms": total / 1000,
+        "dependencias": [f"{nome} {us / 1000:.0f}" for us, nome in sorted(dependencias, reverse=True)[:3]],
+        "pesados": [nome for nome in PESADOS if nome in carregados],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação dos módulos e 1ª renderização do app.")
+    parser.add_argument("--modulos", nargs="+", default=MODULOS)
+    parser.add_argument("--repeticoes", type=int, default=3, help="Medidas por módulo (fica a menor)")
+    parser.add_argument("--sem-app", action="store_true", help="Não mede a 1ª renderização do app.py")
+    args = parser.parse_args()
+
+    print(f"{'módulo':<26}{'import (ms)':>12}  {'puxa':<34}dependências mais pesadas (ms)")
+    for modulo in args.modulos:
+        medidas = min((importtime(modulo) for _ in range(args.repeticoes)), key=lambda m: m["ms"])
+        print(f"{modulo:<26}{medidas['ms']:>12.0f}  {', '.join(medidas['pesados']) or '-':<34}"
+              f"{', '.join(medidas['dependencias'])}")
+
+    if not args.sem_app:
+        tempos = []
+        for _ in range(args.repeticoes):
+            processo = subprocess.run([sys.executable, "-c", CODIGO_APP], cwd=RAIZ,
+                                      capture_output=True, text=True, check=True)
+            tempos.append(float(processo.stdout.split("SEGUNDOS")[1].split()[0]))
+        print(f"\napp.py: 1ª página desenhada em {min(tempos):.2f} s (melhor de {len(tempos)}; "
+              "inclui importar o streamlit)")
+
+
+if __name__ == "__main__":
+    main()
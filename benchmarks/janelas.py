@@ -0,0 +1,71 @@
+"""
+Compara, nos textos LONGOS do conjunto de teste (mais de max_length tokens), a
+classificação com corte em max_length contra o modo de janelas deslizantes do
+classificador.py (janelas sobrepostas + média dos logits).
+
+Mede acurácia/F1 e latência (total e por parágrafo) dos dois modos com o mesmo modelo.
+O conjunto de teste é o mesmo 20% do 4_treinar_modelo.py (ver 5_exportar_modelo.py).
+
+Uso (na raiz do projeto):
+    python benchmarks/janelas.py [--modelo PASTA] [--stride 32] [--repeticoes 3]
+"""
+import os
+import sys
+import time
+import argparse
+import importlib
+
+from sklearn.metrics import accuracy_score, f1_score
+
+# Permite importar os scripts da raiz do projeto (ex: 5_exportar_modelo.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classificador import MODELO_SALVO, STRIDE_JANELA, ClassificadorBulas
+exportador = importlib.import_module("5_exportar_modelo")
+
+
+def medir(classificador, textos, labels, repeticoes):
+    """Melhor tempo entre as repetições + métricas das previsões."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultados = classificador.classificar(textos)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    previsoes = [r["label"] for r in resultados]
+    return {
+        "accuracy": accuracy_score(labels, previsoes),
+        "f1": f1_score(labels, previsoes, average="weighted"),
+        "segundos": melhor,
+        "ms_por_paragrafo": 1000 * melhor / len(textos),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corte em max_length x janelas deslizantes em textos longos.")
+    parser.add_argument("--modelo", default=MODELO_SALVO, help=f"Pasta do modelo (padrão: {MODELO_SALVO})")
+    parser.add_argument("--stride", type=int, default=STRIDE_JANELA, help="Tokens em comum entre janelas vizinhas")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    corte = ClassificadorBulas(args.modelo, janelas=False)
+    janelas = ClassificadorBulas(args.modelo, janelas=True, stride=args.stride)
+
+    textos, ids = exportador.carregar_conjunto_teste()
+    comprimentos = [len(x) for x in corte.tokenizer(textos)["input_ids"]]
+    longos = [(t, corte.labels[i]) for t, i, n in zip(textos, ids, comprimentos) if n > corte.max_length]
+    if not longos:
+        print(f"Nenhum texto do teste passa de {corte.max_length} tokens.")
+        return
+    textos_longos, labels_longos = zip(*longos)
+    n_janelas = len(corte.tokenizer(list(textos_longos), truncation=True, max_length=corte.max_length,
+                                    stride=args.stride, return_overflowing_tokens=True)["input_ids"])
+    print(f"{len(textos_longos)} de {len(textos)} textos do teste passam de {corte.max_length} tokens "
+          f"({n_janelas} janelas, stride {args.stride}).")
+
+    print(f"\n{'modo':<10}{'acc':>8}{'F1':>8}{'total (s)':>11}{'ms/parág.':>11}")
+    for nome, classificador in (("corte", corte), ("janelas", janelas)):
+        r = medir(classificador, list(textos_longos), labels_longos, args.repeticoes)
+        print(f"{nome:<10}{r['accuracy']:>8.4f}{r['f1']:>8.4f}{r['segundos']:>11.2f}{r['ms_por_paragrafo']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Memória de N workers no mesmo host, cada um com o seu ClassificadorBulas:
+    padrao  cada processo carrega o modelo do jeito padrão (from_pretrained)
+    mmap    cada processo mapeia os pesos do .safetensors, somente leitura (pesos_mmap=True)
+    fork    um processo carrega (com mmap) e os outros N-1 nascem dele por fork(), herdando
+            também o torch/transformers já importados (copy-on-write)
+
+Os N processos carregam o modelo, classificam alguns parágrafos e só então, com
+todos vivos ao mesmo tempo, medem a memória (/proc/self/smaps_rollup):
+    RSS          o que o 'top' mostra por processo (conta as páginas compartilhadas em todos)
+    compartilh.  páginas usadas também por outro processo (pesos mapeados, bibliotecas)
+    privada      só deste processo: é o custo de cada worker a mais
+    PSS          RSS com cada página compartilhada dividida entre os processos que a usam;
+                 a soma do PSS é a memória que os N workers realmente ocupam
+
+Uso (na raiz do projeto; só Linux):
+    python benchmarks/memoria_compartilhada.py [--modelo PASTA] [--workers 4] [--modos padrao mmap fork]
+"""
+import os
+import sys
+import argparse
+import multiprocessing
+
+import pandas as pd
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_modelo import MODELO_SALVO
+
+ARQUIVO_DATASET = os.path.join("dataset", "dataset_completo_automatico.csv")
+MODOS = ("padrao", "mmap", "fork")
+
+
+def worker(modelo, modo, textos, carregados, medidos, fila, classificador=None):
+    from classificador import ClassificadorBulas, memoria_processo
+    if classificador is None:
+        classificador = ClassificadorBulas(modelo, pesos_mmap=modo == "mmap")
+    classificador.classificar(textos) # Toca todos os pesos, como um worker de verdade
+    carregados.wait() # Mede só com todos os workers vivos e com o modelo carregado
+    fila.put(memoria_processo())
+    medidos.wait()
+
+
+def medir(modelo, modo, n_workers, textos):
+    classificador = None
+    if modo == "fork":
+        # Este processo carrega o modelo e é o 1º worker; os outros são cópias dele
+        from classificador import ClassificadorBulas
+        classificador = ClassificadorBulas(modelo, pesos_mmap=True)
+        contexto = multiprocessing.get_context("fork")
+    else:
+        contexto = multiprocessing.get_context("spawn")
+    carregados, medidos = contexto.Barrier(n_workers), contexto.Barrier(n_workers)
+    fila = contexto.Queue()
+    argumentos = (modelo, modo, textos, carregados, medidos, fila, classificador)
+    processos = [contexto.Process(target=worker, args=argumentos)
+                 for _ in range(n_workers - (modo == "fork"))]
+    for processo in processos:
+        processo.start()
+    if modo == "fork":
+        worker(*argumentos)
+    medidas = [fila.get() for _ in range(n_workers)]
+    for processo in processos:
+        processo.join()
+    return medidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSS x memória compartilhada de N workers com o mesmo modelo.")
+    parser.add_argument("--modelo", default=MODELO_SALVO, help=f"Pasta do modelo (padrão: {MODELO_SALVO})")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modos", nargs="+", choices=MODOS, default=list(MODOS))
+    parser.add_argument("--paragrafos", type=int, default=32, help="Parágrafos classificados por worker")
+    args = parser.parse_args()
+
+    textos = pd.read_csv(ARQUIVO_DATASET)["texto"].head(args.paragrafos).tolist()
+    tamanho_pesos = sum(os.path.getsize(os.path.join(args.modelo, nome)) for nome in os.listdir(args.modelo)
+                        if nome.endswith(".safetensors")) / 1024 ** 2
+    print(f"Modelo: {args.modelo} ({tamanho_pesos:.0f} MB de pesos) | {args.workers} workers\n")
+
+    print(f"{'modo':<8}{'RSS/proc.':>11}{'compartilh.':>13}{'privada':>10}{'PSS/proc.':>11}"
+          f"{'soma RSS':>10}{'soma PSS':>10}")
+    # O "fork" por último: ele carrega o modelo neste processo
+    for modo in sorted(args.modos, key=MODOS.index):
+        medidas = medir(args.modelo, modo, args.workers, textos)
+        if medidas[0] is None:
+            raise SystemExit("Este benchmark precisa do /proc/self/smaps_rollup (Linux).")
+        media = {chave: sum(m[chave] for m in medidas) / len(medidas) for chave in medidas[0]}
+        print(f"{modo:<8}{media['rss_mb']:>11.0f}{media['compartilhada_mb']:>13.0f}{media['privada_mb']:>10.0f}"
+              f"{media['pss_mb']:>11.0f}{media['rss_mb'] * len(medidas):>10.0f}{media['pss_mb'] * len(medidas):>10.0f}")
+    print("\n(MB. Cada worker a mais custa ~ a memória 'privada'; a soma do PSS é o total real no host.)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Benchmark de ponta a ponta do pipeline, sobre as bulas da pasta 'data':
+
+    extracao      PDF -> texto (ler_pdf)                      páginas/s
+    segmentacao   texto -> segmentos (iterar_segmentos)       linhas/s
+    balanceamento 3_balancear_dataset (contagem + amostragem) linhas/s
+    tokenizacao   tokenizador do modelo no dataset balanceado tokens/s
+    inferencia_N  ClassificadorBulas com lotes de N           parágrafos/s
+
+Cada etapa roda num processo novo (spawn), então o pico de memória (RSS) medido
+é só daquela etapa (inclui os imports). O tempo é o melhor de --repeticoes.
+
+O resultado vai para um JSON com chaves ordenadas e valores arredondados, fácil
+de comparar entre commits (git diff ou --comparar):
+
+Uso (na raiz do projeto):
+    python benchmarks/pipeline.py [--saida benchmarks/resultado_pipeline.json]
+    python benchmarks/pipeline.py --comparar resultado_antigo.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import platform
+import argparse
+import resource
+import importlib
+import subprocess
+import multiprocessing
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+ARQUIVO_SAIDA = os.path.join("benchmarks", "resultado_pipeline.json")
+PASTA_PDFS = "data"
+TAMANHOS_LOTE = (1, 8, 32)
+LIMIAR_REGRESSAO = 0.10 # Queda de vazão acima de 10% é marcada no --comparar
+
+
+# --- 1. ETAPAS (cada uma roda num processo separado) ---
+def pico_rss_mb() -> float:
+    """
+    Pico de RSS deste processo. No Linux lê o VmHWM, que começa do zero no exec;
+    o ru_maxrss herda o pico do processo pai, que já carregou o PyTorch.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 1024 # kB -> MB
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Linux: KB
+
+
+def melhor_tempo(funcao, repeticoes):
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def etapa_extracao(repeticoes, _modelo, _paragrafos):
+    import fitz
+    etiquetador = importlib.import_module("2_etiquetar_automatico")
+    pdfs = sorted(glob.glob(os.path.join(PASTA_PDFS, "*.pdf")))
+    paginas = 0
+    for pdf in pdfs:
+        with fitz.open(pdf) as doc:
+            paginas += doc.page_count
+    segundos, _ = melhor_tempo(lambda: [etiquetador.ler_pdf(pdf) for pdf in pdfs], repeticoes)
+    return segundos, paginas, "paginas"
+
+
+def etapa_segmentacao(repeticoes, _modelo, _paragrafos):
+    etiquetador = importlib.import_module("2_etiquetar_automatico")
+    textos = [etiquetador.ler_pdf(pdf) for pdf in sorted(glob.glob(os.path.join(PASTA_PDFS, "*.pdf")))]
+    linhas = sum(texto.count("\n") + 1 for texto in textos)
+    segundos, _ = melhor_tempo(lambda: [list(etiquetador.iterar_segmentos(t)) for t in textos], repeticoes)
+    return segundos, linhas, "linhas"
+
+
+def etapa_balanceamento(repeticoes, _modelo, _paragrafos):
+    balanceador = importlib.import_module("3_balancear_dataset")
+    entrada = balanceador.arquivo_entrada()
+
+    def balancear():
+        disponiveis = balanceador.contar_classes(entrada)
+        alvos = balanceador.calcular_alvos(disponiveis)
+        balanceador.amostrar(entrada, disponiveis, alvos) # Sem gravar o CSV de saída
+        return int(disponiveis.sum())
+
+    segundos, linhas = melhor_tempo(balancear, repeticoes)
+    return segundos, linhas, "linhas"
+
+
+def etapa_tokenizacao(repeticoes, modelo, _paragrafos):
+    import pandas as pd
+    from transformers import AutoTokenizer
+    from classificador import MAX_LENGTH
+    textos = pd.read_csv(os.path.join("dataset", "dataset_final_balanceado.csv"))["texto"].tolist()
+    tokenizer = AutoTokenizer.from_pretrained(modelo)
+    segundos, codificado = melhor_tempo(
+        lambda: tokenizer(textos, truncation=True, max_length=MAX_LENGTH), repeticoes
+    )
+    return segundos, sum(len(ids) for ids in codificado["input_ids"]), "tokens"
+
+
+def etapa_inferencia(tamanho_lote):
+    def etapa(repeticoes, modelo, paragrafos):
+        import pandas as pd
+        from classificador import ClassificadorBulas
+        textos = pd.read_csv(os.path.join("dataset", "dataset_final_balanceado.csv"))["texto"].tolist()[:paragrafos]
+        classificador = ClassificadorBulas(modelo, tamanho_lote=tamanho_lote)
+        classificador.classificar(textos[:tamanho_lote]) # Aquecimento
+        segundos, _ = melhor_tempo(lambda: classificador.classificar(textos), repeticoes)
+        return segundos, len(textos), "paragrafos"
+    return etapa
+
+
+ETAPAS = {
+    "extracao": etapa_extracao,
+    "segmentacao": etapa_segmentacao,
+    "balanceamento": etapa_balanceamento,
+    "tokenizacao": etapa_tokenizacao,
+    **{f"inferencia_lote_{n}": etapa_inferencia(n) for n in TAMANHOS_LOTE},
+}
+
+
+def rodar_etapa(nome, repeticoes, modelo, paragrafos):
+    """Executada no processo filho: roda a etapa e devolve as medidas."""
+    os.chdir(RAIZ)
+    segundos, itens, unidade = ETAPAS[nome](repeticoes, modelo, paragrafos)
+    return {
+        "segundos": round(segundos, 4),
+        "itens": itens,
+        "unidade": unidade,
+        "vazao_por_s": round(itens / segundos, 1) if segundos else None,
+        "pico_rss_mb": round(pico_rss_mb(), 1),
+    }
+
+
+# --- 2. COMPARAÇÃO ENTRE EXECUÇÕES ---
+def comparar(antigo: dict, novo: dict):
+    print(f"\n{'etapa':<22}{'antes':>12}{'agora':>12}{'Δ vazão':>10}{'Δ RSS (MB)':>12}")
+    for nome, medida in novo["etapas"].items():
+        anterior = antigo.get("etapas", {}).get(nome)
+        if not anterior or not anterior.get("vazao_por_s") or medida.get("vazao_por_s") is None:
+            print(f"{nome:<22}{'-':>12}{medida.get('vazao_por_s', '-'):>12}")
+            continue
+        delta = medida["vazao_por_s"] / anterior["vazao_por_s"] - 1
+        alerta = "  <-- REGRESSÃO" if delta < -LIMIAR_REGRESSAO else ""
+        print(f"{nome:<22}{anterior['vazao_por_s']:>12}{medida['vazao_por_s']:>12}{delta:>+10.1%}"
+              f"{medida['pico_rss_mb'] - anterior['pico_rss_mb']:>+12.1f}{alerta}")
+
+
+def commit_atual() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- 3. EXECUÇÃO PRINCIPAL ---
+def main():
+    from classificador import MODELO_SALVO
+
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do pipeline (tempo, RSS e vazão por etapa).")
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA, help=f"JSON de resultado (padrão: {ARQUIVO_SAIDA})")
+    parser.add_argument("--comparar", default=None, help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--etapas", nargs="+", choices=list(ETAPAS), default=list(ETAPAS))
+    parser.add_argument("--modelo", default=MODELO_SALVO, help=f"Pasta do modelo (padrão: {MODELO_SALVO})")
+    parser.add_argument("--paragrafos", type=int, default=256, help="Parágrafos na etapa de inferência")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    import torch
+    import transformers
+    resultado = {
+        "meta": {
+            "commit": commit_atual(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "transformers": transformers.__version__,
+            "cpus": os.cpu_count(),
+            "pdfs": len(glob.glob(os.path.join(RAIZ, PASTA_PDFS, "*.pdf"))),
+            "repeticoes": args.repeticoes,
+            "paragrafos_inferencia": args.paragrafos,
+        },
+        "etapas": {},
+    }
+
+    contexto = multiprocessing.get_context("spawn")
+    print(f"{'etapa':<22}{'segundos':>10}{'vazão/s':>12}{'unidade':>12}{'pico RSS (MB)':>15}")
+    for nome in args.etapas:
+        with contexto.Pool(1) as pool:
+            medida = pool.apply(rodar_etapa, (nome, args.repeticoes, args.modelo, args.paragrafos))
+        resultado["etapas"][nome] = medida
+        print(f"{nome:<22}{medida['segundos']:>10.3f}{medida['vazao_por_s']:>12}{medida['unidade']:>12}"
+              f"{medida['pico_rss_mb']:>15}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+    print(f"\nResultado salvo em: {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar(json.load(f), resultado)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Micro-benchmark do segmentador (segmentar_e_etiquetar) sobre as bulas da pasta 'data'.
+
+Compara a versão antiga (JUNK_REGEX com re.IGNORECASE e ~15 regex de cabeçalho
+recompilados a cada chamada e testados um por um) com a atual (lixo testado sobre
+a linha em minúsculas + um único regex de cabeçalhos com filtro de prefixo),
+em linhas por segundo. O texto dos PDFs
+é extraído uma vez só, antes de medir, para que o tempo do PyMuPDF não entre na conta.
+
+Uso (na raiz do projeto):
+    python benchmarks/segmentacao.py [--repeticoes 20]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import importlib
+
+# Permite importar os scripts da raiz do projeto (ex: 2_etiquetar_automatico.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+etiquetador = importlib.import_module("2_etiquetar_automatico")
+
+
+# Filtro de lixo da versão anterior (re.IGNORECASE direto na linha original)
+JUNK_REGEX_ANTIGO = re.compile(
+    r"Bula (para|do) paciente|eurofarma|CIMED|SANTISA|TEUTO|RANBAXY|GERMED|VITAMEDIC|MULTILAB|"
+    r"Modelo de bula|Informações ao Paciente|IDENTIFICAÇÃO DO MEDICAMENTO|"
+    r"Farm\. Resp|CNPJ|Indústria Brasileira|^\s*página \d+|\s*VP REV \d+",
+    re.IGNORECASE
+)
+
+
+def segmentar_e_etiquetar_antigo(texto: str):
+    """Cópia da implementação anterior, usada só como referência ("antes")."""
+    regex_mapeada = [(re.compile(p, re.IGNORECASE), lbl) for p, lbl in etiquetador.padroes]
+
+    dados = []
+    buffer = []
+    label_atual = "OUTROS"
+
+    def flush():
+        if not buffer:
+            return
+        bloco = "\n".join(buffer).strip()
+        if len(bloco) >= 50:
+            dados.append((bloco, label_atual))
+        buffer.clear()
+
+    for linha in texto.splitlines():
+        linha_limpa = linha.strip()
+        if not linha_limpa or JUNK_REGEX_ANTIGO.search(linha_limpa):
+            continue
+
+        encontrado = None
+        for rx, lbl in regex_mapeada:
+            if rx.search(linha_limpa):
+                encontrado = lbl
+                break
+
+        if encontrado:
+            flush()
+            label_atual = "OUTROS" if encontrado == etiquetador.STOP_LABEL else encontrado
+            continue
+
+        buffer.append(linha)
+
+    flush()
+
+    dados_expandidos = []
+    for bloco, lbl in dados:
+        paragrafos = [p.strip() for p in re.split(r"(\n\s*){2,}", bloco) if p.strip()]
+        for p in paragrafos:
+            if len(p) >= 50:
+                dados_expandidos.append((p, lbl))
+    return dados_expandidos
+
+
+def medir(funcao, textos, repeticoes):
+    """Roda 'funcao' sobre todos os textos 'repeticoes' vezes e retorna o melhor tempo (s)."""
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for texto in textos:
+            funcao(texto)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pasta", default="data", help="Pasta com os PDFs (padrão: data)")
+    parser.add_argument("--repeticoes", type=int, default=20, help="Repetições por versão (vale a melhor)")
+    args = parser.parse_args()
+
+    arquivos = sorted(f for f in os.listdir(args.pasta) if f.endswith(".pdf"))
+    print(f"--- Extraindo texto de {len(arquivos)} PDFs (fora da medição) ---")
+    textos = [etiquetador.ler_pdf(os.path.join(args.pasta, f)) for f in arquivos]
+    n_linhas = sum(len(t.splitlines()) for t in textos)
+    print(f"Total: {n_linhas} linhas")
+
+    # As duas versões precisam gerar exatamente os mesmos segmentos
+    for nome, texto in zip(arquivos, textos):
+        if segmentar_e_etiquetar_antigo(texto) != [tuple(seg) for seg in etiquetador.segmentar_e_etiquetar(texto)]:
+            print(f"[ERRO] Saídas diferentes para {nome}")
+            sys.exit(1)
+    print("Saídas idênticas nas duas versões.")
+
+    t_antes = medir(segmentar_e_etiquetar_antigo, textos, args.repeticoes)
+    t_depois = medir(etiquetador.segmentar_e_etiquetar, textos, args.repeticoes)
+
+    print("\n--- Resultado (melhor de {} repetições) ---".format(args.repeticoes))
+    print(f"Antes : {n_linhas / t_antes:>12,.0f} linhas/s ({t_antes * 1000:.1f} ms)")
+    print(f"Depois: {n_linhas / t_depois:>12,.0f} linhas/s ({t_depois * 1000:.1f} ms)")
+    print(f"Ganho : {t_antes / t_depois:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Teste de carga do servidor.py: N clientes simultâneos, cada um mandando um
+parágrafo por vez para /classificar (o pior caso para o modelo, que o micro-lote
+resolve juntando pedidos concorrentes).
+
+Mede, do lado do cliente, a latência (p50/p90/p99) e a vazão; do lado do servidor
+(/metricas), quantos parágrafos couberam em cada micro-lote.
+
+Uso (na raiz do projeto, com o servidor já no ar):
+    python servidor.py --sem-cache --max-espera-ms 10
+    python benchmarks/servidor.py [--url http://127.0.0.1:8000] [--clientes 1 8 32] [--pedidos 256]
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cliente_classificador import ClienteClassificador
+
+ARQUIVO_DATASET = os.path.join("dataset", "dataset_completo_automatico.csv")
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p / 100 * len(valores)))]
+
+
+def rodada(cliente, textos, n_clientes):
+    """Dispara os textos (um por pedido) com n_clientes threads; retorna latências e segundos."""
+    def um_pedido(texto):
+        inicio = time.perf_counter()
+        cliente._pedir("/classificar", {"texto": texto})
+        return (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(n_clientes) as executor:
+        latencias = list(executor.map(um_pedido, textos))
+    return latencias, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do servidor de classificação.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--pedidos", type=int, default=256, help="Pedidos por rodada")
+    args = parser.parse_args()
+
+    cliente = ClienteClassificador(args.url)
+    textos = pd.read_csv(ARQUIVO_DATASET)["texto"].tolist()
+
+    print(f"{'clientes':>9}{'p50 (ms)':>10}{'p90 (ms)':>10}{'p99 (ms)':>10}{'pedidos/s':>11}{'parág./lote':>13}")
+    for i, n_clientes in enumerate(args.clientes):
+        # Textos diferentes a cada rodada, para o cache do servidor (se ligado) não ajudar
+        amostra = [textos[(i * args.pedidos + k) % len(textos)] for k in range(args.pedidos)]
+        antes = cliente.metricas()
+        latencias, segundos = rodada(cliente, amostra, n_clientes)
+        depois = cliente.metricas()
+        lotes = depois["micro_lotes"] - antes["micro_lotes"]
+        print(f"{n_clientes:>9}{percentil(latencias, 50):>10.1f}{percentil(latencias, 90):>10.1f}"
+              f"{percentil(latencias, 99):>10.1f}{len(amostra) / segundos:>11.1f}{len(amostra) / max(lotes, 1):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Tempo de construção e latência de busca do índice de passagens semelhantes
+(indice_similares.py) com 50 mil e 1 milhão de vetores.
+
+Os vetores são sintéticos, no formato do índice real (float16, norma 1, dim 768 como o
+BERTimbau base): grupos de vetores em volta de centros aleatórios, para parecerem
+embeddings de parágrafos (muitos temas, cada um com várias redações). As consultas são
+vetores do próprio conjunto com ruído. Para cada tamanho:
+    construção   k-means na amostra + atribuição + gravação da matriz ordenada
+    exata        busca comparando com todos os vetores (a referência)
+    ivf/N        busca no índice lendo N listas, com o recall@10 em relação à exata
+
+Só mede o índice: o embedding da consulta (uma passada do modelo) vem antes e é o mesmo
+para os dois jeitos de buscar (o 6_indexar_similares.py mostra os dois tempos).
+A matriz de 1 milhão de vetores ocupa ~1,5 GB no disco (duas vezes, durante a construção).
+
+Uso (na raiz do projeto):
+    python benchmarks/similares.py [--tamanhos 50000 1000000] [--dim 768] [--consultas 200]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import numpy as np
+
+# Permite importar os módulos da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import indice_similares
+from config_modelo import LABELS
+
+SONDAS = (4, 16, 64)
+K = 10
+
+
+def gerar_vetores(caminho: str, n: int, dim: int, semente: int = 0):
+    """Vetores em volta de raiz(n) centros, gravados em blocos num .npy float16 mapeado."""
+    rng = np.random.default_rng(semente)
+    centros = indice_similares.normalizar(rng.standard_normal((max(1, int(n ** 0.5)), dim)))
+    matriz = np.lib.format.open_memmap(caminho, mode="w+", dtype=np.float16, shape=(n, dim))
+    for inicio in range(0, n, indice_similares.BLOCO):
+        fim = min(inicio + indice_similares.BLOCO, n)
+        grupos = rng.integers(len(centros), size=fim - inicio)
+        ruido = rng.standard_normal((fim - inicio, dim)).astype(np.float32) * (2.0 / dim ** 0.5)
+        matriz[inicio:fim] = indice_similares.normalizar(centros[grupos] + ruido)
+    matriz.flush()
+    return np.load(caminho, mmap_mode="r")
+
+
+def latencias_ms(funcao, consultas):
+    tempos, resultados = [], []
+    for consulta in consultas:
+        t0 = time.perf_counter()
+        resultados.append(funcao(consulta))
+        tempos.append((time.perf_counter() - t0) * 1000)
+    return tempos, resultados
+
+
+def medir(n: int, dim: int, n_consultas: int, pasta: str):
+    print(f"\n--- {n} vetores (dim {dim}) ---")
+    vetores = gerar_vetores(os.path.join(pasta, "vetores.npy"), n, dim)
+    rng = np.random.default_rng(1)
+    labels = [LABELS[i] for i in rng.integers(len(LABELS), size=n)]
+    textos = [f"parágrafo {i}" for i in range(n)]
+
+    pasta_indice = os.path.join(pasta, "indice")
+    t0 = time.perf_counter()
+    metadados = indice_similares.construir_indice(pasta_indice, vetores, textos, labels)
+    construcao = time.perf_counter() - t0
+    os.remove(os.path.join(pasta, "vetores.npy"))
+    print(f"Construção: {construcao:.1f} s ({metadados['n_listas']} listas; k-means {metadados['segundos_kmeans']:.1f} s)")
+
+    indice = indice_similares.IndiceSimilares(pasta_indice)
+    escolhidos = rng.choice(n, n_consultas, replace=False)
+    ruido = rng.standard_normal((n_consultas, dim)).astype(np.float32) * (1.0 / dim ** 0.5)
+    consultas = indice_similares.normalizar(indice.embeddings[escolhidos].astype(np.float32) + ruido)
+
+    # A busca exata lê a matriz inteira: com 1 milhão de vetores, menos consultas bastam
+    n_exatas = min(n_consultas, max(20, 5_000_000 // n))
+    tempos, exatos = latencias_ms(lambda q: indice.buscar_exato(q, K), consultas[:n_exatas])
+    linhas = [("exata", statistics.median(tempos), max(tempos), 1.0)]
+    for sondas in SONDAS:
+        indice.buscar(consultas[0], K, sondas=sondas) # Aquece o cache de páginas das listas
+        tempos, resultados = latencias_ms(lambda q: indice.buscar(q, K, sondas=sondas), consultas)
+        recall = statistics.mean(
+            len({r["posicao"] for r in aprox} & {r["posicao"] for r in exato}) / K
+            for aprox, exato in zip(resultados, exatos)
+        )
+        tempos.sort()
+        linhas.append((f"ivf/{sondas}", statistics.median(tempos), tempos[int(len(tempos) * 0.99) - 1], recall))
+
+    print(f"{'busca':<10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'recall@10':>11}")
+    for nome, p50, p99, recall in linhas:
+        print(f"{nome:<10}{p50:>10.2f}{p99:>10.2f}{recall:>11.3f}")
+    shutil.rmtree(pasta_indice)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construção e busca do índice de passagens semelhantes.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[50_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--pasta", default=None, help="Onde gravar os arquivos temporários (padrão: /tmp)")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_similares_", dir=args.pasta)
+    try:
+        for n in args.tamanhos:
+            medir(n, args.dim, args.consultas, pasta)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compara uma epoch de treino com padding fixo (padding="max_length", como era antes)
+contra padding dinâmico (DataCollatorWithPadding) + lotes agrupados por tamanho
+(group_by_length), como o 4_treinar_modelo.py faz agora.
+
+Também conta quantos tokens (com o preenchimento) o modelo processa em cada caso.
+
+Uso (na raiz do projeto):
+    python benchmarks/treino_padding.py [--modelo PASTA_OU_NOME] [--limite N]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import pandas as pd
+from datasets import Dataset
+from transformers import (
+    AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer,
+    DataCollatorWithPadding, default_data_collator,
+)
+
+ARQUIVO_DATASET = os.path.join("dataset", "dataset_final_balanceado.csv")
+ARQUIVO_RELATORIO = os.path.join("relatorios", "treino_padding.json")
+MODELO_BERT = "neuralmind/bert-base-portuguese-cased"
+LABELS = ["COMPOSICAO", "INDICACAO", "CONTRAINDICACAO", "POSOLOGIA", "EFEITOS_ADVERSOS", "OUTROS"]
+RANDOM_STATE = 42
+
+
+def preparar_dataset(tokenizer, limite, max_length, dinamico):
+    df = pd.read_csv(ARQUIVO_DATASET)
+    df["label"] = df["label"].map({label: i for i, label in enumerate(LABELS)})
+    df = df.dropna(subset=["label"])
+    df["label"] = df["label"].astype(int)
+    if limite:
+        df = df.sample(n=min(limite, len(df)), random_state=RANDOM_STATE)
+
+    padding = False if dinamico else "max_length"
+    dataset = Dataset.from_pandas(df, preserve_index=False)
+    return dataset.map(
+        lambda ex: tokenizer(ex["texto"], padding=padding, truncation=True, max_length=max_length),
+        batched=True,
+        remove_columns=["texto"],
+    )
+
+
+def uma_epoch(modelo, tokenizer, dataset, tamanho_lote, dinamico):
+    """Treina uma epoch e retorna (segundos, tokens processados incluindo padding)."""
+    model = AutoModelForSequenceClassification.from_pretrained(modelo, num_labels=len(LABELS))
+    with tempfile.TemporaryDirectory() as pasta:
+        args = TrainingArguments(
+            output_dir=pasta,
+            num_train_epochs=1,
+            per_device_train_batch_size=tamanho_lote,
+            save_strategy="no",
+            eval_strategy="no",
+            logging_strategy="no",
+            report_to=[],
+            seed=RANDOM_STATE,
+            group_by_length=dinamico,
+        )
+        trainer = Trainer(
+            model=model,
+            args=args,
+            train_dataset=dataset,
+            data_collator=DataCollatorWithPadding(tokenizer) if dinamico else default_data_collator,
+        )
+        # Quantos tokens (com padding) o modelo vai processar nesta epoch
+        tokens = sum(lote["input_ids"].numel() for lote in trainer.get_train_dataloader())
+
+        inicio = time.perf_counter()
+        trainer.train()
+        return time.perf_counter() - inicio, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Padding fixo x padding dinâmico: tempo de uma epoch.")
+    parser.add_argument("--modelo", default=MODELO_BERT, help=f"Modelo base (padrão: {MODELO_BERT})")
+    parser.add_argument("--limite", type=int, default=None, help="Usa só N exemplos (amostra aleatória)")
+    parser.add_argument("--tamanho-lote", type=int, default=16)
+    parser.add_argument("--max-length", type=int, default=128)
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.modelo)
+    resultados = {}
+    for nome, dinamico in (("padding_max_length", False), ("padding_dinamico", True)):
+        dataset = preparar_dataset(tokenizer, args.limite, args.max_length, dinamico)
+        print(f"\n--- {nome}: {len(dataset)} exemplos ---")
+        segundos, tokens = uma_epoch(args.modelo, tokenizer, dataset, args.tamanho_lote, dinamico)
+        resultados[nome] = {"segundos_epoch": segundos, "tokens_processados": tokens}
+        print(f"{nome}: {segundos:.1f} s, {tokens} tokens processados")
+
+    fixo, dinamico = resultados["padding_max_length"], resultados["padding_dinamico"]
+    print(f"\nPadding dinâmico: {fixo['segundos_epoch'] / dinamico['segundos_epoch']:.2f}x mais rápido, "
+          f"{1 - dinamico['tokens_processados'] / fixo['tokens_processados']:.1%} menos tokens processados")
+
+    resultados["parametros"] = vars(args)
+    os.makedirs(os.path.dirname(ARQUIVO_RELATORIO), exist_ok=True)
+    with open(ARQUIVO_RELATORIO, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2, ensure_ascii=False)
+    print(f"Relatório salvo em: {ARQUIVO_RELATORIO}")
+
+
+if __name__ == "__main__":
+    main()
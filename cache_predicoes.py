@@ -0,0 +1,108 @@
+import json
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# --- 1. CONFIGURAÇÃO ---
+CAPACIDADE_PADRAO = 50_000  # Quantas previsões ficam na memória (LRU)
+
+
+# --- 2. CACHE DE PREVISÕES ---
+class CachePredicoes:
+    """
+    Cache LRU de previsões, com persistência opcional em SQLite.
+
+    Bulas de fabricantes diferentes repetem muito texto (armazenamento, "Todo
+    medicamento deve ser mantido fora do alcance das crianças", avisos legais...).
+    Com o cache, um parágrafo já visto não passa de novo pelo BERT.
+
+    A chave é o hash do texto normalizado + o ID do modelo (ver ClassificadorBulas.id_modelo),
+    então trocar de checkpoint nunca devolve previsões do modelo antigo.
+    A memória guarda no máximo 'capacidade' itens (os menos usados saem primeiro);
+    o SQLite, se usado, guarda tudo e serve como segunda camada entre execuções.
+    """
+
+    def __init__(self, capacidade: int = CAPACIDADE_PADRAO, caminho_sqlite: str | None = None):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.faltas = 0
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock() # O Streamlit atende cada sessão numa thread
+        self._db = None
+        if caminho_sqlite:
+            self._db = sqlite3.connect(caminho_sqlite, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS predicoes (chave TEXT PRIMARY KEY, resultado TEXT NOT NULL)")
+            self._db.commit()
+
+    @staticmethod
+    def normalizar(texto: str) -> str:
+        """Mesma forma Unicode (NFC) e espaços/quebras de linha colapsados."""
+        return " ".join(unicodedata.normalize("NFC", texto).split())
+
+    def chave(self, texto: str, id_modelo: str) -> str:
+        dados = f"{id_modelo}\0{self.normalizar(texto)}".encode("utf-8")
+        return hashlib.sha256(dados).hexdigest()
+
+    def obter_varios(self, chaves):
+        """Retorna {chave: resultado} só para as chaves encontradas (memória, depois SQLite)."""
+        encontrados = {}
+        with self._lock:
+            faltando = []
+            for chave in chaves:
+                if chave in self._memoria:
+                    self._memoria.move_to_end(chave)
+                    encontrados[chave] = self._memoria[chave]
+                else:
+                    faltando.append(chave)
+
+            if self._db is not None and faltando:
+                # Em blocos, para não passar do limite de parâmetros do SQLite
+                for inicio in range(0, len(faltando), 500):
+                    bloco = faltando[inicio:inicio + 500]
+                    marcadores = ",".join("?" * len(bloco))
+                    linhas = self._db.execute(
+                        f"SELECT chave, resultado FROM predicoes WHERE chave IN ({marcadores})", bloco
+                    ).fetchall()
+                    for chave, resultado in linhas:
+                        encontrados[chave] = json.loads(resultado)
+                        self._guardar_memoria(chave, encontrados[chave])
+
+            self.acertos += sum(1 for chave in chaves if chave in encontrados)
+            self.faltas += sum(1 for chave in chaves if chave not in encontrados)
+        return encontrados
+
+    def guardar_varios(self, itens):
+        """Guarda pares (chave, resultado) na memória e, se houver, no SQLite (uma transação)."""
+        itens = list(itens)
+        with self._lock:
+            for chave, resultado in itens:
+                self._guardar_memoria(chave, resultado)
+            if self._db is not None and itens:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predicoes (chave, resultado) VALUES (?, ?)",
+                    [(chave, json.dumps(resultado)) for chave, resultado in itens],
+                )
+                self._db.commit()
+
+    def _guardar_memoria(self, chave, resultado):
+        self._memoria[chave] = resultado
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.capacidade:
+            self._memoria.popitem(last=False) # Remove o menos usado
+
+    def estatisticas(self) -> dict:
+        """Contadores de acertos/faltas desde a criação do cache."""
+        total = self.acertos + self.faltas
+        return {
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": self.acertos / total if total else 0.0,
+            "itens_memoria": len(self._memoria),
+        }
+
+    def fechar(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,432 @@
+import os
+import sys
+import glob
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+import warnings
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+from transformers.modeling_utils import no_init_weights
+import instrumentacao
+from instrumentacao import BALDES_CONTAGEM
+
+# --- 1. CONFIGURAÇÃO ---
+# As constantes ficam no config_modelo.py (sem torch), e são reexportadas daqui
+from config_modelo import (
+    MODELO_SALVO, MODELO_INT8, MODELO_ONNX, MODELO_ALUNO, ARQUIVO_PESOS_INT8, ARQUIVO_ONNX,
+    BACKENDS, LABELS, id2label, MAX_LENGTH, TAMANHO_LOTE, STRIDE_JANELA,
+)
+
+
+def quantizar_int8(model):
+    """Quantização dinâmica INT8 das camadas Linear (pesos em INT8, ativações quantizadas na hora)."""
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# --- 1b. PESOS MAPEADOS NA MEMÓRIA (compartilhados entre processos) ---
+# Tipos do cabeçalho do safetensors -> dtype do PyTorch
+DTYPES_SAFETENSORS = {
+    "F64": torch.float64, "F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+    "I64": torch.int64, "I32": torch.int32, "I16": torch.int16, "I8": torch.int8,
+    "U8": torch.uint8, "BOOL": torch.bool,
+}
+
+
+def mapear_safetensors(caminho: str) -> dict:
+    """
+    Mapeia um arquivo .safetensors na memória, SOMENTE LEITURA, e devolve {nome: tensor}
+    apontando direto para as páginas do arquivo (nada é copiado).
+
+    As páginas vêm do cache de páginas do sistema operacional: N processos que mapeiam
+    o mesmo arquivo usam a mesma cópia física dos pesos. Como o mapeamento é só de
+    leitura, nenhum processo consegue alterar (e assim "descompartilhar") os pesos.
+    """
+    with open(caminho, "rb") as f:
+        tamanho_cabecalho = struct.unpack("<Q", f.read(8))[0]
+        cabecalho = json.loads(f.read(tamanho_cabecalho))
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore") # "buffer não é gravável": é de propósito
+        dados = torch.frombuffer(mapa, dtype=torch.uint8) # Guarda uma referência ao mapa
+
+    inicio_dados = 8 + tamanho_cabecalho
+    tensores = {}
+    for nome, info in cabecalho.items():
+        if nome == "__metadata__":
+            continue
+        dtype = DTYPES_SAFETENSORS[info["dtype"]]
+        inicio, fim = info["data_offsets"]
+        bruto = dados[inicio_dados + inicio:inicio_dados + fim]
+        if (inicio_dados + inicio) % dtype.itemsize:
+            bruto = bruto.clone() # Desalinhado para o dtype (raro): este tensor é copiado
+        tensores[nome] = bruto.view(dtype).view(info["shape"])
+    return tensores
+
+
+def modelo_mmap(caminho_modelo: str, config):
+    """
+    Monta o modelo com os pesos mapeados dos .safetensors da pasta (ver mapear_safetensors).
+    A estrutura é criada sem inicializar os pesos (nenhuma página é tocada) e os
+    parâmetros passam a ser os próprios tensores mapeados (assign=True).
+    """
+    arquivos = sorted(glob.glob(os.path.join(caminho_modelo, "*.safetensors")))
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum .safetensors em '{caminho_modelo}' (necessário para pesos_mmap)")
+    estado = {}
+    for arquivo in arquivos: # Checkpoints divididos em vários arquivos também funcionam
+        estado.update(mapear_safetensors(arquivo))
+
+    with no_init_weights():
+        model = AutoModelForSequenceClassification.from_config(config)
+    faltando, _ = model.load_state_dict(estado, strict=False, assign=True)
+    if faltando:
+        raise ValueError(f"Pesos ausentes no checkpoint: {faltando[:5]}")
+    model.tie_weights()
+    return model
+
+
+def memoria_processo() -> dict | None:
+    """
+    Memória deste processo (MB), separando o que é compartilhado com outros processos
+    (ex: pesos mapeados do mesmo arquivo) do que é só dele. 'pss' divide cada página
+    compartilhada pelo nº de processos que a usam: a soma do PSS de todos os workers é
+    a memória que eles realmente ocupam no host. Só no Linux (None nos outros sistemas).
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            campos = {partes[0].rstrip(":"): int(partes[1]) / 1024
+                      for partes in (linha.split() for linha in f) if len(partes) == 3}
+    except OSError:
+        return None
+    return {
+        "rss_mb": campos["Rss"],
+        "pss_mb": campos["Pss"],
+        "compartilhada_mb": campos["Shared_Clean"] + campos["Shared_Dirty"],
+        "privada_mb": campos["Private_Clean"] + campos["Private_Dirty"],
+    }
+
+
+# --- 2. O CLASSIFICADOR ---
+class ClassificadorBulas:
+    """
+    Carrega o BERTimbau treinado uma vez e classifica LISTAS de parágrafos.
+
+    Usado tanto pelo app.py (um parágrafo ou uma bula inteira) quanto por jobs em lote.
+    Os textos são ordenados pelo tamanho e agrupados em lotes de tamanhos parecidos;
+    cada lote só é completado (padding) até o maior texto DELE, e não até 128 tokens,
+    o que evita gastar processamento com tokens de preenchimento.
+
+    Com janelas=True, textos maiores que max_length não são cortados: viram janelas
+    sobrepostas (stride tokens em comum) e os logits das janelas de cada texto são
+    somados e divididos pelo nº de janelas. Se janelas=None, segue o que foi salvo no
+    config do modelo pelo treino (janelas_deslizantes).
+
+    Com pesos_mmap=True (só no backend pytorch), os pesos são mapeados do
+    .safetensors em modo somente leitura em vez de carregados: vários processos
+    (réplicas do app, workers) no mesmo host dividem uma única cópia física deles.
+    """
+
+    def __init__(self, caminho_modelo: str = MODELO_SALVO, dispositivo: str = "cpu",
+                 max_length: int = MAX_LENGTH, tamanho_lote: int = TAMANHO_LOTE,
+                 backend: str = "pytorch", cache=None, janelas: bool | None = None,
+                 stride: int | None = None, pesos_mmap: bool = False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend inválido: {backend} (use {list(BACKENDS)})")
+        if pesos_mmap and backend != "pytorch":
+            raise ValueError("pesos_mmap só vale para o backend pytorch (os pesos INT8 são reempacotados ao carregar)")
+        self.caminho_modelo = caminho_modelo
+        self.dispositivo = dispositivo
+        self.max_length = max_length
+        self.tamanho_lote = tamanho_lote
+        self.backend = backend
+        self.cache = cache # CachePredicoes opcional (ver cache_predicoes.py)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(caminho_modelo)
+        self.config = AutoConfig.from_pretrained(caminho_modelo)
+        self.model = None
+        self.sessao_onnx = None
+
+        if backend == "pytorch":
+            if pesos_mmap:
+                self.model = modelo_mmap(caminho_modelo, self.config)
+            else:
+                self.model = AutoModelForSequenceClassification.from_pretrained(
+                    caminho_modelo,
+                    use_safetensors=True
+                )
+            self.model.to(dispositivo) # No CPU não copia nada (os pesos mapeados continuam mapeados)
+        elif backend == "int8":
+            # A quantização dinâmica só existe no CPU. Recria a estrutura quantizada
+            # a partir do config e carrega os pesos INT8 salvos pelo 5_exportar_modelo.py
+            self.dispositivo = "cpu"
+            self.model = quantizar_int8(AutoModelForSequenceClassification.from_config(self.config))
+            # weights_only=False: os pesos INT8 "empacotados" não são tensores simples.
+            # Só carregue arquivos gerados por você mesmo.
+            estado = torch.load(os.path.join(caminho_modelo, ARQUIVO_PESOS_INT8), weights_only=False)
+            self.model.load_state_dict(estado)
+        else:
+            try:
+                import onnxruntime as ort
+            except ImportError as e:
+                raise ImportError("O backend 'onnx' precisa do onnxruntime: pip install onnxruntime") from e
+            self.dispositivo = "cpu"
+            self.sessao_onnx = ort.InferenceSession(
+                os.path.join(caminho_modelo, ARQUIVO_ONNX),
+                providers=["CPUExecutionProvider"],
+            )
+            self.entradas_onnx = {entrada.name for entrada in self.sessao_onnx.get_inputs()}
+
+        if self.model is not None:
+            self.model.eval() # Desliga o dropout: modo de inferência
+
+        # As etiquetas salvas junto com o modelo no treino valem mais que a constante
+        config_labels = self.config.id2label or {}
+        self.labels = [config_labels.get(i, id2label.get(i, str(i))) for i in range(self.config.num_labels)]
+
+        self.janelas = getattr(self.config, "janelas_deslizantes", False) if janelas is None else janelas
+        self.stride = stride if stride is not None else getattr(self.config, "stride_janela", STRIDE_JANELA)
+        self.id_modelo = self._calcular_id_modelo()
+
+    def _calcular_id_modelo(self) -> str:
+        """
+        Identifica o checkpoint carregado (usado na chave do cache de previsões).
+        Usa nome, tamanho e data de modificação dos arquivos da pasta em vez de ler os
+        pesos inteiros (centenas de MB): re-treinar ou re-exportar muda o ID.
+        """
+        partes = [self.backend, str(self.max_length)]
+        if self.janelas:
+            partes.append(f"janelas:{self.stride}")
+        for nome in sorted(os.listdir(self.caminho_modelo)):
+            info = os.stat(os.path.join(self.caminho_modelo, nome))
+            partes.append(f"{nome}:{info.st_size}:{info.st_mtime_ns}")
+        return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()[:16]
+
+    def logits(self, lote):
+        """Roda o modelo (PyTorch ou ONNX Runtime) num lote já tokenizado e devolve os logits."""
+        if self.sessao_onnx is not None:
+            entradas = {k: v.numpy() for k, v in lote.items() if k in self.entradas_onnx}
+            return torch.from_numpy(self.sessao_onnx.run(["logits"], entradas)[0])
+        return self.model(**lote).logits
+
+    def _lotes(self, textos, tempos=None):
+        """Devolve (índices, lote_pronto_para_o_modelo), dos textos mais curtos aos mais longos."""
+        # O tamanho em caracteres é uma boa aproximação do número de tokens e evita
+        # tokenizar tudo duas vezes só para ordenar
+        ordem = sorted(range(len(textos)), key=lambda i: len(textos[i]))
+        for inicio in range(0, len(ordem), self.tamanho_lote):
+            indices = ordem[inicio:inicio + self.tamanho_lote]
+            t0 = time.perf_counter()
+            with instrumentacao.medir("tokenizacao", backend=self.backend):
+                lote = self.tokenizer(
+                    [textos[i] for i in indices],
+                    return_tensors="pt",
+                    truncation=True,
+                    max_length=self.max_length,
+                    padding=True, # Completa só até o maior texto do lote
+                )
+                lote = {k: v.to(self.dispositivo) for k, v in lote.items()}
+            if tempos is not None:
+                tempos["tokenizacao"] = tempos.get("tokenizacao", 0.0) + time.perf_counter() - t0
+            yield indices, lote
+
+    def classificar(self, textos, tempos=None):
+        """
+        Classifica uma lista de textos. Retorna, na mesma ordem da entrada, uma lista de
+        dicionários {"label", "confianca", "probabilidades": {label: prob}}.
+        Se 'tempos' (um dict) for passado, soma nele os segundos gastos em
+        "tokenizacao" e "inferencia".
+        """
+        textos = list(textos)
+        resultados = [None] * len(textos)
+        if not textos:
+            return resultados
+
+        # Com cache: só os textos nunca vistos (por este checkpoint) vão para o modelo
+        pendentes = list(range(len(textos)))
+        if self.cache is not None:
+            chaves = [self.cache.chave(texto, self.id_modelo) for texto in textos]
+            encontrados = self.cache.obter_varios(chaves)
+            pendentes = [i for i in pendentes if chaves[i] not in encontrados]
+            for i, chave in enumerate(chaves):
+                if chave in encontrados:
+                    resultados[i] = encontrados[chave]
+
+        self._classificar_modelo([textos[i] for i in pendentes], pendentes, resultados, tempos)
+        instrumentacao.contar("paragrafos_classificados_total", len(textos), backend=self.backend)
+        instrumentacao.contar("paragrafos_inferidos_total", len(pendentes), backend=self.backend)
+
+        if self.cache is not None and pendentes:
+            self.cache.guardar_varios((chaves[i], resultados[i]) for i in pendentes)
+        return resultados
+
+    def _resultado(self, linha):
+        previsao_id = max(range(len(linha)), key=linha.__getitem__)
+        return {
+            "label": self.labels[previsao_id],
+            "confianca": linha[previsao_id],
+            "probabilidades": dict(zip(self.labels, linha)),
+        }
+
+    def _classificar_modelo(self, textos, posicoes, resultados, tempos=None):
+        """Passa 'textos' pelo modelo e grava cada resultado em resultados[posicoes[i]]."""
+        if not textos:
+            return
+        probs = torch.softmax(self.logits_textos(textos, tempos), dim=-1)
+        for i, linha in enumerate(probs.tolist()):
+            resultados[posicoes[i]] = self._resultado(linha)
+
+    def logits_textos(self, textos, tempos=None):
+        """
+        Logits (n_textos x n_labels, float32 no CPU) na ordem da entrada, sem passar pelo
+        cache. No modo janelas, é a média dos logits das janelas de cada texto.
+        Usado pelo classificar() e pela destilação (4b_destilar_modelo.py).
+        """
+        textos = list(textos)
+        with torch.inference_mode():
+            if self.janelas:
+                return self._logits_janelas(textos, tempos)
+
+            saida = torch.empty(len(textos), len(self.labels))
+            for indices, lote in self._lotes(textos, tempos):
+                t0 = time.perf_counter()
+                with instrumentacao.medir("inferencia", backend=self.backend):
+                    saida[indices] = self.logits(lote).float().cpu()
+                instrumentacao.observar("lote_paragrafos", len(indices), baldes=BALDES_CONTAGEM)
+                if tempos is not None:
+                    tempos["inferencia"] = tempos.get("inferencia", 0.0) + time.perf_counter() - t0
+            return saida
+
+    def embeddings_textos(self, textos, tempos=None):
+        """
+        Embedding de cada texto (n_textos x hidden_size, float32, norma 1) na ordem da
+        entrada: a média da última camada do encoder sobre os tokens, sem o padding.
+        Com norma 1, o produto escalar entre dois embeddings é a similaridade de cosseno.
+        Usado pelo índice de passagens semelhantes (indice_similares.py). Textos longos
+        são cortados em max_length, mesmo no modo janelas. Só nos backends pytorch e
+        int8: o grafo ONNX exportado só tem a saída "logits".
+        """
+        if self.model is None:
+            raise ValueError("embeddings_textos precisa do backend pytorch ou int8 (o grafo ONNX só devolve os logits)")
+        textos = list(textos)
+        encoder = self.model.base_model # O BERT sem a cabeça de classificação
+        saida = torch.empty(len(textos), self.config.hidden_size)
+        with torch.inference_mode():
+            for indices, lote in self._lotes(textos, tempos):
+                t0 = time.perf_counter()
+                with instrumentacao.medir("embeddings", backend=self.backend):
+                    estados = encoder(**lote).last_hidden_state.float()
+                    mascara = lote["attention_mask"].unsqueeze(-1).to(estados.dtype)
+                    saida[indices] = ((estados * mascara).sum(1) / mascara.sum(1).clamp(min=1)).cpu()
+                if tempos is not None:
+                    tempos["inferencia"] = tempos.get("inferencia", 0.0) + time.perf_counter() - t0
+        return torch.nn.functional.normalize(saida, dim=-1)
+
+    def _logits_janelas(self, textos, tempos=None):
+        """
+        Logits (n_textos x n_labels) com média sobre as janelas de cada texto.
+        Todas as janelas de todos os textos entram na mesma fila: são ordenadas pelo
+        tamanho e rodadas em lotes de tamanho_lote, sem um laço por texto.
+        """
+        t0 = time.perf_counter()
+        with instrumentacao.medir("tokenizacao", backend=self.backend):
+            codificado = self.tokenizer(
+                textos,
+                truncation=True,
+                max_length=self.max_length,
+                stride=self.stride,
+                return_overflowing_tokens=True, # Uma linha por janela
+            )
+        dono = codificado["overflow_to_sample_mapping"] # Janela -> índice do texto
+        chaves = [k for k in ("input_ids", "token_type_ids", "attention_mask") if k in codificado]
+        if tempos is not None:
+            tempos["tokenizacao"] = tempos.get("tokenizacao", 0.0) + time.perf_counter() - t0
+
+        soma = torch.zeros(len(textos), len(self.labels))
+        n_janelas = torch.zeros(len(textos))
+        ordem = sorted(range(len(dono)), key=lambda i: len(codificado["input_ids"][i]))
+        for inicio in range(0, len(ordem), self.tamanho_lote):
+            indices = ordem[inicio:inicio + self.tamanho_lote]
+            t0 = time.perf_counter()
+            lote = self._empilhar([{k: codificado[k][i] for k in chaves} for i in indices])
+            with instrumentacao.medir("inferencia", backend=self.backend):
+                logits = self.logits({k: v.to(self.dispositivo) for k, v in lote.items()}).float().cpu()
+            instrumentacao.observar("lote_paragrafos", len(indices), baldes=BALDES_CONTAGEM)
+            donos = torch.tensor([dono[i] for i in indices])
+            soma.index_add_(0, donos, logits)
+            n_janelas.index_add_(0, donos, torch.ones(len(indices)))
+            if tempos is not None:
+                tempos["inferencia"] = tempos.get("inferencia", 0.0) + time.perf_counter() - t0
+        return soma / n_janelas.unsqueeze(1)
+
+    def _empilhar(self, janelas):
+        """Completa as janelas (já tokenizadas) até a maior delas e monta os tensores."""
+        tamanho = max(len(janela["input_ids"]) for janela in janelas)
+        lote = {}
+        for chave in janelas[0]:
+            preenchimento = self.tokenizer.pad_token_id if chave == "input_ids" else 0
+            lote[chave] = torch.tensor(
+                [janela[chave] + [preenchimento] * (tamanho - len(janela[chave])) for janela in janelas]
+            )
+        return lote
+
+
+def carregar_classificador(caminho_modelo: str = MODELO_SALVO, **kwargs):
+    """Carrega o classificador; retorna None se a pasta do modelo não existir ou falhar."""
+    if not os.path.exists(caminho_modelo):
+        return None
+
+    print("--- Carregando modelo e tokenizador do disco ---")
+    try:
+        classificador = ClassificadorBulas(caminho_modelo, **kwargs)
+        print("--- Modelo carregado com sucesso ---")
+        return classificador
+    except Exception as e:
+        print(f"Erro ao carregar o modelo: {e}")
+        return None
+
+
+# --- 3. USO EM LOTE PELA LINHA DE COMANDO ---
+# Ex: python classificador.py paragrafos.txt   (um parágrafo por linha; sem arquivo, lê do stdin)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classifica parágrafos de bula (um por linha).")
+    parser.add_argument("arquivo", nargs="?", help="Arquivo texto com um parágrafo por linha (padrão: stdin)")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="pytorch", help="Backend de inferência (padrão: pytorch)")
+    parser.add_argument("--modelo", default=None, help="Pasta do modelo (padrão: a do backend escolhido)")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="Parágrafos por lote")
+    parser.add_argument("--janelas", action="store_true",
+                        help="Classifica textos longos em janelas sobrepostas em vez de cortar em max_length")
+    parser.add_argument("--cache-sqlite", default=None,
+                        help="Arquivo SQLite do cache de previsões (reaproveitado entre execuções)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Mapeia os pesos do .safetensors (somente leitura), compartilhados entre processos")
+    args = parser.parse_args()
+
+    entrada = open(args.arquivo, encoding="utf-8") if args.arquivo else sys.stdin
+    with entrada:
+        paragrafos = [linha.strip() for linha in entrada if linha.strip()]
+
+    cache = None
+    if args.cache_sqlite:
+        from cache_predicoes import CachePredicoes
+        cache = CachePredicoes(caminho_sqlite=args.cache_sqlite)
+
+    caminho_modelo = args.modelo or BACKENDS[args.backend]
+    classificador = carregar_classificador(caminho_modelo, tamanho_lote=args.tamanho_lote,
+                                           backend=args.backend, cache=cache,
+                                           janelas=True if args.janelas else None,
+                                           pesos_mmap=args.mmap)
+    if classificador is None:
+        sys.exit(f"Erro: não foi possível carregar o modelo em '{caminho_modelo}'.")
+
+    for texto, resultado in zip(paragrafos, classificador.classificar(paragrafos)):
+        print(f"{resultado['label']}\t{resultado['confianca']:.3f}\t{texto}")
+
+    if cache is not None:
+        stats = cache.estatisticas()
+        print(f"Cache: {stats['acertos']} acertos, {stats['faltas']} faltas "
+              f"({stats['taxa_acerto']:.1%} de acerto)", file=sys.stderr)
+        cache.fechar()
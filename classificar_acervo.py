@@ -0,0 +1,312 @@
+"""
+Reclassifica um acervo inteiro de bulas (PDFs de uma pasta) com o modelo treinado.
+
+Os PDFs são lidos e divididos em parágrafos num pool de processos (a mesma extração e
+segmentação do 2_etiquetar_automatico.py, com o mesmo cache por PDF), enquanto o
+processo principal classifica em lote os parágrafos dos PDFs que já ficaram prontos:
+a leitura dos próximos PDFs acontece ao mesmo tempo que a inferência dos anteriores.
+
+A saída tem um registro por documento, em JSONL (uma linha por PDF) ou Parquet (uma
+pasta com um arquivo por checkpoint). Um checkpoint ao lado da saída guarda os PDFs
+já gravados: se o job cair, rodar o mesmo comando de novo continua de onde parou.
+
+Uso (na raiz do projeto):
+    python classificar_acervo.py data --saida acervo.jsonl [-j 4] [--backend onnx]
+    python classificar_acervo.py data --saida acervo.parquet --reiniciar
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import importlib
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import instrumentacao
+from config_modelo import BACKENDS, TAMANHO_LOTE
+
+etiquetador = importlib.import_module("2_etiquetar_automatico")
+
+# --- 1. CONFIGURAÇÃO ---
+PARAGRAFOS_POR_INFERENCIA = 512  # Junta parágrafos de vários PDFs antes de chamar o modelo
+DOCUMENTOS_POR_CHECKPOINT = 50   # A cada quantos PDFs a saída é gravada e o checkpoint atualizado
+FORMATOS = ("jsonl", "parquet")
+
+
+# --- 2. SAÍDAS RETOMÁVEIS ---
+class SaidaJSONL:
+    """
+    Um documento por linha. O checkpoint guarda quantos bytes já estavam confirmados
+    (flush + fsync): ao retomar, o que passou disso (uma linha pela metade, registros
+    gravados depois do último checkpoint) é cortado antes de continuar.
+    """
+
+    @staticmethod
+    def faltando(caminho: str, estado: dict) -> str | None:
+        """O que sumiu da saída desde o checkpoint (None = nada)."""
+        posicao = estado.get("bytes", 0)
+        tamanho = os.path.getsize(caminho) if os.path.exists(caminho) else 0
+        if tamanho < posicao:
+            return f"'{caminho}' tem {tamanho} bytes, mas o checkpoint confirmou {posicao}"
+        return None
+
+    def __init__(self, caminho: str, estado: dict | None = None):
+        self.caminho = caminho
+        posicao = (estado or {}).get("bytes", 0)
+        if posicao and os.path.exists(caminho):
+            self._arquivo = open(caminho, "r+b")
+            self._arquivo.truncate(posicao)
+            self._arquivo.seek(posicao)
+        else:
+            self._arquivo = open(caminho, "wb")
+
+    def escrever(self, registros):
+        for registro in registros:
+            self._arquivo.write(json.dumps(registro, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def confirmar(self) -> dict:
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        return {"bytes": self._arquivo.tell()}
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+class SaidaParquet:
+    """
+    Uma pasta de arquivos Parquet (pd.read_parquet lê a pasta inteira), um por checkpoint.
+    Cada parte é gravada num temporário e renomeada; ao retomar, partes que não estão
+    no checkpoint (gravadas depois dele) são apagadas. Só as partes e os temporários
+    deste escritor são apagados: outros arquivos da pasta ficam como estão.
+    """
+
+    PARTE_REGEX = re.compile(r"\.?parte-\d{5}\.parquet(\.tmp)?")
+
+    @staticmethod
+    def faltando(caminho: str, estado: dict) -> str | None:
+        """O que sumiu da saída desde o checkpoint (None = nada)."""
+        ausentes = [nome for nome in estado.get("partes", []) if not os.path.isfile(os.path.join(caminho, nome))]
+        if ausentes:
+            return f"faltam {len(ausentes)} partes em '{caminho}' (ex: {ausentes[0]})"
+        return None
+
+    def __init__(self, caminho: str, estado: dict | None = None):
+        try:
+            import pyarrow # noqa: F401
+        except ImportError as e:
+            raise ImportError("A saída em Parquet precisa do pyarrow: pip install pyarrow") from e
+        self.caminho = caminho
+        self.partes = list((estado or {}).get("partes", []))
+        os.makedirs(caminho, exist_ok=True)
+        for nome in os.listdir(caminho):
+            if nome not in self.partes and self.PARTE_REGEX.fullmatch(nome) \
+                    and os.path.isfile(os.path.join(caminho, nome)):
+                os.remove(os.path.join(caminho, nome))
+
+    def escrever(self, registros):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if not registros:
+            return
+        # Esquema fixo: uma parte só com erro=None não pode sair com outro tipo de coluna
+        esquema = pa.schema([
+            ("documento", pa.string()), ("bytes", pa.int64()), ("modelo", pa.string()), ("erro", pa.string()),
+            ("paragrafos", pa.list_(pa.struct([("texto", pa.string()), ("label", pa.string()),
+                                               ("confianca", pa.float32()), ("label_regex", pa.string())]))),
+        ])
+        nome = f"parte-{len(self.partes):05d}.parquet"
+        temporario = os.path.join(self.caminho, f".{nome}.tmp")
+        pq.write_table(pa.Table.from_pylist(registros, schema=esquema), temporario)
+        os.replace(temporario, os.path.join(self.caminho, nome))
+        self.partes.append(nome)
+
+    def confirmar(self) -> dict:
+        return {"partes": list(self.partes)}
+
+    def fechar(self):
+        pass
+
+
+SAIDAS = {"jsonl": SaidaJSONL, "parquet": SaidaParquet}
+
+
+# --- 3. CHECKPOINT ---
+def caminho_checkpoint(saida: str) -> str:
+    return saida.rstrip(os.sep) + ".checkpoint.json"
+
+
+def assinatura_pdf(caminho: str) -> list:
+    """Tamanho + data de modificação: um PDF alterado depois do checkpoint é refeito (e ganha
+    um registro novo na saída; vale o último registro do documento)."""
+    info = os.stat(caminho)
+    return [info.st_size, info.st_mtime_ns]
+
+
+def ler_checkpoint(saida: str):
+    caminho = caminho_checkpoint(saida)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def salvar_checkpoint(saida: str, checkpoint: dict):
+    caminho = caminho_checkpoint(saida)
+    with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(caminho + ".tmp", caminho) # Nunca fica um checkpoint pela metade
+
+
+# --- 4. CLASSIFICAÇÃO DO ACERVO ---
+def registros_documentos(documentos, resultados, id_modelo: str):
+    """Monta um registro por documento a partir dos resultados de todos os parágrafos juntos."""
+    registros, inicio = [], 0
+    for nome, tamanho, dados, erro in documentos:
+        fim = inicio + len(dados)
+        registros.append({
+            "documento": nome,
+            "bytes": tamanho,
+            "modelo": id_modelo,
+            "erro": erro,
+            "paragrafos": [
+                {"texto": texto, "label": r["label"], "confianca": r["confianca"], "label_regex": label_regex}
+                for (texto, label_regex), r in zip(dados, resultados[inicio:fim])
+            ],
+        })
+        inicio = fim
+    return registros
+
+
+def classificar_acervo(pasta: str, saida: str, classificador, formato: str = "jsonl",
+                       num_workers: int | None = None, extracao: str = "texto",
+                       pasta_cache: str | None = etiquetador.PASTA_CACHE, reiniciar: bool = False):
+    nomes = sorted(f for f in os.listdir(pasta) if f.lower().endswith(".pdf"))
+    assinaturas = {nome: assinatura_pdf(os.path.join(pasta, nome)) for nome in nomes}
+
+    checkpoint = None if reiniciar else ler_checkpoint(saida)
+    if checkpoint is not None and checkpoint["modelo"] != classificador.id_modelo:
+        sys.exit(f"Erro: o checkpoint de '{saida}' é de outro modelo ({checkpoint['modelo']}). "
+                 "Use --reiniciar para reclassificar tudo, ou outra --saida.")
+    if checkpoint is not None and checkpoint["formato"] != formato:
+        sys.exit(f"Erro: o checkpoint de '{saida}' é de uma saída {checkpoint['formato']}.")
+    if checkpoint is None:
+        checkpoint = {"modelo": classificador.id_modelo, "formato": formato, "documentos": {}, "saida": {}}
+    feitos = checkpoint["documentos"]
+    # Sem isso a saída recomeçaria vazia, e os PDFs do checkpoint ficariam sem resultado
+    falta = SAIDAS[formato].faltando(saida, checkpoint["saida"])
+    if falta:
+        sys.exit(f"Erro: {falta}. Os {len(feitos)} PDFs do checkpoint perderiam o resultado; "
+                 "use --reiniciar para reclassificar tudo.")
+    pendentes = [nome for nome in nomes if feitos.get(nome) != assinaturas[nome]]
+    print(f"--- {len(nomes)} PDFs em '{pasta}': {len(nomes) - len(pendentes)} já no checkpoint, "
+          f"{len(pendentes)} a classificar ---")
+    if not pendentes:
+        return
+
+    escritor = SAIDAS[formato](saida, checkpoint["saida"])
+    num_workers = min(num_workers or os.cpu_count() or 1, len(pendentes))
+    caminhos = [os.path.join(pasta, nome) for nome in pendentes]
+
+    # Igual ao 2_etiquetar_automatico.py: com 1 worker tudo roda neste processo; com
+    # mais, os PDFs são lidos no pool, no máximo PDFS_EM_VOO_POR_PROCESSO à frente
+    if num_workers == 1:
+        executor = None
+        lidos = map(partial(etiquetador.processar_pdf, pasta_cache=pasta_cache, extracao=extracao), caminhos)
+    else:
+        executor = ProcessPoolExecutor(max_workers=num_workers)
+        tarefa = partial(etiquetador.processar_pdf_instrumentado, pasta_cache=pasta_cache, extracao=extracao)
+        lidos = etiquetador.mapear_em_ordem(executor, tarefa, caminhos,
+                                            janela=num_workers * etiquetador.PDFS_EM_VOO_POR_PROCESSO)
+
+        def somar_metricas(lidos):
+            for resultado, metricas in lidos:
+                instrumentacao.mesclar(metricas)
+                yield resultado
+        lidos = somar_metricas(lidos)
+
+    inicio = time.perf_counter()
+    fila, registros = [], []          # PDFs lidos à espera do modelo / registros à espera do disco
+    n_docs = n_paragrafos = n_falhas = 0
+
+    def inferir():
+        """Classifica de uma vez os parágrafos de todos os PDFs da fila."""
+        nonlocal n_paragrafos
+        textos = [texto for _, _, dados, _ in fila for texto, _ in dados]
+        resultados = classificador.classificar(textos)
+        registros.extend(registros_documentos(fila, resultados, classificador.id_modelo))
+        n_paragrafos += len(textos)
+        fila.clear()
+
+    def gravar():
+        """Grava os registros prontos e só então avança o checkpoint."""
+        escritor.escrever(registros)
+        checkpoint["saida"] = escritor.confirmar()
+        for registro in registros:
+            feitos[registro["documento"]] = assinaturas[registro["documento"]]
+        salvar_checkpoint(saida, checkpoint)
+        registros.clear()
+        decorrido = time.perf_counter() - inicio
+        print(f"  {n_docs}/{len(pendentes)} PDFs | {n_docs / decorrido:.2f} docs/s | "
+              f"{n_paragrafos / decorrido:.1f} parágrafos/s")
+
+    try:
+        for nome, (dados, erro, _) in zip(pendentes, lidos):
+            if erro:
+                n_falhas += 1 # Fica registrado (com o erro) para não ser tentado a cada retomada
+                print(f"  [AVISO] {nome}: {erro}")
+            fila.append((nome, assinaturas[nome][0], dados, erro))
+            n_docs += 1
+            instrumentacao.contar("documentos_classificados_total", resultado="falha" if erro else "ok")
+            if sum(len(d) for _, _, d, _ in fila) >= PARAGRAFOS_POR_INFERENCIA:
+                inferir()
+            if len(registros) + len(fila) >= DOCUMENTOS_POR_CHECKPOINT:
+                inferir()
+                gravar()
+        inferir()
+        gravar()
+    finally:
+        escritor.fechar()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    decorrido = time.perf_counter() - inicio
+    print("\n--- Acervo classificado! ---")
+    print(f"PDFs: {n_docs} ({n_falhas} com falha) | parágrafos: {n_paragrafos} | {decorrido:.1f} s")
+    print(f"Vazão: {n_docs / decorrido:.2f} docs/s | {n_paragrafos / decorrido:.1f} parágrafos/s")
+    print(f"Resultados em: {saida} (checkpoint: {caminho_checkpoint(saida)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classifica todos os PDFs de uma pasta com o modelo treinado.")
+    parser.add_argument("pasta", nargs="?", default="data", help="Pasta com os PDFs (padrão: data)")
+    parser.add_argument("--saida", required=True,
+                        help="Arquivo .jsonl ou pasta .parquet com um registro por documento")
+    parser.add_argument("--formato", choices=FORMATOS, default=None,
+                        help="Formato da saída (padrão: pela extensão da --saida; senão jsonl)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Processos para ler os PDFs (padrão: todos os núcleos; 1 = sem pool)")
+    parser.add_argument("--extracao", choices=etiquetador.MODOS_EXTRACAO, default="texto",
+                        help="Modo de extração dos PDFs (ver 2_etiquetar_automatico.py)")
+    parser.add_argument("--sem-cache", action="store_true", help="Não usa o cache por PDF da etiquetagem")
+    parser.add_argument("--reiniciar", action="store_true", help="Ignora o checkpoint e reclassifica tudo")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="pytorch", help="Backend de inferência")
+    parser.add_argument("--modelo", default=None, help="Pasta do modelo (padrão: a do backend escolhido)")
+    parser.add_argument("--tamanho-lote", type=int, default=TAMANHO_LOTE, help="Parágrafos por lote no modelo")
+    parser.add_argument("--janelas", action="store_true",
+                        help="Classifica textos longos em janelas sobrepostas em vez de cortar em max_length")
+    parser.add_argument("--mmap", action="store_true", help="Mapeia os pesos do .safetensors (somente leitura)")
+    args = parser.parse_args()
+
+    formato = args.formato or ("parquet" if args.saida.rstrip(os.sep).endswith(".parquet") else "jsonl")
+    from classificador import carregar_classificador # Importa torch e transformers
+    caminho_modelo = args.modelo or BACKENDS[args.backend]
+    classificador = carregar_classificador(caminho_modelo, tamanho_lote=args.tamanho_lote, backend=args.backend,
+                                           janelas=True if args.janelas else None, pesos_mmap=args.mmap)
+    if classificador is None:
+        sys.exit(f"Erro: não foi possível carregar o modelo em '{caminho_modelo}'.")
+    classificar_acervo(args.pasta, args.saida, classificador, formato=formato, num_workers=args.workers,
+                       extracao=args.extracao, pasta_cache=None if args.sem_cache else etiquetador.PASTA_CACHE,
+                       reiniciar=args.reiniciar)
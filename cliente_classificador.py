@@ -0,0 +1,56 @@
+import json
+import time
+import urllib.request
+import urllib.error
+
+# Cliente do servidor.py. Só usa a biblioteca padrão: quem chama (ex: o app.py)
+# não precisa carregar o PyTorch nem o modelo.
+
+
+class ClienteClassificador:
+    """Mesma interface do ClassificadorBulas (classificar, labels), mas via HTTP."""
+
+    def __init__(self, url: str, timeout: float = 120):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.cache = None # O cache de previsões fica no servidor (ver /metricas)
+        saude = self._pedir("/saude")
+        self.labels = saude["labels"]
+        self.backend = saude["backend"]
+
+    def _pedir(self, rota: str, corpo: dict | None = None) -> dict:
+        dados = json.dumps(corpo).encode("utf-8") if corpo is not None else None
+        pedido = urllib.request.Request(self.url + rota, data=dados,
+                                        headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(pedido, timeout=self.timeout) as resposta:
+            return json.loads(resposta.read())
+
+    def classificar(self, textos, tempos=None):
+        """
+        Classifica uma lista de textos no servidor (rota /classificar/lote).
+        Se 'tempos' for passado, soma nele os segundos no "servidor" (fila + modelo)
+        e na "rede" (o resto da ida e volta).
+        """
+        textos = list(textos)
+        if not textos:
+            return []
+        inicio = time.perf_counter()
+        resposta = self._pedir("/classificar/lote", {"textos": textos})
+        if tempos is not None:
+            total = time.perf_counter() - inicio
+            servidor = resposta["latencia_ms"] / 1000
+            tempos["servidor"] = tempos.get("servidor", 0.0) + servidor
+            tempos["rede"] = tempos.get("rede", 0.0) + max(total - servidor, 0.0)
+        return resposta["resultados"]
+
+    def metricas(self) -> dict:
+        return self._pedir("/metricas")
+
+
+def conectar_servidor(url: str):
+    """Conecta ao servidor; retorna None se ele não responder."""
+    try:
+        return ClienteClassificador(url)
+    except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+        print(f"Erro ao conectar ao servidor {url}: {e}")
+        return None
@@ -0,0 +1,30 @@
+# Constantes do modelo compartilhadas entre os scripts. Fica num módulo à parte, sem
+# torch nem transformers, para quem só precisa delas (ex: o app.py, antes de carregar
+# o modelo) não pagar a importação dessas bibliotecas (~3 s). O classificador.py
+# reexporta tudo daqui.
+
+MODELO_SALVO = "modelo_bulario_bertimbau"
+
+# Versões otimizadas para CPU geradas por 5_exportar_modelo.py
+MODELO_INT8 = "modelo_bulario_bertimbau_int8"  # PyTorch com quantização dinâmica INT8
+MODELO_ONNX = "modelo_bulario_bertimbau_onnx"  # Grafo ONNX (INT8) para o ONNX Runtime
+ARQUIVO_PESOS_INT8 = "pesos_int8.pt"
+ARQUIVO_ONNX = "modelo_int8.onnx"
+
+# Aluno destilado pelo 4b_destilar_modelo.py (menos camadas; mesmo formato do MODELO_SALVO)
+MODELO_ALUNO = "modelo_bulario_bertimbau_aluno"
+
+# Backend -> pasta padrão do modelo
+BACKENDS = {
+    "pytorch": MODELO_SALVO,
+    "int8": MODELO_INT8,
+    "onnx": MODELO_ONNX,
+}
+
+# Nossas 6 etiquetas (IMPORTANTE: A ordem deve ser a mesma do treino)
+LABELS = ["COMPOSICAO", "INDICACAO", "CONTRAINDICACAO", "POSOLOGIA", "EFEITOS_ADVERSOS", "OUTROS"]
+id2label = {i: label for i, label in enumerate(LABELS)}
+
+MAX_LENGTH = 128   # Mesmo limite de tokens usado no treino
+TAMANHO_LOTE = 32  # Quantos parágrafos por passada no modelo
+STRIDE_JANELA = 32 # Modo janelas: tokens repetidos entre janelas vizinhas
@@ -0,0 +1,268 @@
+"""
+Índice de passagens semelhantes: embeddings dos parágrafos (float16, mapeados do
+disco) + um índice aproximado de vizinhos mais próximos do tipo IVF.
+
+Os embeddings são agrupados por k-means esférico em n_listas grupos (as "listas").
+Cada vetor fica na lista do centroide mais parecido, e o arquivo de embeddings é
+gravado já na ordem das listas: cada lista é um trecho contínuo da matriz. Uma
+busca compara a consulta só com os centroides e lê as 'sondas' listas mais
+próximas, em vez de ler a matriz inteira. Mais sondas = mais recall e mais tempo.
+
+Conteúdo da pasta do índice (gerada pelo 6_indexar_similares.py):
+    embeddings.npy         float16 (n x dim), norma 1, na ordem das listas
+    centroides.npy         float32 (n_listas x dim)
+    inicios.npy            int64 (n_listas + 1): a lista i são as linhas inicios[i]:inicios[i+1]
+    labels.npy             int8 (n): índice em metadados["labels"]
+    ocorrencias.npy        int32 (n): quantas vezes o texto aparece no dataset
+    textos.bin             os textos em UTF-8, um depois do outro
+    posicoes_textos.npy    int64 (n + 1): o texto i são os bytes posicoes[i]:posicoes[i+1]
+    metadados.json         n, dim, n_listas, labels, id do modelo, tempos de construção
+
+Uso (na raiz do projeto; precisa do modelo para calcular o embedding da consulta):
+    python indice_similares.py "Este medicamento é contraindicado para..." [-k 10] [--label CONTRAINDICACAO]
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import shutil
+import argparse
+import numpy as np
+
+# --- 1. CONFIGURAÇÃO ---
+PASTA_INDICE = "indice_similares"
+SONDAS_PADRAO = 16       # Listas lidas por busca
+LISTAS_POR_RAIZ = 4      # n_listas = 4 * raiz(n): ~900 listas para 50 mil vetores, 4.000 para 1 milhão
+AMOSTRAS_POR_LISTA = 32  # O k-means treina com no máximo n_listas * 32 vetores (amostra)
+ITERACOES_KMEANS = 8
+BLOCO = 65536            # Vetores por bloco ao atribuir/copiar (limita a memória usada)
+
+
+# --- 2. CONSTRUÇÃO ---
+def normalizar(vetores) -> np.ndarray:
+    """Cópia em float32 com norma 1 por linha (produto escalar = similaridade de cosseno)."""
+    vetores = np.asarray(vetores, dtype=np.float32)
+    normas = np.linalg.norm(vetores, axis=-1, keepdims=True)
+    return vetores / np.maximum(normas, 1e-12)
+
+
+def atribuir(vetores, centroides: np.ndarray) -> np.ndarray:
+    """Índice do centroide mais parecido com cada vetor, em blocos (vetores pode ser um memmap)."""
+    atribuicao = np.empty(len(vetores), dtype=np.int32)
+    passo = max(1, BLOCO * 256 // len(centroides)) # A matriz de similaridades do bloco fica em ~64 MB
+    for inicio in range(0, len(vetores), passo):
+        bloco = np.asarray(vetores[inicio:inicio + passo], dtype=np.float32)
+        atribuicao[inicio:inicio + len(bloco)] = np.argmax(bloco @ centroides.T, axis=1)
+    return atribuicao
+
+
+def kmeans_esferico(amostra: np.ndarray, n_listas: int, iteracoes: int = ITERACOES_KMEANS,
+                    semente: int = 42) -> np.ndarray:
+    """
+    K-means com similaridade de cosseno: os centroides são a média (renormalizada) dos
+    vetores de cada grupo. Grupos que ficam vazios recebem um vetor aleatório da amostra.
+    """
+    rng = np.random.default_rng(semente)
+    centroides = amostra[rng.choice(len(amostra), n_listas, replace=False)].copy()
+    for _ in range(iteracoes):
+        atribuicao = atribuir(amostra, centroides)
+        # Soma por grupo sem laço em Python: ordena pelo grupo e soma cada trecho
+        ordem = np.argsort(atribuicao, kind="stable")
+        grupos, inicios = np.unique(atribuicao[ordem], return_index=True)
+        centroides[grupos] = np.add.reduceat(amostra[ordem], inicios, axis=0)
+        vazios = np.setdiff1d(np.arange(n_listas), grupos)
+        centroides[vazios] = amostra[rng.choice(len(amostra), len(vazios), replace=False)]
+        centroides = normalizar(centroides)
+    return centroides
+
+
+def n_listas_padrao(n: int) -> int:
+    return max(1, min(n, round(LISTAS_POR_RAIZ * n ** 0.5)))
+
+
+def construir_indice(pasta: str, embeddings, textos, labels, ocorrencias=None,
+                     n_listas: int | None = None, metadados: dict | None = None) -> dict:
+    """
+    Constrói o índice em 'pasta' a partir dos embeddings (n x dim, norma 1; pode ser um
+    memmap float16) e dos textos/etiquetas de cada linha. Tudo é gravado numa pasta
+    temporária que só substitui a antiga no fim. Devolve os metadados gravados.
+    """
+    n, dim = embeddings.shape
+    n_listas = n_listas or n_listas_padrao(n)
+    nomes_labels = sorted(set(labels))
+    id_label = {label: i for i, label in enumerate(nomes_labels)}
+    temporaria = pasta.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(42)
+    n_amostra = min(n, n_listas * AMOSTRAS_POR_LISTA)
+    amostra = np.asarray(embeddings[np.sort(rng.choice(n, n_amostra, replace=False))], dtype=np.float32)
+    centroides = kmeans_esferico(amostra, n_listas)
+    t_kmeans = time.perf_counter() - t0
+
+    atribuicao = atribuir(embeddings, centroides)
+    ordem = np.argsort(atribuicao, kind="stable") # Linhas de cada lista ficam juntas
+    inicios = np.zeros(n_listas + 1, dtype=np.int64)
+    inicios[1:] = np.cumsum(np.bincount(atribuicao, minlength=n_listas))
+
+    matriz = np.lib.format.open_memmap(os.path.join(temporaria, "embeddings.npy"), mode="w+",
+                                       dtype=np.float16, shape=(n, dim))
+    for inicio in range(0, n, BLOCO):
+        matriz[inicio:inicio + BLOCO] = embeddings[ordem[inicio:inicio + BLOCO]]
+    matriz.flush()
+    del matriz
+
+    np.save(os.path.join(temporaria, "centroides.npy"), centroides)
+    np.save(os.path.join(temporaria, "inicios.npy"), inicios)
+    np.save(os.path.join(temporaria, "labels.npy"), np.array([id_label[labels[i]] for i in ordem], dtype=np.int8))
+    ocorrencias = np.ones(n, dtype=np.int32) if ocorrencias is None else np.asarray(ocorrencias, dtype=np.int32)
+    np.save(os.path.join(temporaria, "ocorrencias.npy"), ocorrencias[ordem])
+    posicoes = np.zeros(n + 1, dtype=np.int64)
+    with open(os.path.join(temporaria, "textos.bin"), "wb") as f:
+        for i, linha in enumerate(ordem):
+            bruto = textos[linha].encode("utf-8")
+            f.write(bruto)
+            posicoes[i + 1] = posicoes[i] + len(bruto)
+    np.save(os.path.join(temporaria, "posicoes_textos.npy"), posicoes)
+
+    metadados = {
+        **(metadados or {}),
+        "n": n, "dim": dim, "n_listas": n_listas, "labels": nomes_labels,
+        "segundos_kmeans": round(t_kmeans, 2), "segundos_construcao": round(time.perf_counter() - t0, 2),
+    }
+    with open(os.path.join(temporaria, "metadados.json"), "w", encoding="utf-8") as f:
+        json.dump(metadados, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(pasta, ignore_errors=True)
+    os.replace(temporaria, pasta)
+    return metadados
+
+
+# --- 3. BUSCA ---
+class IndiceSimilares:
+    """
+    Índice aberto do disco. Os embeddings e os textos ficam mapeados (somente leitura):
+    abrir é instantâneo e só as listas visitadas são lidas. Os centroides e os
+    vetores pequenos (início das listas, etiquetas) ficam na memória.
+    """
+
+    def __init__(self, pasta: str = PASTA_INDICE):
+        self.pasta = pasta
+        with open(os.path.join(pasta, "metadados.json"), encoding="utf-8") as f:
+            self.metadados = json.load(f)
+        self.labels_nomes = self.metadados["labels"]
+        self.id_modelo = self.metadados.get("id_modelo")
+        self.embeddings = np.load(os.path.join(pasta, "embeddings.npy"), mmap_mode="r")
+        self.centroides = np.load(os.path.join(pasta, "centroides.npy"))
+        self.inicios = np.load(os.path.join(pasta, "inicios.npy"))
+        self.labels = np.load(os.path.join(pasta, "labels.npy"))
+        self.ocorrencias = np.load(os.path.join(pasta, "ocorrencias.npy"))
+        self.posicoes_textos = np.load(os.path.join(pasta, "posicoes_textos.npy"), mmap_mode="r")
+        with open(os.path.join(pasta, "textos.bin"), "rb") as f:
+            self._textos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def texto(self, posicao: int) -> str:
+        return self._textos[self.posicoes_textos[posicao]:self.posicoes_textos[posicao + 1]].decode("utf-8")
+
+    def _id_label(self, label):
+        if label is None:
+            return None
+        if label not in self.labels_nomes:
+            raise ValueError(f"Etiqueta inválida: {label} (use {self.labels_nomes})")
+        return self.labels_nomes.index(label)
+
+    def _melhores(self, posicoes, similaridades, k: int):
+        """Os k de maior similaridade, em ordem decrescente, como dicionários."""
+        if len(posicoes) > k:
+            escolhidos = np.argpartition(-similaridades, k - 1)[:k]
+            posicoes, similaridades = posicoes[escolhidos], similaridades[escolhidos]
+        ordem = np.argsort(-similaridades, kind="stable")
+        return [{
+            "posicao": int(posicoes[i]),
+            "similaridade": float(similaridades[i]),
+            "label": self.labels_nomes[self.labels[posicoes[i]]],
+            "ocorrencias": int(self.ocorrencias[posicoes[i]]),
+            "texto": self.texto(posicoes[i]),
+        } for i in ordem]
+
+    def buscar(self, vetor, k: int = 10, sondas: int = SONDAS_PADRAO, label: str | None = None):
+        """
+        Os k parágrafos mais parecidos com 'vetor' (um embedding, ver
+        ClassificadorBulas.embeddings_textos), opcionalmente só os de uma etiqueta.
+        Lê as 'sondas' listas mais próximas; com filtro por etiqueta, continua pelas
+        seguintes até ter pelo menos k candidatos.
+        """
+        consulta = normalizar(vetor).reshape(-1)
+        id_label = self._id_label(label)
+        ordem_listas = np.argsort(-(self.centroides @ consulta))
+        posicoes, similaridades, n_candidatos = [], [], 0
+        for visitadas, lista in enumerate(ordem_listas, 1):
+            inicio, fim = self.inicios[lista], self.inicios[lista + 1]
+            if id_label is None:
+                candidatos = np.arange(inicio, fim)
+                bloco = self.embeddings[inicio:fim] # Trecho contínuo do arquivo
+            else:
+                candidatos = inicio + np.flatnonzero(self.labels[inicio:fim] == id_label)
+                bloco = self.embeddings[candidatos]
+            if len(candidatos):
+                posicoes.append(candidatos)
+                similaridades.append(bloco.astype(np.float32) @ consulta)
+                n_candidatos += len(candidatos)
+            if visitadas >= sondas and n_candidatos >= k:
+                break
+        if not posicoes:
+            return []
+        return self._melhores(np.concatenate(posicoes), np.concatenate(similaridades), k)
+
+    def buscar_exato(self, vetor, k: int = 10, label: str | None = None):
+        """Busca exata, comparando com todos os vetores (referência para medir o recall)."""
+        consulta = normalizar(vetor).reshape(-1)
+        id_label = self._id_label(label)
+        similaridades = np.empty(len(self), dtype=np.float32)
+        for inicio in range(0, len(self), BLOCO):
+            similaridades[inicio:inicio + BLOCO] = self.embeddings[inicio:inicio + BLOCO].astype(np.float32) @ consulta
+        posicoes = np.arange(len(self)) if id_label is None else np.flatnonzero(self.labels == id_label)
+        return self._melhores(posicoes, similaridades[posicoes], k)
+
+
+def carregar_indice(pasta: str = PASTA_INDICE):
+    """Abre o índice; retorna None se a pasta não existir (o 6_indexar_similares.py não rodou)."""
+    if not os.path.exists(os.path.join(pasta, "metadados.json")):
+        return None
+    return IndiceSimilares(pasta)
+
+
+# --- 4. BUSCA PELA LINHA DE COMANDO ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca os parágrafos do dataset mais parecidos com um texto.")
+    parser.add_argument("texto", help="Parágrafo de bula a procurar")
+    parser.add_argument("-k", type=int, default=10, help="Quantos resultados (padrão: 10)")
+    parser.add_argument("--label", default=None, help="Só parágrafos desta etiqueta (ex: CONTRAINDICACAO)")
+    parser.add_argument("--sondas", type=int, default=SONDAS_PADRAO, help="Listas lidas por busca")
+    parser.add_argument("--indice", default=PASTA_INDICE, help=f"Pasta do índice (padrão: {PASTA_INDICE})")
+    parser.add_argument("--modelo", default=None, help="Pasta do modelo (padrão: a usada para gerar o índice)")
+    args = parser.parse_args()
+
+    indice = carregar_indice(args.indice)
+    if indice is None:
+        sys.exit(f"Erro: índice não encontrado em '{args.indice}'. Rode antes: python 6_indexar_similares.py")
+    from classificador import ClassificadorBulas # Importa torch e transformers
+    classificador = ClassificadorBulas(args.modelo or indice.metadados["modelo"], backend=indice.metadados["backend"])
+    if classificador.id_modelo != indice.id_modelo:
+        print("[AVISO] O modelo mudou desde que o índice foi gerado: rode de novo o 6_indexar_similares.py.")
+
+    t0 = time.perf_counter()
+    vetor = classificador.embeddings_textos([args.texto])[0].numpy()
+    t1 = time.perf_counter()
+    resultados = indice.buscar(vetor, k=args.k, sondas=args.sondas, label=args.label)
+    t2 = time.perf_counter()
+    for r in resultados:
+        print(f"\n[{r['similaridade']:.3f}] {r['label']} (x{r['ocorrencias']})\n{r['texto']}")
+    print(f"\nEmbedding: {(t1 - t0) * 1000:.1f} ms | busca: {(t2 - t1) * 1000:.1f} ms "
+          f"({len(indice)} parágrafos, {indice.metadados['n_listas']} listas)")
@@ -0,0 +1,317 @@
+"""
+Índice invertido para busca por palavras nos trechos etiquetados das bulas
+(ex: quais bulas falam de "hemólise" em EFEITOS_ADVERSOS).
+
+Cada trecho vira um conjunto de termos: o texto é dobrado (minúsculas, sem acentos,
+"ç" -> "c") e dividido em palavras, sem as palavras vazias mais comuns ("de", "que"...).
+Para cada termo, o índice guarda a lista ordenada dos trechos que o contêm. Uma busca
+cruza as listas dos termos da consulta (todos precisam aparecer), começando pela menor,
+e filtra pela etiqueta e pelo PDF de origem. Nada do CSV é lido: os textos só são
+decodificados para os resultados mostrados.
+
+Só biblioteca padrão: abrir o índice e buscar não importa pandas nem numpy.
+
+Conteúdo da pasta do índice (gerada pelo 2c_indexar_texto.py):
+    termos.json           termos em ordem alfabética + início da lista de cada um em postings.bin
+    postings.bin          uint32: os IDs dos trechos de cada termo, em ordem
+    labels.bin            uint8 por trecho: índice em metadados["labels"]
+    documentos.bin        uint32 por trecho: índice em metadados["documentos"]
+    paginas.bin           uint32 por trecho: página do PDF onde ele começa (0 = desconhecida)
+    textos.bin            os textos em UTF-8, um depois do outro
+    posicoes_textos.bin   int64 (n + 1): o texto i são os bytes posicoes[i]:posicoes[i+1]
+    metadados.json        nº de trechos, etiquetas, nomes dos PDFs, regras da etiquetagem
+
+Uso (na raiz do projeto):
+    python indice_textual.py hemólise --label EFEITOS_ADVERSOS
+    python indice_textual.py "insuficiencia ren*" --pdf bula_losartana.pdf
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import bisect
+import shutil
+import argparse
+import unicodedata
+from array import array
+
+# --- 1. CONFIGURAÇÃO ---
+PASTA_INDICE = "indice_textual"
+LIMITE_RESULTADOS = 50 # Trechos devolvidos por busca (o total e a contagem por PDF contam todos)
+
+# Palavras que aparecem em quase todo trecho: não ajudam a filtrar e só aumentam o índice.
+# Já sem acento, como os termos.
+PALAVRAS_VAZIAS = frozenset("""
+a o as os um uma uns umas de do da dos das em no na nos nas por pelo pela pelos pelas
+para com sem sob e ou que se ao aos ate como mais mas nao seu sua seus suas ser sao
+este esta estes estas esse essa isso ele ela eles elas lhe ja tem ha foi pode
+""".split())
+
+TERMO_REGEX = re.compile(r"[a-z0-9]+")
+PALAVRA_REGEX = re.compile(r"\w+")
+
+
+# --- 2. TERMOS ---
+def dobrar(texto: str) -> str:
+    """Minúsculas e sem acentos (a decomposição NFKD separa o acento, que é descartado)."""
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii").lower()
+
+
+def termos(texto: str) -> list:
+    """Termos indexáveis do texto, na ordem (com repetições)."""
+    return [t for t in TERMO_REGEX.findall(dobrar(texto)) if t not in PALAVRAS_VAZIAS and len(t) > 1]
+
+
+def termos_consulta(consulta: str) -> list:
+    """
+    Termos de uma consulta, sem repetição. Um termo terminado em * vale como prefixo
+    ("hemoli*" acha "hemolise" e "hemolitica").
+    """
+    vistos = []
+    for palavra in consulta.split():
+        prefixo = palavra.endswith("*")
+        for termo in termos(palavra):
+            termo += "*" if prefixo else ""
+            if termo not in vistos:
+                vistos.append(termo)
+    return vistos
+
+
+def trechos_destacados(texto: str, consulta: list):
+    """
+    Divide o texto em [(pedaço, casou)] marcando as palavras que casam com algum termo
+    da consulta (para destacar no app). A comparação é feita palavra a palavra, dobrada.
+    """
+    exatos = {t for t in consulta if not t.endswith("*")}
+    prefixos = tuple(t[:-1] for t in consulta if t.endswith("*"))
+    pedacos, fim_anterior = [], 0
+    for palavra in PALAVRA_REGEX.finditer(texto):
+        partes = TERMO_REGEX.findall(dobrar(palavra.group()))
+        if any(p in exatos or (prefixos and p.startswith(prefixos)) for p in partes):
+            pedacos.append((texto[fim_anterior:palavra.start()], False))
+            pedacos.append((palavra.group(), True))
+            fim_anterior = palavra.end()
+    pedacos.append((texto[fim_anterior:], False))
+    return [p for p in pedacos if p[0]]
+
+
+# --- 3. CONSTRUÇÃO ---
+def construir_indice(pasta: str, documentos, metadados: dict | None = None) -> dict:
+    """
+    Constrói o índice em 'pasta' a partir de (nome_do_pdf, [Segmento, ...]) por documento
+    (a saída do segmentar_e_etiquetar ou o armazém segmentos.py). Tudo é gravado numa pasta temporária
+    que só substitui a antiga no fim. Devolve os metadados gravados.
+    """
+    t0 = time.perf_counter()
+    temporaria = pasta.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+
+    postings = {}         # termo -> array com os IDs dos trechos (já em ordem crescente)
+    nomes_labels, id_label = [], {}
+    nomes_documentos = []
+    labels, ids_documentos, paginas = array("B"), array("I"), array("I")
+    posicoes = array("q", [0])
+    with open(os.path.join(temporaria, "textos.bin"), "wb") as f_textos:
+        for nome, dados in documentos:
+            id_documento = len(nomes_documentos)
+            nomes_documentos.append(nome)
+            for segmento in dados:
+                texto, label = segmento.texto, segmento.label
+                id_trecho = len(labels)
+                if label not in id_label:
+                    id_label[label] = len(nomes_labels)
+                    nomes_labels.append(label)
+                labels.append(id_label[label])
+                ids_documentos.append(id_documento)
+                paginas.append(segmento.pagina)
+                bruto = texto.encode("utf-8")
+                f_textos.write(bruto)
+                posicoes.append(posicoes[-1] + len(bruto))
+                for termo in set(termos(texto)):
+                    lista = postings.get(termo)
+                    if lista is None:
+                        lista = postings[termo] = array("I")
+                    lista.append(id_trecho)
+
+    ordenados = sorted(postings)
+    inicios = [0]
+    with open(os.path.join(temporaria, "postings.bin"), "wb") as f:
+        for termo in ordenados:
+            postings[termo].tofile(f)
+            inicios.append(inicios[-1] + len(postings[termo]))
+    with open(os.path.join(temporaria, "termos.json"), "w", encoding="utf-8") as f:
+        json.dump({"termos": ordenados, "inicios": inicios}, f, ensure_ascii=False)
+    for nome, dados in (("labels.bin", labels), ("documentos.bin", ids_documentos),
+                        ("paginas.bin", paginas), ("posicoes_textos.bin", posicoes)):
+        with open(os.path.join(temporaria, nome), "wb") as f:
+            dados.tofile(f)
+
+    metadados = {
+        **(metadados or {}),
+        "n_trechos": len(labels), "n_termos": len(ordenados), "n_postings": inicios[-1],
+        "labels": nomes_labels, "documentos": nomes_documentos,
+        "segundos_construcao": round(time.perf_counter() - t0, 2),
+    }
+    with open(os.path.join(temporaria, "metadados.json"), "w", encoding="utf-8") as f:
+        json.dump(metadados, f, indent=2, ensure_ascii=False)
+
+    shutil.rmtree(pasta, ignore_errors=True)
+    os.replace(temporaria, pasta)
+    return metadados
+
+
+# --- 4. BUSCA ---
+def _mapear(caminho: str, tipo: str):
+    """Arquivo binário mapeado (somente leitura) como uma sequência de 'tipo' (código do array)."""
+    with open(caminho, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return array(tipo)
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(tipo)
+
+
+class IndiceTextual:
+    """
+    Índice aberto do disco. Os termos (alguns milhares) e as etiquetas/documentos de cada
+    trecho ficam na memória; as listas de trechos e os textos ficam mapeados e só as
+    partes usadas por uma busca são lidas.
+    """
+
+    def __init__(self, pasta: str = PASTA_INDICE):
+        self.pasta = pasta
+        with open(os.path.join(pasta, "metadados.json"), encoding="utf-8") as f:
+            self.metadados = json.load(f)
+        with open(os.path.join(pasta, "termos.json"), encoding="utf-8") as f:
+            dicionario = json.load(f)
+        self.termos = dicionario["termos"]
+        self.inicios = dicionario["inicios"]
+        self.posicao_termo = {termo: i for i, termo in enumerate(self.termos)}
+        self.labels_nomes = self.metadados["labels"]
+        self.documentos = self.metadados["documentos"]
+        self.postings = _mapear(os.path.join(pasta, "postings.bin"), "I")
+        self.posicoes_textos = _mapear(os.path.join(pasta, "posicoes_textos.bin"), "q")
+        self._textos = _mapear(os.path.join(pasta, "textos.bin"), "B")
+        with open(os.path.join(pasta, "labels.bin"), "rb") as f:
+            self.labels = f.read() # bytes: self.labels[i] é o índice da etiqueta do trecho i
+        self.ids_documentos = array("I")
+        with open(os.path.join(pasta, "documentos.bin"), "rb") as f:
+            self.ids_documentos.frombytes(f.read())
+        self.paginas = _mapear(os.path.join(pasta, "paginas.bin"), "I")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def texto(self, trecho: int) -> str:
+        return bytes(self._textos[self.posicoes_textos[trecho]:self.posicoes_textos[trecho + 1]]).decode("utf-8")
+
+    def _lista(self, termo: str):
+        """Trechos com o termo, em ordem (um memoryview do arquivo mapeado; vazio se não existe)."""
+        i = self.posicao_termo.get(termo)
+        if i is None:
+            return self.postings[0:0]
+        return self.postings[self.inicios[i]:self.inicios[i + 1]]
+
+    def _lista_prefixo(self, prefixo: str):
+        """Trechos com algum termo que começa com o prefixo (união das listas, em ordem)."""
+        primeiro = bisect.bisect_left(self.termos, prefixo)
+        ultimo = bisect.bisect_left(self.termos, prefixo + "\uffff") # Depois de todo termo com o prefixo
+        if ultimo - primeiro == 1:
+            return self._lista(self.termos[primeiro])
+        trechos = set()
+        for termo in self.termos[primeiro:ultimo]:
+            trechos.update(self._lista(termo))
+        return sorted(trechos)
+
+    def buscar(self, consulta: str, label: str | None = None, documento: str | None = None,
+               limite: int = LIMITE_RESULTADOS) -> dict:
+        """
+        Trechos que têm TODOS os termos da consulta, opcionalmente só de uma etiqueta e/ou
+        de um PDF. Devolve {"termos", "total", "por_documento": {pdf: nº de trechos},
+        "resultados": [{"trecho", "documento", "pagina", "label", "texto"}] (os 'limite' primeiros,
+        na ordem dos PDFs)}.
+        """
+        consulta = termos_consulta(consulta)
+        id_label = self._id(self.labels_nomes, label, "Etiqueta")
+        id_documento = self._id(self.documentos, documento, "PDF")
+        if not consulta:
+            return {"termos": [], "total": 0, "por_documento": {}, "resultados": []}
+
+        listas = sorted((self._lista_prefixo(t[:-1]) if t.endswith("*") else self._lista(t) for t in consulta),
+                        key=len)
+        # Parte da menor lista e confere cada trecho nas outras por busca binária
+        # (as listas estão em ordem): custa ~ tamanho da menor x log da maior
+        encontrados = []
+        for trecho in listas[0]:
+            if id_label is not None and self.labels[trecho] != id_label:
+                continue
+            if id_documento is not None and self.ids_documentos[trecho] != id_documento:
+                continue
+            if all(_contem(lista, trecho) for lista in listas[1:]):
+                encontrados.append(trecho)
+
+        por_documento = {}
+        for trecho in encontrados:
+            nome = self.documentos[self.ids_documentos[trecho]]
+            por_documento[nome] = por_documento.get(nome, 0) + 1
+        return {
+            "termos": consulta,
+            "total": len(encontrados),
+            "por_documento": por_documento,
+            "resultados": [{
+                "trecho": trecho,
+                "documento": self.documentos[self.ids_documentos[trecho]],
+                "pagina": self.paginas[trecho],
+                "label": self.labels_nomes[self.labels[trecho]],
+                "texto": self.texto(trecho),
+            } for trecho in encontrados[:limite]],
+        }
+
+    @staticmethod
+    def _id(nomes, valor, descricao):
+        if valor is None:
+            return None
+        if valor not in nomes:
+            raise ValueError(f"{descricao} não encontrado no índice: {valor}")
+        return nomes.index(valor)
+
+
+def _contem(lista, valor) -> bool:
+    i = bisect.bisect_left(lista, valor)
+    return i < len(lista) and lista[i] == valor
+
+
+def carregar_indice(pasta: str = PASTA_INDICE):
+    """Abre o índice; retorna None se a pasta não existir (o 2c_indexar_texto.py não rodou)."""
+    if not os.path.exists(os.path.join(pasta, "metadados.json")):
+        return None
+    return IndiceTextual(pasta)
+
+
+# --- 5. BUSCA PELA LINHA DE COMANDO ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Busca trechos de bula por palavras (sem acento, * = prefixo).")
+    parser.add_argument("consulta", help='Palavras que precisam aparecer no trecho (ex: "hemolise", "renal insufic*")')
+    parser.add_argument("--label", default=None, help="Só trechos desta etiqueta (ex: EFEITOS_ADVERSOS)")
+    parser.add_argument("--pdf", default=None, help="Só trechos deste PDF (ex: bula_dipirona.pdf)")
+    parser.add_argument("--limite", type=int, default=10, help="Trechos mostrados (padrão: 10)")
+    parser.add_argument("--indice", default=PASTA_INDICE, help=f"Pasta do índice (padrão: {PASTA_INDICE})")
+    args = parser.parse_args()
+
+    indice = carregar_indice(args.indice)
+    if indice is None:
+        sys.exit(f"Erro: índice não encontrado em '{args.indice}'. Rode antes: python 2c_indexar_texto.py")
+    t0 = time.perf_counter()
+    try:
+        resposta = indice.buscar(args.consulta, label=args.label, documento=args.pdf, limite=args.limite)
+    except ValueError as e:
+        sys.exit(f"Erro: {e}")
+    decorrido = time.perf_counter() - t0
+
+    for r in resposta["resultados"]:
+        print(f"\n[{r['documento']} p. {r['pagina']} | {r['label']}]\n{r['texto']}")
+    print(f"\nTermos: {' '.join(resposta['termos'])} | {resposta['total']} trechos em "
+          f"{len(resposta['por_documento'])} PDFs | {decorrido * 1000:.2f} ms")
+    for nome, n in sorted(resposta["por_documento"].items(), key=lambda item: -item[1]):
+        print(f"  {n:>4}  {nome}")
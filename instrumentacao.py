@@ -0,0 +1,233 @@
+import os
+import time
+import json
+import atexit
+import bisect
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+# --- 1. CONFIGURAÇÃO ---
+# Só biblioteca padrão: é importado pelo 2_etiquetar_automatico.py e pelo classificador.py,
+# e não pode pesar na inicialização do app (ver benchmarks/inicializacao.py).
+PREFIXO = "bulario_"
+
+# Limites superiores dos baldes dos histogramas (como no Prometheus; o +Inf é implícito)
+BALDES_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BALDES_CONTAGEM = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Opt-in por variável de ambiente, para valer em qualquer script sem mudar a linha de comando:
+#   BULARIO_METRICAS=metricas.json   grava as métricas em JSON quando o processo termina
+#   BULARIO_PERFIL=extracao,inferencia  (ou "todas") perfila só essas etapas
+#   BULARIO_PERFILADOR=pyinstrument  usa o pyinstrument em vez do cProfile
+ARQUIVO_METRICAS = os.environ.get("BULARIO_METRICAS")
+ETAPAS_PERFIL = {e.strip() for e in os.environ.get("BULARIO_PERFIL", "").split(",") if e.strip()}
+PERFILADOR = os.environ.get("BULARIO_PERFILADOR", "cprofile")
+PASTA_PERFIS = os.path.join("relatorios", "perfis")
+
+
+# --- 2. REGISTRO DE CONTADORES E HISTOGRAMAS ---
+def _escapar(valor) -> str:
+    """Escapa o valor de um rótulo como pede o formato de texto do Prometheus."""
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registro:
+    """
+    Contadores e histogramas em memória, seguros entre threads (o servidor.py e o
+    Streamlit atendem cada pedido numa thread).
+
+    Cada métrica é identificada pelo nome + rótulos (ex: etapa="extracao"). O histograma
+    guarda só a contagem por balde, a soma e o total: custo fixo por observação, sem
+    guardar os valores. Processos de um pool têm o seu próprio registro; o processo
+    principal junta os deles com coletar(zerar=True) + mesclar().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.contadores = {}   # (nome, rótulos) -> valor
+        self.histogramas = {}  # (nome, rótulos) -> {"baldes", "contagens", "soma", "total"}
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+    def contar(self, nome: str, valor: float = 1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def observar(self, nome: str, valor: float, baldes=BALDES_SEGUNDOS, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self._lock:
+            h = self.histogramas.get(chave)
+            if h is None:
+                h = self.histogramas[chave] = {"baldes": tuple(baldes), "contagens": [0] * (len(baldes) + 1),
+                                               "soma": 0.0, "total": 0}
+            h["contagens"][bisect.bisect_left(h["baldes"], valor)] += 1 # Último = acima do maior balde
+            h["soma"] += valor
+            h["total"] += 1
+
+    def valor(self, nome: str, **rotulos) -> float:
+        """Valor atual de um contador (0 se nunca foi incrementado)."""
+        with self._lock:
+            return self.contadores.get(self._chave(nome, rotulos), 0)
+
+    def coletar(self, zerar: bool = False) -> dict:
+        """Fotografia do registro, serializável em JSON (e via pickle, entre processos)."""
+        with self._lock:
+            dados = {
+                "contadores": [{"nome": n, "rotulos": dict(r), "valor": v}
+                               for (n, r), v in self.contadores.items()],
+                "histogramas": [{"nome": n, "rotulos": dict(r), "baldes": list(h["baldes"]),
+                                 "contagens": list(h["contagens"]), "soma": h["soma"], "total": h["total"]}
+                                for (n, r), h in self.histogramas.items()],
+            }
+            if zerar:
+                self.contadores.clear()
+                self.histogramas.clear()
+        return dados
+
+    def mesclar(self, dados: dict):
+        """Soma ao registro uma fotografia de coletar() (ex: vinda de um processo do pool)."""
+        with self._lock:
+            for c in dados["contadores"]:
+                chave = self._chave(c["nome"], c["rotulos"])
+                self.contadores[chave] = self.contadores.get(chave, 0) + c["valor"]
+            for h in dados["histogramas"]:
+                chave = self._chave(h["nome"], h["rotulos"])
+                atual = self.histogramas.setdefault(chave, {"baldes": tuple(h["baldes"]),
+                                                            "contagens": [0] * len(h["contagens"]),
+                                                            "soma": 0.0, "total": 0})
+                atual["contagens"] = [a + b for a, b in zip(atual["contagens"], h["contagens"])]
+                atual["soma"] += h["soma"]
+                atual["total"] += h["total"]
+
+    def texto_prometheus(self) -> str:
+        """Formato de exposição em texto do Prometheus (para um endpoint /metrics)."""
+        def rotulos_texto(rotulos):
+            if not rotulos:
+                return ""
+            return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos) + "}"
+
+        dados = self.coletar()
+        linhas, tipos = [], set()
+        for c in sorted(dados["contadores"], key=lambda c: (c["nome"], sorted(c["rotulos"].items()))):
+            nome = PREFIXO + c["nome"]
+            if nome not in tipos:
+                tipos.add(nome)
+                linhas.append(f"# TYPE {nome} counter")
+            linhas.append(f"{nome}{rotulos_texto(sorted(c['rotulos'].items()))} {c['valor']}")
+        for h in sorted(dados["histogramas"], key=lambda h: (h["nome"], sorted(h["rotulos"].items()))):
+            nome = PREFIXO + h["nome"]
+            if nome not in tipos:
+                tipos.add(nome)
+                linhas.append(f"# TYPE {nome} histogram")
+            rotulos = sorted(h["rotulos"].items())
+            acumulado = 0
+            for limite, n in zip(list(h["baldes"]) + ["+Inf"], h["contagens"]):
+                acumulado += n # No Prometheus cada balde conta tudo que é <= ao limite
+                linhas.append(f"{nome}_bucket{rotulos_texto(rotulos + [('le', limite)])} {acumulado}")
+            linhas.append(f"{nome}_sum{rotulos_texto(rotulos)} {h['soma']}")
+            linhas.append(f"{nome}_count{rotulos_texto(rotulos)} {h['total']}")
+        return "\n".join(linhas) + "\n"
+
+    def salvar_json(self, caminho: str):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(self.coletar(), f, indent=2, ensure_ascii=False)
+
+
+# Registro global do processo: os módulos só chamam as funções abaixo
+REGISTRO = Registro()
+contar = REGISTRO.contar
+observar = REGISTRO.observar
+coletar = REGISTRO.coletar
+mesclar = REGISTRO.mesclar
+texto_prometheus = REGISTRO.texto_prometheus
+salvar_json = REGISTRO.salvar_json
+
+
+# --- 3. PERFILAMENTO OPCIONAL POR ETAPA ---
+_perfiladores = {}        # etapa -> cProfile.Profile / pyinstrument.Profiler (acumula entre chamadas)
+# Um perfilador por vez no PROCESSO (não por thread): o Python 3.12+ recusa um segundo
+# cProfile ativo, e no servidor.py cada pedido roda numa thread. Quem não consegue a
+# trava roda sem perfil; etapas aninhadas ficam no perfil da de fora.
+_trava_perfil = threading.Lock()
+
+
+@contextmanager
+def perfil(etapa: str):
+    """
+    Perfila o bloco se a etapa estiver em BULARIO_PERFIL; senão não faz nada.
+    O perfil de cada etapa acumula todas as chamadas do processo e é regravado ao
+    fim de cada uma em relatorios/perfis/<etapa>-<pid>.prof (ou .html, no pyinstrument):
+    processos de um pool terminam sem rodar o atexit.
+    """
+    if not ETAPAS_PERFIL or (etapa not in ETAPAS_PERFIL and "todas" not in ETAPAS_PERFIL) \
+            or not _trava_perfil.acquire(blocking=False):
+        yield
+        return
+    try:
+        with _perfilando(etapa):
+            yield
+    finally:
+        _trava_perfil.release()
+
+
+@contextmanager
+def _perfilando(etapa: str):
+    """O perfilamento em si (com a _trava_perfil já obtida)."""
+    if PERFILADOR == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError as e:
+            raise ImportError("BULARIO_PERFILADOR=pyinstrument precisa do pyinstrument: pip install pyinstrument") from e
+        perfilador = _perfiladores.setdefault(etapa, Profiler())
+        iniciar, parar = perfilador.start, perfilador.stop
+    else:
+        import cProfile
+        perfilador = _perfiladores.setdefault(etapa, cProfile.Profile())
+        iniciar, parar = perfilador.enable, perfilador.disable
+
+    iniciar()
+    try:
+        yield
+    finally:
+        parar()
+        os.makedirs(PASTA_PERFIS, exist_ok=True)
+        base = os.path.join(PASTA_PERFIS, f"{etapa}-{os.getpid()}")
+        if PERFILADOR == "pyinstrument":
+            with open(base + ".html", "w", encoding="utf-8") as f:
+                f.write(perfilador.output_html())
+        else:
+            perfilador.dump_stats(base + ".prof") # Ver com: python -m pstats ARQUIVO / snakeviz
+
+
+# --- 4. CRONÔMETRO E DECORADOR ---
+@contextmanager
+def medir(etapa: str, **rotulos):
+    """Mede o bloco no histograma etapa_segundos{etapa=...} (e o perfila, se pedido)."""
+    inicio = time.perf_counter()
+    try:
+        with perfil(etapa):
+            yield
+    finally:
+        observar("etapa_segundos", time.perf_counter() - inicio, etapa=etapa, **rotulos)
+
+
+def medido(etapa: str, **rotulos):
+    """Decorador: como 'with medir(etapa)' em volta de toda a função."""
+    def decorador(funcao):
+        @wraps(funcao)
+        def embrulho(*args, **kwargs):
+            with medir(etapa, **rotulos):
+                return funcao(*args, **kwargs)
+        return embrulho
+    return decorador
+
+
+if ARQUIVO_METRICAS:
+    atexit.register(lambda: salvar_json(ARQUIVO_METRICAS))
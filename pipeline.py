@@ -0,0 +1,304 @@
+"""
+Roda as etapas do pipeline (todas ou só algumas) com um único comando, pulando as
+que não mudaram, como o make.
+
+Cada etapa tem uma "impressão digital": o hash do código (o script e os módulos
+que ele usa), das entradas (ex: data/*.pdf, os CSVs da etapa anterior) e dos
+parâmetros (ex: as regras de Regex da etiquetagem). Se a impressão e as saídas são
+as mesmas da última execução, a etapa é pulada. Os hashes são por CONTEÚDO: se uma
+etapa roda de novo mas gera o mesmo CSV, as seguintes continuam puladas.
+
+Adicionar um PDF, por exemplo, refaz a etiquetagem (que, pelo cache por PDF do
+2_etiquetar_automatico.py, só lê o PDF novo) e as etapas cujo CSV de entrada mudou.
+
+O estado fica em .cache_pipeline/estado.json. Arquivos cujo tamanho e data de
+modificação não mudaram não são lidos de novo para o hash.
+
+Uso (na raiz do projeto):
+    python pipeline.py                        # etiquetar, deduplicar, balancear e treinar
+    python pipeline.py etiquetar balancear    # só essas (na ordem do pipeline)
+    python pipeline.py --simular              # mostra o que rodaria, sem rodar
+    python pipeline.py treinar --forcar       # roda mesmo sem mudanças
+"""
+import os
+import glob
+import json
+import time
+import argparse
+import importlib
+
+import segmentos
+
+etiquetador = importlib.import_module("2_etiquetar_automatico")
+
+# --- 1. CONFIGURAÇÃO ---
+PASTA_ESTADO = ".cache_pipeline"
+ARQUIVO_ESTADO = os.path.join(PASTA_ESTADO, "estado.json")
+MAX_MOTIVOS = 5 # Quantos itens alterados mostrar por etapa
+
+
+# --- 2. AS ETAPAS ---
+class Etapa:
+    """
+    Uma etapa do pipeline: o script que a executa, os arquivos que ela lê e grava
+    e os parâmetros que mudam o resultado.
+
+    'entradas' e 'saidas' aceitam padrões do glob; uma pasta conta pelos arquivos
+    dentro dela (sem subpastas, ex: os checkpoints do treino). 'entradas' também
+    pode ser uma função, para o que só se sabe na hora (ex: o CSV que o
+    balanceamento vai ler). Entradas que não existem contam como "ausentes" (ex:
+    pesos_classes.json sem --pesos); saídas que não existem fazem a etapa rodar.
+    """
+
+    def __init__(self, nome, script, entradas, saidas, rodar, codigo=(), parametros=None):
+        self.nome = nome
+        self.script = script
+        self.entradas = entradas
+        self.saidas = saidas
+        self.rodar = rodar            # rodar(modulo, opcoes)
+        self.codigo = (script, *codigo)
+        self.parametros = parametros or (lambda opcoes: {})
+
+    def modulo(self):
+        return importlib.import_module(os.path.splitext(self.script)[0])
+
+
+def _rodar_etiquetar(modulo, opcoes):
+    modulo.main(num_workers=opcoes["workers"], extracao=opcoes["extracao"])
+
+
+def _rodar_balancear(modulo, opcoes):
+    modulo.main(limite=opcoes["limite"], usar_pesos=opcoes["pesos"])
+
+
+# Módulos do projeto que os scripts importam (entram no hash do código da etapa).
+# O classificador.py traz junto os dele.
+CODIGO_CLASSIFICADOR = ("classificador.py", "cache_predicoes.py", "config_modelo.py", "instrumentacao.py")
+
+ETAPAS = [
+    Etapa("manual", "1_criar_dataset.py",
+          entradas=[], saidas=[os.path.join("dataset", "bula_dipirona_etiquetada.csv")],
+          rodar=lambda modulo, opcoes: modulo.main()),
+    Etapa("etiquetar", "2_etiquetar_automatico.py",
+          entradas=[os.path.join("data", "*.pdf")],
+          # O manifesto do armazém muda sempre que alguma partição é regravada ou apagada
+          saidas=[os.path.join("dataset", "dataset_completo_automatico.csv"),
+                  os.path.join(segmentos.PASTA_SEGMENTOS, segmentos.ARQUIVO_MANIFESTO)],
+          rodar=_rodar_etiquetar,
+          codigo=("instrumentacao.py", "segmentos.py", "utilitarios.py"),
+          # As regras entram à parte para o motivo aparecer como "regras" no --simular
+          parametros=lambda opcoes: {"extracao": opcoes["extracao"],
+                                     "regras": etiquetador.hash_regras(opcoes["extracao"])}),
+    Etapa("indexar_texto", "2c_indexar_texto.py",
+          # Os trechos vêm do armazém por PDF da etiquetagem
+          entradas=[os.path.join(segmentos.PASTA_SEGMENTOS, segmentos.ARQUIVO_MANIFESTO)],
+          saidas=["indice_textual"],
+          rodar=lambda modulo, opcoes: modulo.main(),
+          codigo=("indice_textual.py", "instrumentacao.py", "segmentos.py")),
+    Etapa("deduplicar", "2b_deduplicar_dataset.py",
+          entradas=[os.path.join("dataset", "dataset_completo_automatico.csv")],
+          saidas=[os.path.join("dataset", "dataset_deduplicado.csv")],
+          rodar=lambda modulo, opcoes: modulo.main(),
+          codigo=("instrumentacao.py", "utilitarios.py")),
+    Etapa("balancear", "3_balancear_dataset.py",
+          # O deduplicado, se existir; senão, o armazém de segmentos (uma pasta: conta o manifesto) ou o CSV completo
+          entradas=lambda: [importlib.import_module("3_balancear_dataset").arquivo_entrada()],
+          saidas=[os.path.join("dataset", "dataset_final_balanceado.csv")],
+          rodar=_rodar_balancear,
+          codigo=("instrumentacao.py", "segmentos.py", "utilitarios.py"),
+          parametros=lambda opcoes: {"limite": opcoes["limite"], "pesos": opcoes["pesos"]}),
+    Etapa("treinar", "4_treinar_modelo.py",
+          entradas=[os.path.join("dataset", "dataset_final_balanceado.csv"),
+                    os.path.join("dataset", "pesos_classes.json")],
+          saidas=["modelo_bulario_bertimbau"],
+          rodar=lambda modulo, opcoes: modulo.main(),
+          codigo=("instrumentacao.py", "utilitarios.py")),
+    Etapa("destilar", "4b_destilar_modelo.py",
+          # O balanceado define o treino do professor, que fica fora do teste
+          entradas=["modelo_bulario_bertimbau", os.path.join("dataset", "dataset_completo_automatico.csv"),
+                    os.path.join("dataset", "dataset_final_balanceado.csv")],
+          saidas=["modelo_bulario_bertimbau_aluno"],
+          rodar=lambda modulo, opcoes: modulo.main(),
+          codigo=(*CODIGO_CLASSIFICADOR, "4_treinar_modelo.py", "utilitarios.py")),
+    Etapa("exportar", "5_exportar_modelo.py",
+          entradas=["modelo_bulario_bertimbau", os.path.join("dataset", "dataset_final_balanceado.csv")],
+          saidas=["modelo_bulario_bertimbau_int8"],
+          rodar=lambda modulo, opcoes: modulo.main(),
+          codigo=(*CODIGO_CLASSIFICADOR, "4_treinar_modelo.py", "utilitarios.py")),
+    Etapa("indexar", "6_indexar_similares.py",
+          entradas=["modelo_bulario_bertimbau", os.path.join("dataset", "dataset_completo_automatico.csv")],
+          saidas=["indice_similares"],
+          rodar=lambda modulo, opcoes: modulo.main(),
+          codigo=(*CODIGO_CLASSIFICADOR, "indice_similares.py", "utilitarios.py")),
+]
+NOMES_ETAPAS = [etapa.nome for etapa in ETAPAS]
+# O que roda sem argumentos: da etiquetagem ao treino (o dataset manual, a
+# destilação, a exportação e os índices de busca são opcionais)
+ETAPAS_PADRAO = ["etiquetar", "deduplicar", "balancear", "treinar"]
+
+
+# --- 3. IMPRESSÃO DIGITAL ---
+def listar_arquivos(padroes) -> list:
+    """Expande padrões do glob e pastas (só os arquivos do 1º nível) em caminhos de arquivo."""
+    arquivos = []
+    for padrao in padroes:
+        encontrados = sorted(glob.glob(padrao)) or [padrao]
+        for caminho in encontrados:
+            if os.path.isdir(caminho):
+                arquivos.extend(sorted(os.path.join(caminho, nome) for nome in os.listdir(caminho)
+                                       if os.path.isfile(os.path.join(caminho, nome))))
+            else:
+                arquivos.append(caminho)
+    return arquivos
+
+
+class Hashes:
+    """
+    Hash do conteúdo dos arquivos, guardado junto com tamanho e data de modificação:
+    se os dois não mudaram, o arquivo não é lido de novo (como o índice do git).
+    """
+
+    def __init__(self, conhecidos: dict):
+        self.conhecidos = conhecidos # caminho -> [tamanho, mtime_ns, sha256]
+
+    def de(self, caminho: str):
+        try:
+            info = os.stat(caminho)
+        except OSError:
+            return None # Ausente
+        registro = self.conhecidos.get(caminho)
+        if registro and registro[0] == info.st_size and registro[1] == info.st_mtime_ns:
+            return registro[2]
+        h = etiquetador.hash_arquivo(caminho)
+        self.conhecidos[caminho] = [info.st_size, info.st_mtime_ns, h]
+        return h
+
+
+def impressao(etapa: Etapa, opcoes: dict, hashes: Hashes) -> dict:
+    """Componentes da impressão digital da etapa: {"código:...", "entrada:...", "parâmetro:..."} -> hash/valor."""
+    componentes = {f"código:{arquivo}": hashes.de(arquivo) for arquivo in etapa.codigo}
+    entradas = etapa.entradas() if callable(etapa.entradas) else etapa.entradas
+    for arquivo in listar_arquivos(entradas):
+        componentes[f"entrada:{arquivo}"] = hashes.de(arquivo)
+    for nome, valor in etapa.parametros(opcoes).items():
+        componentes[f"parâmetro:{nome}"] = valor
+    return componentes
+
+
+def hashes_saidas(etapa: Etapa, hashes: Hashes) -> dict:
+    return {arquivo: hashes.de(arquivo) for arquivo in listar_arquivos(etapa.saidas)}
+
+
+def motivos(anterior: dict | None, atual: dict, saidas_antes: dict, saidas_agora: dict) -> list:
+    """Por que a etapa precisa rodar (lista vazia = está em dia)."""
+    if anterior is None:
+        return ["nunca rodou"]
+    lista = []
+    for chave in sorted(atual.keys() | anterior.keys()):
+        if chave not in anterior:
+            lista.append(f"{chave} (novo)")
+        elif chave not in atual:
+            lista.append(f"{chave} (removido)")
+        elif atual[chave] != anterior[chave]:
+            lista.append(chave)
+    for arquivo, h in saidas_agora.items():
+        if h is None:
+            lista.append(f"saída ausente: {arquivo}")
+        elif saidas_antes.get(arquivo) != h:
+            lista.append(f"saída alterada: {arquivo}")
+    return lista
+
+
+# --- 4. ESTADO ---
+def ler_estado() -> dict:
+    try:
+        with open(ARQUIVO_ESTADO, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"arquivos": {}, "etapas": {}}
+
+
+def salvar_estado(estado: dict):
+    """Grava de forma atômica (arquivo temporário + rename)."""
+    os.makedirs(PASTA_ESTADO, exist_ok=True)
+    temporario = ARQUIVO_ESTADO + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(estado, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(temporario, ARQUIVO_ESTADO)
+
+
+# --- 5. EXECUÇÃO ---
+def executar(etapas=None, forcar: bool = False, simular: bool = False, workers: int | None = None,
+             extracao: str = "texto", limite: int | None = None, usar_pesos: bool = False) -> dict:
+    """
+    Roda as etapas pedidas (na ordem do pipeline), pulando as que estão em dia.
+    Só as etapas pedidas são consideradas: as anteriores não rodam sozinhas.
+    Retorna {etapa: "rodou" | "pulada" | "rodaria"}.
+    """
+    pedidas = set(etapas or ETAPAS_PADRAO)
+    desconhecidas = pedidas - set(NOMES_ETAPAS)
+    if desconhecidas:
+        raise ValueError(f"Etapas desconhecidas: {sorted(desconhecidas)} (opções: {NOMES_ETAPAS})")
+    opcoes = {"workers": workers, "extracao": extracao, "limite": limite, "pesos": usar_pesos}
+
+    estado = ler_estado()
+    hashes = Hashes(estado["arquivos"])
+    situacao = {}
+    for etapa in ETAPAS:
+        if etapa.nome not in pedidas:
+            continue
+        registro = estado["etapas"].get(etapa.nome)
+        atual = impressao(etapa, opcoes, hashes)
+        lista = ["--forcar"] if forcar else motivos(
+            registro and registro["impressao"], atual,
+            registro["saidas"] if registro else {}, hashes_saidas(etapa, hashes))
+
+        if not lista:
+            print(f"[pulada] {etapa.nome}: nada mudou desde a última execução")
+            situacao[etapa.nome] = "pulada"
+            continue
+        resumo = ", ".join(lista[:MAX_MOTIVOS]) + (f" (+{len(lista) - MAX_MOTIVOS})" if len(lista) > MAX_MOTIVOS else "")
+        if simular:
+            print(f"[rodaria] {etapa.nome}: {resumo}")
+            situacao[etapa.nome] = "rodaria"
+            continue
+
+        print(f"\n{'=' * 70}\n[rodando] {etapa.nome} ({etapa.script}): {resumo}\n{'=' * 70}")
+        inicio = time.perf_counter()
+        etapa.rodar(etapa.modulo(), opcoes)
+        segundos = time.perf_counter() - inicio
+
+        saidas = hashes_saidas(etapa, hashes)
+        ausentes = [arquivo for arquivo, h in saidas.items() if h is None]
+        if ausentes:
+            salvar_estado(estado) # Guarda pelo menos os hashes já calculados
+            raise RuntimeError(f"A etapa '{etapa.nome}' não gerou: {', '.join(ausentes)}")
+        estado["etapas"][etapa.nome] = {"impressao": atual, "saidas": saidas,
+                                        "segundos": round(segundos, 1), "quando": time.strftime("%Y-%m-%d %H:%M:%S")}
+        salvar_estado(estado) # A cada etapa: uma falha adiante não perde o que já rodou
+        situacao[etapa.nome] = "rodou"
+        print(f"[ok] {etapa.nome} em {segundos:.1f} s")
+
+    salvar_estado(estado)
+    return situacao
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Roda as etapas do pipeline, pulando as que não mudaram (código, entradas e parâmetros)."
+    )
+    parser.add_argument("etapas", nargs="*", metavar="ETAPA",
+                        help=f"Etapas a rodar, entre {NOMES_ETAPAS} (padrão: {' '.join(ETAPAS_PADRAO)})")
+    parser.add_argument("--forcar", action="store_true", help="Roda as etapas pedidas mesmo sem mudanças")
+    parser.add_argument("--simular", action="store_true", help="Só mostra o que rodaria e por quê")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Processos na etiquetagem")
+    parser.add_argument("--extracao", choices=etiquetador.MODOS_EXTRACAO, default="texto",
+                        help="Modo de extração dos PDFs (ver 2_etiquetar_automatico.py)")
+    parser.add_argument("--limite", type=int, default=None, help="Máximo de exemplos por classe no balanceamento")
+    parser.add_argument("--pesos", action="store_true", help="Balanceamento com pesos por classe (ver 3_balancear_dataset.py)")
+    args = parser.parse_args()
+    desconhecidas = [nome for nome in args.etapas if nome not in NOMES_ETAPAS]
+    if desconhecidas:
+        parser.error(f"etapa(s) desconhecida(s): {', '.join(desconhecidas)}")
+    executar(args.etapas, forcar=args.forcar, simular=args.simular, workers=args.workers,
+             extracao=args.extracao, limite=args.limite, usar_pesos=args.pesos)
@@ -0,0 +1,252 @@
+"""
+Os trechos etiquetados com a sua origem: de que PDF, de que página e de que posição do
+texto extraído veio cada um.
+
+Segmento é o registro que o 2_etiquetar_automatico.py produz para cada parágrafo
+(texto, label, documento, página e posições [inicio, fim) no texto do PDF). Usa
+__slots__: milhões deles em memória custam pouco mais que as tuplas (texto, label) de
+antes, e ele continua se desempacotando como elas (texto, label = segmento).
+
+O armazém grava os segmentos em Parquet, uma partição por documento:
+
+    dataset/segmentos/
+        documento=bula_aciclovir.pdf/segmentos.parquet   texto, label, pagina, inicio, fim
+        documento=.../segmentos.parquet
+        _manifesto.json    por documento: assinatura do PDF, regras da etiquetagem e nº de trechos
+
+Quem lê escolhe as colunas e os documentos (ex: só a coluna label, para contar as
+etiquetas; só uma bula), e só esses bytes saem do disco. Uma nova execução da
+etiquetagem só regrava as partições dos PDFs novos ou alterados (ou se as regras
+mudarem) e apaga as dos PDFs que saíram da pasta.
+
+Uso (na raiz do projeto; depois do 2_etiquetar_automatico.py):
+    python segmentos.py                                     # resumo por documento
+    python segmentos.py --documento bula_losartana.pdf --label POSOLOGIA
+"""
+import os
+import json
+import shutil
+import argparse
+from urllib.parse import quote
+
+# --- 1. CONFIGURAÇÃO ---
+PASTA_SEGMENTOS = os.path.join("dataset", "segmentos")
+ARQUIVO_MANIFESTO = "_manifesto.json"
+ARQUIVO_PARTICAO = "segmentos.parquet"
+# Colunas gravadas em cada partição (o documento vem do nome da pasta)
+COLUNAS_ARQUIVO = ("texto", "label", "pagina", "inicio", "fim")
+COLUNAS = ("documento",) + COLUNAS_ARQUIVO
+
+
+# --- 2. O REGISTRO ---
+class Segmento:
+    """
+    Um parágrafo etiquetado e a sua origem. 'inicio' e 'fim' são posições no texto
+    extraído do PDF (o "texto" do shard do cache): texto_pdf[inicio:fim] é o trecho de
+    onde o parágrafo saiu (linhas de lixo e títulos no meio dele ficam de fora do
+    'texto'). 'pagina' começa em 1; 0 = desconhecida (texto sem as páginas, ex: colado).
+    """
+
+    __slots__ = COLUNAS_ARQUIVO + ("documento",)
+
+    def __init__(self, texto: str, label: str, documento: str | None = None,
+                 pagina: int = 0, inicio: int = 0, fim: int = 0):
+        self.texto = texto
+        self.label = label
+        self.documento = documento
+        self.pagina = pagina
+        self.inicio = inicio
+        self.fim = fim
+
+    def __iter__(self):
+        # Compatível com as tuplas (texto, label) de antes: texto, label = segmento
+        yield self.texto
+        yield self.label
+
+    def __eq__(self, outro):
+        if not isinstance(outro, Segmento):
+            return NotImplemented
+        return all(getattr(self, c) == getattr(outro, c) for c in self.__slots__)
+
+    def __repr__(self):
+        return (f"Segmento({self.texto[:40]!r}..., {self.label!r}, {self.documento!r}, "
+                f"pagina={self.pagina}, inicio={self.inicio}, fim={self.fim})")
+
+    def como_lista(self) -> list:
+        """[texto, label, pagina, inicio, fim] (o formato do shard do cache)."""
+        return [self.texto, self.label, self.pagina, self.inicio, self.fim]
+
+    @classmethod
+    def de_lista(cls, valores, documento: str | None = None):
+        texto, label, pagina, inicio, fim = valores
+        return cls(texto, label, documento, pagina, inicio, fim)
+
+
+# --- 3. O ARMAZÉM (Parquet, uma partição por documento) ---
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("O armazém de segmentos precisa do pyarrow: pip install pyarrow") from e
+    return pa, ds, pq
+
+
+def esquema():
+    pa, _, _ = _pyarrow()
+    return pa.schema([
+        ("texto", pa.string()), ("label", pa.string()),
+        ("pagina", pa.int32()), ("inicio", pa.int32()), ("fim", pa.int32()),
+    ])
+
+
+def pasta_particao(pasta: str, documento: str) -> str:
+    """documento=<nome> (codificado como URL, como o particionamento "hive" do pyarrow espera)."""
+    return os.path.join(pasta, "documento=" + quote(documento, safe=""))
+
+
+def ler_manifesto(pasta: str = PASTA_SEGMENTOS) -> dict:
+    """{documento: {"assinatura", "regras", "n"}}; vazio se o armazém ainda não existe."""
+    try:
+        with open(os.path.join(pasta, ARQUIVO_MANIFESTO), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class ArmazemSegmentos:
+    """
+    Grava os segmentos de cada documento na sua partição (temporário + rename) e o
+    manifesto em fechar(). Uma partição só é regravada se a assinatura do PDF
+    (tamanho + data de modificação) ou as regras mudaram; se a execução cair no
+    meio, o manifesto antigo continua valendo e as partições novas são refeitas.
+    """
+
+    def __init__(self, pasta: str = PASTA_SEGMENTOS):
+        _pyarrow()
+        self.pasta = pasta
+        self.manifesto = ler_manifesto(pasta)
+        self.vistos = set()
+        self.gravados = 0
+        os.makedirs(pasta, exist_ok=True)
+
+    def em_dia(self, documento: str, assinatura: list, regras: str) -> bool:
+        registro = self.manifesto.get(documento)
+        return (registro is not None and registro["assinatura"] == assinatura and registro["regras"] == regras
+                and os.path.exists(os.path.join(pasta_particao(self.pasta, documento), ARQUIVO_PARTICAO)))
+
+    def gravar(self, documento: str, segmentos, assinatura: list, regras: str):
+        """Grava (ou mantém, se estiver em dia) a partição do documento."""
+        self.vistos.add(documento)
+        if self.em_dia(documento, assinatura, regras):
+            return
+        pa, _, pq = _pyarrow()
+        colunas = {c: [getattr(s, c) for s in segmentos] for c in COLUNAS_ARQUIVO}
+        pasta = pasta_particao(self.pasta, documento)
+        os.makedirs(pasta, exist_ok=True)
+        temporario = os.path.join(pasta, f".{ARQUIVO_PARTICAO}.tmp")
+        pq.write_table(pa.Table.from_pydict(colunas, schema=esquema()), temporario)
+        os.replace(temporario, os.path.join(pasta, ARQUIVO_PARTICAO))
+        self.manifesto[documento] = {"assinatura": assinatura, "regras": regras, "n": len(segmentos)}
+        self.gravados += 1
+
+    def fechar(self):
+        """Apaga as partições dos documentos que não apareceram nesta execução e grava o manifesto."""
+        for documento in sorted(set(self.manifesto) - self.vistos):
+            shutil.rmtree(pasta_particao(self.pasta, documento), ignore_errors=True)
+            del self.manifesto[documento]
+        caminho = os.path.join(self.pasta, ARQUIVO_MANIFESTO)
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(self.manifesto.items())), f, ensure_ascii=False, indent=1)
+        os.replace(caminho + ".tmp", caminho)
+
+
+# --- 4. LEITURA ---
+def abrir_segmentos(pasta: str = PASTA_SEGMENTOS, documentos=None):
+    """
+    O armazém como um pyarrow.dataset, com a coluna 'documento' vinda das pastas.
+    Só entram os documentos do manifesto (em ordem de nome) e, com 'documentos',
+    só esses: os arquivos dos outros nem são abertos.
+    """
+    pa, ds, _ = _pyarrow()
+    manifesto = ler_manifesto(pasta)
+    if not manifesto:
+        raise FileNotFoundError(f"Armazém de segmentos não encontrado em '{pasta}'. "
+                                f"Rode antes: python 2_etiquetar_automatico.py")
+    nomes = sorted(manifesto)
+    if documentos is not None:
+        documentos = set(documentos)
+        nomes = [nome for nome in nomes if nome in documentos]
+    arquivos = [os.path.join(pasta_particao(pasta, nome), ARQUIVO_PARTICAO) for nome in nomes]
+    particoes = ds.partitioning(pa.schema([("documento", pa.string())]), flavor="hive")
+    return ds.dataset(arquivos, format="parquet", partitioning=particoes, partition_base_dir=pasta)
+
+
+def _filtro(labels):
+    if not labels:
+        return None
+    import pyarrow.dataset as ds
+    return ds.field("label").isin(list(labels))
+
+
+def ler_segmentos(pasta: str = PASTA_SEGMENTOS, colunas=None, documentos=None, labels=None):
+    """
+    Tabela pyarrow com as 'colunas' pedidas (padrão: todas) dos 'documentos' pedidos
+    (padrão: todos), só com as etiquetas em 'labels' (padrão: todas).
+    Ex: ler_segmentos(colunas=["label"]).to_pandas() para contar as etiquetas.
+    """
+    return abrir_segmentos(pasta, documentos).to_table(columns=list(colunas or COLUNAS), filter=_filtro(labels))
+
+
+def iterar_lotes(pasta: str = PASTA_SEGMENTOS, colunas=None, documentos=None, labels=None,
+                 tamanho_lote: int = 100_000):
+    """
+    Como ler_segmentos, mas em DataFrames de até 'tamanho_lote' linhas, na ordem dos
+    documentos (memória limitada). Os lotes de partições pequenas são juntados antes de
+    virar DataFrame: uma bula tem poucas dezenas de trechos.
+    """
+    pa, _, _ = _pyarrow()
+    dataset = abrir_segmentos(pasta, documentos)
+    pendentes, n = [], 0
+    for lote in dataset.to_batches(columns=list(colunas or COLUNAS), filter=_filtro(labels),
+                                   batch_size=tamanho_lote):
+        pendentes.append(lote)
+        n += lote.num_rows
+        if n >= tamanho_lote:
+            yield pa.Table.from_batches(pendentes).to_pandas()
+            pendentes, n = [], 0
+    if n:
+        yield pa.Table.from_batches(pendentes).to_pandas()
+
+
+def iterar_segmentos(pasta: str = PASTA_SEGMENTOS, documentos=None, labels=None):
+    """Os registros Segmento, documento por documento."""
+    for df in iterar_lotes(pasta, documentos=documentos, labels=labels):
+        for linha in df.itertuples(index=False):
+            yield Segmento(linha.texto, linha.label, linha.documento, linha.pagina, linha.inicio, linha.fim)
+
+
+# --- 5. LINHA DE COMANDO ---
+def main():
+    parser = argparse.ArgumentParser(description="Consulta o armazém de segmentos etiquetados.")
+    parser.add_argument("--pasta", default=PASTA_SEGMENTOS)
+    parser.add_argument("--documento", action="append", help="Só este PDF (pode repetir)")
+    parser.add_argument("--label", action="append", help="Só esta etiqueta (pode repetir)")
+    args = parser.parse_args()
+
+    if not args.documento:
+        tabela = ler_segmentos(args.pasta, colunas=["documento", "label"], labels=args.label).to_pandas()
+        contagem = tabela.groupby(["documento", "label"]).size().unstack(fill_value=0)
+        print(contagem.to_string())
+        print(f"\n{len(tabela)} segmentos em {tabela['documento'].nunique()} documentos")
+        return
+    for segmento in iterar_segmentos(args.pasta, documentos=args.documento, labels=args.label):
+        print(f"--- {segmento.documento} | p. {segmento.pagina} | [{segmento.inicio}:{segmento.fim}] "
+              f"| {segmento.label} ---")
+        print(segmento.texto)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from classificador import BACKENDS, carregar_classificador, memoria_processo
+from cache_predicoes import CachePredicoes
+import instrumentacao
+from instrumentacao import BALDES_CONTAGEM
+
+# --- 1. CONFIGURAÇÃO ---
+HOST = "127.0.0.1"
+PORTA = 8000
+MAX_ESPERA_MS = 10          # Quanto o 1º pedido de um micro-lote espera por companhia
+TAMANHO_MAX_LOTE = 64       # Parágrafos por micro-lote (um pedido em lote grande vai inteiro)
+MAX_TEXTOS_POR_PEDIDO = 2000
+TIMEOUT_PEDIDO_S = 120
+JANELA_METRICAS = 10_000    # Latências guardadas para os percentis
+
+
+# --- 2. MÉTRICAS ---
+class Metricas:
+    """
+    Latência por pedido (percentis), tamanho dos micro-lotes e vazão, para o /metricas.
+    Também alimenta os histogramas do instrumentacao.py (expostos no /metricas/prometheus).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.inicio = time.time()
+        self.latencias_ms = deque(maxlen=JANELA_METRICAS)
+        self.recentes = deque() # (instante, nº de parágrafos) do último minuto
+        self.pedidos = 0
+        self.paragrafos = 0
+        self.lotes = 0
+        self.erros = 0
+
+    def registrar_pedido(self, latencia_ms: float, n_paragrafos: int):
+        agora = time.time()
+        with self._lock:
+            self.pedidos += 1
+            self.paragrafos += n_paragrafos
+            self.latencias_ms.append(latencia_ms)
+            self.recentes.append((agora, n_paragrafos))
+            while self.recentes and self.recentes[0][0] < agora - 60:
+                self.recentes.popleft()
+        instrumentacao.observar("pedido_segundos", latencia_ms / 1000)
+
+    def registrar_lote(self, n_paragrafos: int):
+        with self._lock:
+            self.lotes += 1
+        instrumentacao.observar("micro_lote_paragrafos", n_paragrafos, baldes=BALDES_CONTAGEM)
+
+    def registrar_erro(self):
+        with self._lock:
+            self.erros += 1
+        instrumentacao.contar("pedidos_com_erro_total")
+
+    def resumo(self) -> dict:
+        with self._lock:
+            latencias = sorted(self.latencias_ms)
+            decorrido = time.time() - self.inicio
+            ultimo_minuto = sum(n for _, n in self.recentes)
+
+        def percentil(p):
+            return latencias[min(len(latencias) - 1, int(p / 100 * len(latencias)))] if latencias else None
+
+        return {
+            "pedidos": self.pedidos,
+            "paragrafos": self.paragrafos,
+            "erros": self.erros,
+            "micro_lotes": self.lotes,
+            "paragrafos_por_lote": self.paragrafos / self.lotes if self.lotes else 0.0,
+            "latencia_ms": {"p50": percentil(50), "p90": percentil(90), "p99": percentil(99),
+                            "max": latencias[-1] if latencias else None},
+            "paragrafos_por_s": self.paragrafos / decorrido if decorrido else 0.0,
+            "paragrafos_por_s_ultimo_minuto": ultimo_minuto / min(60.0, decorrido) if decorrido else 0.0,
+            "segundos_no_ar": decorrido,
+        }
+
+
+# --- 3. FILA DE MICRO-LOTES ---
+class FilaMicroLotes:
+    """
+    Junta pedidos que chegam ao mesmo tempo num único micro-lote.
+
+    Cada requisição HTTP roda na sua própria thread e só enfileira os textos; uma
+    única thread consome a fila: pega o 1º pedido, espera até MAX_ESPERA_MS por
+    outros (ou até juntar TAMANHO_MAX_LOTE parágrafos) e classifica tudo numa
+    chamada só. Com muito tráfego, os lotes enchem antes do prazo; sem concorrência,
+    não há espera (ver _laco).
+    """
+
+    def __init__(self, classificador, metricas: Metricas, max_espera_ms: float = MAX_ESPERA_MS,
+                 tamanho_max_lote: int = TAMANHO_MAX_LOTE):
+        self.classificador = classificador
+        self.metricas = metricas
+        self.max_espera = max_espera_ms / 1000
+        self.tamanho_max_lote = tamanho_max_lote
+        self._fila = queue.Queue()
+        threading.Thread(target=self._laco, daemon=True).start()
+
+    def enviar(self, textos) -> Future:
+        futuro = Future()
+        self._fila.put((list(textos), futuro))
+        return futuro
+
+    def _laco(self):
+        pedidos_no_ultimo_lote = 1
+        while True:
+            pedidos = [self._fila.get()]
+            total = len(pedidos[0][0])
+            # Só espera pelo prazo se o último lote juntou mais de um pedido (há clientes
+            # concorrentes); um cliente sozinho não paga a espera a cada pedido. O que já
+            # está na fila entra sempre.
+            prazo = time.perf_counter() + (self.max_espera if pedidos_no_ultimo_lote > 1 else 0)
+            while total < self.tamanho_max_lote:
+                restante = prazo - time.perf_counter()
+                try:
+                    pedido = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                pedidos.append(pedido)
+                total += len(pedido[0])
+            pedidos_no_ultimo_lote = len(pedidos)
+            self._processar(pedidos)
+
+    def _processar(self, pedidos):
+        textos = [texto for textos_pedido, _ in pedidos for texto in textos_pedido]
+        try:
+            resultados = self.classificador.classificar(textos)
+        except Exception as e:
+            for _, futuro in pedidos:
+                futuro.set_exception(e)
+            return
+        self.metricas.registrar_lote(len(textos))
+        inicio = 0
+        for textos_pedido, futuro in pedidos:
+            futuro.set_result(resultados[inicio:inicio + len(textos_pedido)])
+            inicio += len(textos_pedido)
+
+
+# --- 4. ROTAS HTTP ---
+class ManipuladorClassificacao(BaseHTTPRequestHandler):
+    """
+    GET  /saude               -> status, backend e etiquetas do modelo
+    GET  /metricas            -> latência (p50/p90/p99), vazão, micro-lotes, cache, memória
+    GET  /metricas/prometheus -> contadores e histogramas por etapa, no formato do Prometheus
+    POST /classificar         -> {"texto": "..."}       => {"label", "confianca", "probabilidades"}
+    POST /classificar/lote    -> {"textos": ["...", ...]} => {"resultados": [...]}
+    """
+
+    servidor_bulas = None # Preenchido em criar_servidor
+
+    def log_message(self, formato, *args):
+        pass # Sem uma linha de log por requisição (as métricas já contam tudo)
+
+    def _responder(self, status: int, corpo: dict):
+        self._enviar(status, json.dumps(corpo, ensure_ascii=False), "application/json; charset=utf-8")
+
+    def _enviar(self, status: int, texto: str, tipo: str):
+        dados = texto.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        estado = self.servidor_bulas
+        if self.path == "/saude":
+            self._responder(200, {"status": "ok", "backend": estado["backend"],
+                                  "modelo": estado["classificador"].caminho_modelo,
+                                  "labels": estado["classificador"].labels})
+        elif self.path == "/metricas":
+            metricas = estado["metricas"].resumo()
+            cache = estado["classificador"].cache
+            metricas["cache"] = cache.estatisticas() if cache is not None else None
+            metricas["memoria"] = memoria_processo() # RSS x compartilhada (ex: --mmap com réplicas)
+            self._responder(200, metricas)
+        elif self.path == "/metricas/prometheus":
+            self._enviar(200, instrumentacao.texto_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._responder(404, {"erro": f"Rota não encontrada: {self.path}"})
+
+    def do_POST(self):
+        inicio = time.perf_counter()
+        estado = self.servidor_bulas
+        if self.path not in ("/classificar", "/classificar/lote"):
+            self._responder(404, {"erro": f"Rota não encontrada: {self.path}"})
+            return
+
+        try:
+            tamanho = int(self.headers.get("Content-Length", 0))
+            corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+            if self.path == "/classificar":
+                textos = [corpo["texto"]]
+            else:
+                textos = corpo["textos"]
+            if not isinstance(textos, list) or not all(isinstance(t, str) for t in textos):
+                raise ValueError("'textos' deve ser uma lista de strings")
+        except (ValueError, KeyError, TypeError) as e:
+            estado["metricas"].registrar_erro()
+            self._responder(400, {"erro": f"Corpo inválido: {e}"})
+            return
+        if len(textos) > MAX_TEXTOS_POR_PEDIDO:
+            estado["metricas"].registrar_erro()
+            self._responder(413, {"erro": f"Máximo de {MAX_TEXTOS_POR_PEDIDO} textos por pedido"})
+            return
+
+        try:
+            resultados = estado["fila"].enviar(textos).result(timeout=TIMEOUT_PEDIDO_S)
+        except Exception as e:
+            estado["metricas"].registrar_erro()
+            self._responder(500, {"erro": f"Falha na classificação: {e}"})
+            return
+
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        estado["metricas"].registrar_pedido(latencia_ms, len(textos))
+        if self.path == "/classificar":
+            self._responder(200, resultados[0])
+        else:
+            self._responder(200, {"resultados": resultados, "latencia_ms": latencia_ms})
+
+
+class ServidorHTTP(ThreadingHTTPServer):
+    request_queue_size = 128 # O padrão (5) recusa conexões quando muitos clientes chegam juntos
+
+
+def criar_servidor(classificador, backend: str, host: str = HOST, porta: int = PORTA,
+                   max_espera_ms: float = MAX_ESPERA_MS, tamanho_max_lote: int = TAMANHO_MAX_LOTE):
+    metricas = Metricas()
+    ManipuladorClassificacao.servidor_bulas = {
+        "classificador": classificador,
+        "backend": backend,
+        "metricas": metricas,
+        "fila": FilaMicroLotes(classificador, metricas, max_espera_ms, tamanho_max_lote),
+    }
+    return ServidorHTTP((host, porta), ManipuladorClassificacao)
+
+
+# --- 5. EXECUÇÃO PRINCIPAL ---
+# Ex: python servidor.py --backend onnx --porta 8000
+#     curl -X POST localhost:8000/classificar -d '{"texto": "Tome 1 comprimido ao dia."}'
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor HTTP de classificação de parágrafos de bula.")
+    parser.add_argument("--backend", choices=list(BACKENDS), default="pytorch", help="Backend de inferência (padrão: pytorch)")
+    parser.add_argument("--modelo", default=None, help="Pasta do modelo (padrão: a do backend escolhido)")
+    parser.add_argument("--host", default=HOST, help=f"Endereço (padrão: {HOST}; use 0.0.0.0 para a rede)")
+    parser.add_argument("--porta", type=int, default=PORTA)
+    parser.add_argument("--max-espera-ms", type=float, default=MAX_ESPERA_MS,
+                        help="Espera máxima para juntar pedidos num micro-lote")
+    parser.add_argument("--tamanho-max-lote", type=int, default=TAMANHO_MAX_LOTE)
+    parser.add_argument("--cache-sqlite", default=None, help="Arquivo SQLite do cache de previsões")
+    parser.add_argument("--sem-cache", action="store_true", help="Desliga o cache de previsões (ex: para benchmarks)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Mapeia os pesos (somente leitura): réplicas no mesmo host dividem uma cópia deles")
+    args = parser.parse_args()
+
+    caminho_modelo = args.modelo or BACKENDS[args.backend]
+    cache = None if args.sem_cache else CachePredicoes(caminho_sqlite=args.cache_sqlite)
+    classificador = carregar_classificador(caminho_modelo, backend=args.backend, cache=cache,
+                                           pesos_mmap=args.mmap)
+    if classificador is None:
+        raise SystemExit(f"Erro: não foi possível carregar o modelo em '{caminho_modelo}'.")
+
+    servidor = criar_servidor(classificador, args.backend, args.host, args.porta,
+                              args.max_espera_ms, args.tamanho_max_lote)
+    print(f"--- Servidor no ar: http://{args.host}:{args.porta} (Ctrl+C para parar) ---")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n--- Servidor encerrado ---")
@@ -0,0 +1,23 @@
+import hashlib
+
+# --- 1. CONFIGURAÇÃO ---
+# Funções pequenas usadas por vários scripts do pipeline. Só biblioteca padrão no
+# import (o psutil só é carregado por quem mede memória), como no instrumentacao.py.
+TAMANHO_BLOCO = 1 << 20 # 1 MB por leitura: arquivos grandes não precisam caber na memória
+
+
+# --- 2. ARQUIVOS ---
+def hash_arquivo(caminho: str) -> str:
+    """Hash SHA-256 do conteúdo de um arquivo, lido em blocos."""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+# --- 3. MEMÓRIA ---
+def rss_mb() -> float:
+    """Memória residente (RSS) do processo atual, em MB."""
+    import psutil
+    return psutil.Process().memory_info().rss / 1024 ** 2